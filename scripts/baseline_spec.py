@@ -0,0 +1,39 @@
+"""Baseline inputs shared by the pipeline stages.
+
+The observation paths, baseline window and state -> indicator chains that
+several stages read. They live apart from `build_baseline.py` so that
+editing its transforms or aggregation does not change the fingerprint of
+stages that only need these (see scripts/pipeline.py).
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+GATED_OBS_PATH = ROOT / "data" / "processed" / "observations_gated_v1.csv"
+OBS_PATH = ROOT / "data" / "processed" / "observations_v1.csv"
+OBS_FALLBACK_PATH = ROOT / "data" / "processed" / "world_bank_observations.csv"
+
+BASELINE_WINDOW = (2015, 2024)
+
+# Maps game state variable -> preferred indicator chain.
+STATE_MAP = {
+    "debt_to_gdp": ["DEBT_GDP"],
+    "deficit_to_gdp": ["DEFICIT_GDP", "CURRENT_ACCOUNT"],
+    "health_outcome": ["UHC_INDEX", "LIFE_EXPECTANCY"],
+    "education_outcome": ["HUMAN_CAPITAL", "LOWER_SEC_COMPLETION", "PRIMARY_COMPLETION"],
+    "public_safety": ["HOMICIDE_RATE"],
+    "institutional_integrity": ["CONTROL_CORRUPTION", "RULELAW_PROXY"],
+    "economic_output": ["GDP_PC_PPP"],
+    "employment": ["UNEMPLOYMENT"],
+    "external_stability": ["CURRENT_ACCOUNT", "FX_RESERVES_MONTHS"],
+}
+
+
+def observations_path() -> Path:
+    """The quality-gated observations if present, else the enriched, else the raw ones."""
+    for path in (GATED_OBS_PATH, OBS_PATH):
+        if path.exists():
+            return path
+    return OBS_FALLBACK_PATH
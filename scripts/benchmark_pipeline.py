@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""Benchmark the pipeline stages on synthetic data at larger scales.
+
+Generates World Bank-shaped series payloads (and an OWID CO2 CSV) for any
+number of countries, years and indicators, then times each stage on them:
+`normalize_rows`, `append_derived`, `append_structural_proxies`, `write_rows`,
+the `StatsIndex` load, `aggregate` and the coverage report. The real catalog
+indicators are always included, with values drawn around each indicator's
+observed mean and spread, so the derivations see realistic inputs; extra
+indicators are synthetic.
+
+Every stage runs in its own spawned process, which loads its inputs from the
+previous stage's files before the clock starts. That way each stage reports
+its own wall time and peak RSS (`ru_maxrss` before the stage and at its end).
+The network is disabled in those processes: `HttpClient.fetch_bytes` raises,
+and the OWID loader reads the synthetic CSV.
+
+Results are written as JSON. `--compare` flags stages whose best wall time
+or peak RSS grew by more than `--threshold` against an earlier results file.
+
+Outputs:
+- data/processed/benchmarks/pipeline_<label>.json
+
+Usage:
+- python3 scripts/benchmark_pipeline.py --scale 10
+- python3 scripts/benchmark_pipeline.py --countries 1600 --years 40 --indicators 120 --repeat 3
+- python3 scripts/benchmark_pipeline.py --scale 10 --compare data/processed/benchmarks/pipeline_c160_y26_i0.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import csv
+import io
+import itertools
+import json
+import math
+import multiprocessing
+import platform
+import random
+import resource
+import statistics
+import string
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Sequence, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+OUT_DIR = ROOT / "data" / "processed" / "benchmarks"
+REAL_OBS = ROOT / "data" / "processed" / "world_bank_observations.csv"
+
+STAGES = ("normalize_rows", "append_derived", "append_structural_proxies", "write_rows", "stats_index", "aggregate", "coverage_report")
+NULL_SHARE = 0.1
+DEFAULT_THRESHOLD = 0.2
+
+
+@dataclass(frozen=True)
+class Scale:
+    countries: int
+    years: int
+    indicators: int
+    end_year: int = 2025
+    seed: int = 0
+
+    @property
+    def label(self) -> str:
+        return f"c{self.countries}_y{self.years}_i{self.indicators}"
+
+
+def country_codes(n: int, real: Sequence[str]) -> List[str]:
+    """The real peers first, then synthetic 3-letter codes (X-prefixed ones first)."""
+    codes = list(real[:n])
+    taken = set(real)
+    combos = sorted(("".join(p) for p in itertools.product(string.ascii_uppercase, repeat=3)), key=lambda c: c[0] != "X")
+    for code in combos:
+        if len(codes) >= n:
+            break
+        if code not in taken:
+            codes.append(code)
+    if len(codes) < n:
+        raise ValueError(f"at most {len(codes)} countries")
+    return codes
+
+
+def indicator_moments(path: Path = REAL_OBS) -> Dict[str, Tuple[float, float]]:
+    """Observed (mean, stdev) per source code, so synthetic values look real."""
+    values: Dict[str, List[float]] = {}
+    if path.exists():
+        with path.open(newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                values.setdefault(row["source_code"], []).append(float(row["value"]))
+    return {k: (statistics.fmean(v), statistics.pstdev(v) or 1.0) for k, v in values.items() if v}
+
+
+def generate(scale: Scale, workdir: Path) -> Dict[str, Path]:
+    """Write the synthetic catalog, peers, series payloads and OWID CSV under `workdir`."""
+    import fetch_world_bank as fwb
+
+    rng = random.Random(scale.seed)
+    real = fwb.read_world_bank_indicators()
+    catalog_rows = []
+    with fwb.CATALOG_PATH.open(newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        fields = reader.fieldnames or []
+        catalog_rows = list(reader)
+    template = next(r for r in catalog_rows if r["source"] == "World Bank")
+    for i in range(max(0, scale.indicators - len(real))):
+        catalog_rows.append({**template, "domain": f"synthetic_{i % 8}", "indicator_id": f"SYN_{i:04d}", "indicator_name": f"Synthetic indicator {i}", "source_code": f"SYN.{i:04d}"})
+    paths = {
+        "catalog": workdir / "catalog.csv",
+        "peers": workdir / "peers.csv",
+        "series": workdir / "series.jsonl",
+        "owid": workdir / "owid_co2_data.csv",
+    }
+    with paths["catalog"].open("w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(catalog_rows)
+
+    countries = country_codes(scale.countries, fwb.read_peers())
+    with paths["peers"].open("w", newline="", encoding="utf-8") as f:
+        f.write("iso3,name\n")
+        f.writelines(f"{c},Country {c}\n" for c in countries)
+
+    years = range(scale.end_year - scale.years + 1, scale.end_year + 1)
+    moments = indicator_moments()
+    codes = list(dict.fromkeys(r["source_code"] for r in catalog_rows if r["source"] in ("World Bank", "WGI") and r["source_code"]))
+    with paths["series"].open("w", encoding="utf-8") as f:
+        for code in codes:
+            mean, sd = moments.get(code, (50.0, 15.0))
+            rows = []
+            for c in countries:
+                level = rng.gauss(mean, sd)
+                for year in reversed(years):  # the API lists newest first
+                    level += rng.gauss(0, sd * 0.05)
+                    value = None if rng.random() < NULL_SHARE else round(level, 6)
+                    rows.append({"indicator": {"id": code, "value": code}, "country": {"id": c[:2], "value": c}, "countryiso3code": c, "date": str(year), "value": value})
+            f.write(json.dumps({"source_code": code, "rows": rows}) + "\n")
+
+    with paths["owid"].open("w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["iso_code", "year", "co2_per_capita"])
+        for c in countries:
+            for year in years:
+                writer.writerow([c, year, round(rng.uniform(1, 16), 3)])
+    return paths
+
+
+def _isolate(paths: Dict[str, str]) -> None:
+    """Point the pipeline modules at the synthetic files and disable the network."""
+    import data_coverage_report
+    import enrich_observations
+    import fetch_world_bank
+    import http_client
+
+    def offline(*_args, **_kwargs):
+        raise RuntimeError("network access is disabled in benchmarks")
+
+    http_client.HttpClient.fetch_bytes = offline
+    fetch_world_bank.CATALOG_PATH = Path(paths["catalog"])
+    fetch_world_bank.PEERS_PATH = Path(paths["peers"])
+    enrich_observations.PEERS_PATH = Path(paths["peers"])
+    enrich_observations.OWID_RAW = Path(paths["owid"])
+    data_coverage_report.CATALOG = Path(paths["catalog"])
+    data_coverage_report.OBS = Path(paths["enriched_csv"])
+    data_coverage_report.OBS_FALLBACK = Path(paths["normalized_csv"])
+    data_coverage_report.OUT = Path(paths["workdir"]) / "coverage_report.json"
+    data_coverage_report.INDEX = Path(paths["workdir"]) / "coverage_index_v1.bin"
+
+
+def _rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+
+
+def _stage(name: str, paths: Dict[str, str]) -> Tuple[Callable[[], object], int]:
+    """Load the inputs of `name` (untimed); return the timed call and its input row count."""
+    import build_baseline
+    import data_coverage_report
+    import enrich_observations as enrich
+    import fetch_world_bank as fwb
+    from indicator_stats import StatsIndex
+
+    peers = enrich.load_peers()
+    if name == "normalize_rows":
+        by_code: Dict[str, List[dict]] = {}
+        with open(paths["series"], encoding="utf-8") as f:
+            for line in f:
+                rec = json.loads(line)
+                by_code[rec["source_code"]] = rec["rows"]
+        indicators = fwb.read_world_bank_indicators()
+
+        def run() -> List[dict]:
+            out: List[dict] = []
+            for ind in indicators:
+                out.extend(fwb.normalize_rows(ind, by_code.get(ind.source_code, []), "2026-01-01T00:00:00+00:00"))
+            return out
+
+        return run, sum(len(v) for v in by_code.values())
+    rows = enrich.load_rows(Path(paths["normalized_csv"]))
+    if name == "append_derived":
+        return lambda: enrich.append_derived(rows, peers), len(rows)
+    if name == "append_structural_proxies":
+        return lambda: enrich.append_structural_proxies(rows, peers), len(rows)
+    if name == "write_rows":
+        rows = enrich.append_structural_proxies(enrich.append_owid_co2(enrich.append_derived(rows, peers), peers)[0], peers)
+        return lambda: enrich.write_rows(rows, Path(paths["enriched_csv"])), len(rows)
+    if name == "stats_index":
+        return lambda: StatsIndex.from_observations(Path(paths["enriched_csv"]), years=build_baseline.BASELINE_WINDOW), len(rows)
+    if name == "aggregate":
+        stats = StatsIndex.from_observations(Path(paths["enriched_csv"]), years=build_baseline.BASELINE_WINDOW)
+        return lambda: build_baseline.aggregate(stats), len(rows)
+    if name == "coverage_report":
+
+        def report() -> int:
+            with contextlib.redirect_stdout(io.StringIO()):
+                return data_coverage_report.main(["--no-metrics"])
+
+        return report, len(rows)
+    raise ValueError(f"unknown stage {name!r}")
+
+
+def _child(name: str, paths: Dict[str, str], conn) -> None:
+    sys.path.insert(0, str(ROOT / "scripts"))
+    try:
+        _isolate(paths)
+        call, rows_in = _stage(name, paths)
+        rss_before = _rss_mb()
+        started = time.perf_counter()
+        result = call()
+        seconds = time.perf_counter() - started
+        if name == "normalize_rows":
+            import enrich_observations
+
+            enrich_observations.write_rows(result, Path(paths["normalized_csv"]))
+        rows_out = len(result) if isinstance(result, list) else None
+        conn.send({"seconds": seconds, "rows_in": rows_in, "rows_out": rows_out, "rss_before_mb": round(rss_before, 1), "peak_rss_mb": round(_rss_mb(), 1)})
+    except BaseException as exc:  # pragma: no cover - reported to the parent
+        conn.send({"error": f"{type(exc).__name__}: {exc}"})
+    finally:
+        conn.close()
+
+
+def run_stage(name: str, paths: Dict[str, str]) -> dict:
+    ctx = multiprocessing.get_context("spawn")
+    parent, child = ctx.Pipe(duplex=False)
+    proc = ctx.Process(target=_child, args=(name, paths, child))
+    proc.start()
+    child.close()
+    result = parent.recv() if parent.poll(None) else {"error": "no result"}
+    proc.join()
+    if "error" in result:
+        raise RuntimeError(f"stage {name} failed: {result['error']}")
+    return result
+
+
+def run_suite(scale: Scale, repeat: int = 1, stages: Sequence[str] = STAGES) -> dict:
+    with tempfile.TemporaryDirectory(prefix="cm_bench_") as tmp:
+        workdir = Path(tmp)
+        started = time.perf_counter()
+        paths = {k: str(v) for k, v in generate(scale, workdir).items()}
+        generate_s = time.perf_counter() - started
+        paths.update(workdir=tmp, normalized_csv=str(workdir / "world_bank_observations.csv"), enriched_csv=str(workdir / "observations_v1.csv"))
+        results = {}
+        for name in STAGES:
+            if name not in stages and name not in ("normalize_rows", "write_rows"):
+                continue  # later stages read the files these two write
+            runs = [run_stage(name, paths) for _ in range(repeat)]
+            if name not in stages:
+                continue
+            best = min(runs, key=lambda r: r["seconds"])
+            results[name] = {
+                **{k: best[k] for k in ("rows_in", "rows_out")},
+                "seconds": round(best["seconds"], 4),
+                "seconds_all": [round(r["seconds"], 4) for r in runs],
+                "rss_before_mb": max(r["rss_before_mb"] for r in runs),
+                "peak_rss_mb": max(r["peak_rss_mb"] for r in runs),
+            }
+            print(f"{scale.label} {name}: {results[name]['seconds']:.3f}s, peak {results[name]['peak_rss_mb']} MB")
+    return {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scale": asdict(scale),
+        "repeat": repeat,
+        "generate_seconds": round(generate_s, 3),
+        "stages": results,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float = DEFAULT_THRESHOLD) -> List[str]:
+    """Stages whose wall time or peak RSS grew by more than `threshold` (a fraction)."""
+    regressions = []
+    if current["scale"] != baseline["scale"]:
+        regressions.append(f"scale differs: {baseline['scale']} -> {current['scale']}")
+    for name, now in current["stages"].items():
+        before = baseline["stages"].get(name)
+        if before is None:
+            continue
+        for metric in ("seconds", "peak_rss_mb"):
+            if before[metric] > 0 and now[metric] > before[metric] * (1 + threshold):
+                regressions.append(f"{name} {metric}: {before[metric]} -> {now[metric]} (+{now[metric] / before[metric] - 1:.0%})")
+    return regressions
+
+
+def parse_args(argv: Sequence[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=float, default=10.0, help="multiply today's peer count (16) by this factor")
+    parser.add_argument("--countries", type=int, help="explicit country count (overrides --scale)")
+    parser.add_argument("--years", type=int, default=26)
+    parser.add_argument("--indicators", type=int, default=0, help="total indicators; extra ones beyond the catalog are synthetic")
+    parser.add_argument("--stages", default=",".join(STAGES), help="comma-separated subset of stages")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per stage; the fastest is reported")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", type=Path, help=f"results file (default: {OUT_DIR.relative_to(ROOT)}/pipeline_<label>.json)")
+    parser.add_argument("--compare", type=Path, help="earlier results file to check for regressions")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="allowed growth before a regression is flagged (0.2 = 20%%)")
+    return parser.parse_args(argv)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    import fetch_world_bank
+
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = [s for s in stages if s not in STAGES]
+    if unknown:
+        print(f"unknown stage(s) {unknown}; stages are {list(STAGES)}", file=sys.stderr)
+        return 1
+    countries = args.countries or max(1, math.ceil(len(fetch_world_bank.read_peers()) * args.scale))
+    scale = Scale(countries, args.years, args.indicators, seed=args.seed)
+    result = run_suite(scale, args.repeat, stages)
+
+    out = args.out or OUT_DIR / f"pipeline_{scale.label}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    if args.compare:
+        with args.compare.open(encoding="utf-8") as f:
+            result["regressions"] = compare(result, json.load(f), args.threshold)
+    with out.open("w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    print(f"wrote {out}")
+    for line in result.get("regressions", []):
+        print(f"REGRESSION {line}", file=sys.stderr)
+    return 3 if result.get("regressions") else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -2,43 +2,31 @@
 """Build baseline_v1.json from normalized indicator observations.
 
 Inputs:
-- data/processed/world_bank_observations.csv
+- data/processed/observations_gated_v1.csv (else observations_v1.csv, else
+  world_bank_observations.csv), read from the columnar .store/ copy when it
+  is fresh
 
 Outputs:
 - data/calibrated/baseline_v1.json
-- data/calibrated/elasticities_v1.json
+- data/processed/metrics/build_baseline.jsonl (see scripts/metrics.py)
 """
 
 from __future__ import annotations
 
-import csv
+import argparse
 import json
 import statistics
-from collections import defaultdict
+import sys
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import List, Sequence, Tuple
+
+import metrics
+from baseline_spec import BASELINE_WINDOW, OBS_FALLBACK_PATH, OBS_PATH, STATE_MAP, observations_path
+from indicator_stats import StatsIndex, Summary, Window
 
 ROOT = Path(__file__).resolve().parents[1]
-OBS_PATH = ROOT / "data" / "processed" / "observations_v1.csv"
-OBS_FALLBACK_PATH = ROOT / "data" / "processed" / "world_bank_observations.csv"
 OUT_BASELINE = ROOT / "data" / "calibrated" / "baseline_v1.json"
-OUT_ELASTICITIES = ROOT / "data" / "calibrated" / "elasticities_v1.json"
-
-BASELINE_WINDOW = (2015, 2024)
-
-# Maps game state variable -> preferred indicator chain.
-STATE_MAP = {
-    "debt_to_gdp": ["DEBT_GDP"],
-    "deficit_to_gdp": ["DEFICIT_GDP", "CURRENT_ACCOUNT"],
-    "health_outcome": ["UHC_INDEX", "LIFE_EXPECTANCY"],
-    "education_outcome": ["HUMAN_CAPITAL", "LOWER_SEC_COMPLETION", "PRIMARY_COMPLETION"],
-    "public_safety": ["HOMICIDE_RATE"],
-    "institutional_integrity": ["CONTROL_CORRUPTION", "RULELAW_PROXY"],
-    "economic_output": ["GDP_PC_PPP"],
-    "employment": ["UNEMPLOYMENT"],
-    "external_stability": ["CURRENT_ACCOUNT", "FX_RESERVES_MONTHS"],
-}
 
 # Direction transforms to 0-100 score where higher is better.
 TRANSFORMS = {
@@ -58,7 +46,8 @@ TRANSFORMS = {
     "FX_RESERVES_MONTHS": ("target_band", 3.0, 12.0),
 }
 
-# Initial hand-tuned values from the design spec; tune after playtests.
+# Hand-tuned priors from the design spec. estimate_elasticities.py replaces
+# the ones the observation panel supports; tune the rest after playtests.
 ELASTICITIES = {
     "health_spend_pp_to_health_outcome": 0.15,
     "education_spend_pp_to_education_outcome": 0.12,
@@ -72,26 +61,8 @@ ELASTICITIES = {
 }
 
 
-def load_observations() -> Dict[str, List[Tuple[int, float]]]:
-    by_indicator: Dict[str, List[Tuple[int, float]]] = defaultdict(list)
-    path = OBS_PATH if OBS_PATH.exists() else OBS_FALLBACK_PATH
-    with path.open(newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            indicator = row["indicator_id"]
-            year = int(row["year"])
-            value = float(row["value"])
-            if BASELINE_WINDOW[0] <= year <= BASELINE_WINDOW[1]:
-                by_indicator[indicator].append((year, value))
-    return by_indicator
-
-
-def percentile(values: List[float], q: float) -> float:
-    if not values:
-        return 0.0
-    sorted_values = sorted(values)
-    idx = max(0, min(len(sorted_values) - 1, int(round((len(sorted_values) - 1) * q))))
-    return sorted_values[idx]
+def load_observations(window: Window = BASELINE_WINDOW) -> StatsIndex:
+    return StatsIndex.from_observations(observations_path(), years=window)
 
 
 def transform(indicator: str, x: float) -> float:
@@ -122,70 +93,67 @@ def transform(indicator: str, x: float) -> float:
     return 50.0
 
 
-def pick_indicator(by_indicator: Dict[str, List[Tuple[int, float]]], choices: List[str]) -> str | None:
+def pick_indicator(stats: StatsIndex, choices: List[str], window: Window) -> Tuple[str, Summary] | None:
     for indicator in choices:
-        if by_indicator.get(indicator):
-            return indicator
+        summary = stats.summary(indicator, window)
+        if summary is not None:
+            return indicator, summary
     return None
 
 
-def aggregate(by_indicator: Dict[str, List[Tuple[int, float]]]) -> dict:
+def aggregate(stats: StatsIndex, window: Window = BASELINE_WINDOW) -> dict:
     state = {}
     diagnostics = {}
 
     for state_var, choices in STATE_MAP.items():
-        indicator = pick_indicator(by_indicator, choices)
-        if indicator is None:
+        picked = pick_indicator(stats, choices, window)
+        if picked is None:
             state[state_var] = 50.0
             diagnostics[state_var] = {"indicator": choices[0], "missing": True}
             continue
-        vals = [v for _, v in by_indicator.get(indicator, [])]
-
-        avg = statistics.fmean(vals)
-        p10 = percentile(vals, 0.10)
-        p90 = percentile(vals, 0.90)
-        transformed = transform(indicator, avg)
+        indicator, summary = picked
+        transformed = transform(indicator, summary.mean)
 
         state[state_var] = round(transformed, 2)
         diagnostics[state_var] = {
             "indicator": indicator,
             "fallback_used": indicator != choices[0],
             "preferred_indicator": choices[0],
-            "raw_mean": round(avg, 4),
-            "raw_p10": round(p10, 4),
-            "raw_p90": round(p90, 4),
+            "raw_mean": round(summary.mean, 4),
+            "raw_p10": round(summary.quantile(0.10), 4),
+            "raw_p90": round(summary.quantile(0.90), 4),
             "score_0_100": round(transformed, 2),
-            "sample_count": len(vals),
+            "sample_count": summary.count,
         }
 
     # Blend climate resilience from air quality + renewable share if both available.
     climate_components = []
-    pm_vals = [v for _, v in by_indicator.get("PM25", [])]
-    ren_vals = [v for _, v in by_indicator.get("RENEWABLE_ENERGY", [])]
-    if pm_vals:
-        climate_components.append(transform("PM25", statistics.fmean(pm_vals)))
-    if ren_vals:
-        climate_components.append(min(100.0, statistics.fmean(ren_vals) * 1.8))
+    pm = stats.summary("PM25", window)
+    ren = stats.summary("RENEWABLE_ENERGY", window)
+    if pm:
+        climate_components.append(transform("PM25", pm.mean))
+    if ren:
+        climate_components.append(min(100.0, ren.mean * 1.8))
     if climate_components:
         state["climate_resilience"] = round(statistics.fmean(climate_components), 2)
         diagnostics["climate_resilience"] = {
             "indicator": "PM25+RENEWABLE_ENERGY_BLEND",
             "raw_mean_components": {
-                "PM25": round(statistics.fmean(pm_vals), 4) if pm_vals else None,
-                "RENEWABLE_ENERGY": round(statistics.fmean(ren_vals), 4) if ren_vals else None,
+                "PM25": round(pm.mean, 4) if pm else None,
+                "RENEWABLE_ENERGY": round(ren.mean, 4) if ren else None,
             },
             "score_0_100": state["climate_resilience"],
-            "sample_count": (len(pm_vals) if pm_vals else 0) + (len(ren_vals) if ren_vals else 0),
+            "sample_count": (pm.count if pm else 0) + (ren.count if ren else 0),
         }
     else:
         state["climate_resilience"] = 50.0
         diagnostics["climate_resilience"] = {"indicator": "PM25+RENEWABLE_ENERGY_BLEND", "missing": True}
 
     # A few direct (non-normalized) values also needed in engine.
-    debt_vals = [v for _, v in by_indicator.get("DEBT_GDP", [])]
-    deficit_vals = [v for _, v in by_indicator.get("DEFICIT_GDP", [])]
-    state["debt_to_gdp_pct"] = round(statistics.fmean(debt_vals), 2) if debt_vals else 60.0
-    state["deficit_to_gdp_pct"] = round(statistics.fmean(deficit_vals), 2) if deficit_vals else -2.0
+    debt = stats.summary("DEBT_GDP", window)
+    deficit = stats.summary("DEFICIT_GDP", window)
+    state["debt_to_gdp_pct"] = round(debt.mean, 2) if debt else 60.0
+    state["deficit_to_gdp_pct"] = round(deficit.mean, 2) if deficit else -2.0
 
     # Composite stability score.
     economy = statistics.fmean([state["economic_output"], state["employment"]])
@@ -202,14 +170,25 @@ def aggregate(by_indicator: Dict[str, List[Tuple[int, float]]]) -> dict:
     }
 
 
-def main() -> int:
+def parse_args(argv: Sequence[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    metrics.add_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
     if not OBS_PATH.exists() and not OBS_FALLBACK_PATH.exists():
         raise SystemExit(
             f"Missing {OBS_PATH} and {OBS_FALLBACK_PATH}. Run scripts/fetch_world_bank.py first."
         )
 
-    by_indicator = load_observations()
-    aggregated = aggregate(by_indicator)
+    recorder = metrics.from_args("build_baseline", args)
+    with recorder.stage("load"):
+        stats = load_observations()
+    with recorder.stage("aggregate") as stage:
+        aggregated = aggregate(stats)
+        stage.rows_out = len(aggregated["state"])
 
     baseline = {
         "generated_at": datetime.now(timezone.utc).isoformat(),
@@ -220,24 +199,17 @@ def main() -> int:
         "notes": [
             "Scores transformed to 0-100 for gameplay comparability.",
             "Some domains are backed by non-World-Bank sources and remain external until integrated.",
-            "Tune elasticity and transforms after first balancing playtests.",
+            "Tune transforms after first balancing playtests; elasticities come from estimate_elasticities.py.",
         ],
     }
 
     OUT_BASELINE.parent.mkdir(parents=True, exist_ok=True)
-    with OUT_BASELINE.open("w", encoding="utf-8") as f:
-        json.dump(baseline, f, indent=2)
-
-    elasticity = {
-        "generated_at": baseline["generated_at"],
-        "version": "v1_seed",
-        "elasticities": ELASTICITIES,
-    }
-    with OUT_ELASTICITIES.open("w", encoding="utf-8") as f:
-        json.dump(elasticity, f, indent=2)
+    with recorder.stage("write"):
+        with OUT_BASELINE.open("w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2)
+    recorder.close()
 
     print(f"wrote {OUT_BASELINE}")
-    print(f"wrote {OUT_ELASTICITIES}")
     return 0
 
 
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""Build the per-country, rolling-window baseline matrix for balancing.
+
+For every peer country, every rolling window (3, 5 and 10 years by default)
+and every state variable in `baseline_spec.STATE_MAP`, computes the metrics
+of spec section 3.1 step 3 from the first indicator in the chain with data:
+
+- `value`: window mean of the raw indicator; `score`: its 0-100 transform
+- `z_peer`: z-score of `value` against peers using the same indicator
+- `slope_3y`, `slope_5y`: least-squares trend over the window's last 3/5 years
+- `stdev`, `band_lo`, `band_hi`: volatility and the mean +/- one stdev band
+- `indicator_rank`: position of the chosen indicator in the chain
+
+Observations are loaded once into a dense country x year grid per indicator.
+Prefix sums over years (count, sum, sum of squares, and year-weighted sums,
+shifted by each series' mean for stability) make every window's mean,
+variance and slope O(1), so the whole matrix comes from one pass.
+
+Inputs:
+- data/processed/observations_v1.csv (or its fresh .store/)
+
+Outputs:
+- data/calibrated/baseline_matrix_v1.npy: float32, shape
+  (country, window, state, metric), NaN where unavailable
+- data/calibrated/baseline_matrix_v1.json: axis labels and file layout
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import math
+import sys
+from array import array
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+import observation_store
+from baseline_spec import OBS_FALLBACK_PATH, OBS_PATH, STATE_MAP, observations_path
+from build_baseline import TRANSFORMS, transform
+
+ROOT = Path(__file__).resolve().parents[1]
+OUT_MATRIX = ROOT / "data" / "calibrated" / "baseline_matrix_v1.npy"
+OUT_INDEX = ROOT / "data" / "calibrated" / "baseline_matrix_v1.json"
+
+MATRIX_VERSION = 1
+WIDTHS = (3, 5, 10)
+SLOPE_SPANS = (3, 5)
+METRICS = ("value", "score", "z_peer", "slope_3y", "slope_5y", "stdev", "band_lo", "band_hi", "indicator_rank")
+NAN = float("nan")
+STATE_INDICATORS = {i for chain in STATE_MAP.values() for i in chain}
+
+Window = Tuple[int, int]
+
+
+class Grid:
+    """Dense country x year values per indicator, NaN where missing."""
+
+    def __init__(self, countries: List[str], year0: int, n_years: int) -> None:
+        self.countries = countries
+        self.year0 = year0
+        self.n_years = n_years
+        self.values: Dict[str, array] = {}
+
+    def column(self, indicator: str) -> array:
+        if indicator not in self.values:
+            self.values[indicator] = array("d", [NAN]) * (len(self.countries) * self.n_years)
+        return self.values[indicator]
+
+
+def load_grid(path: Path, indicators: set[str]) -> Grid:
+    """Read only the wanted indicators' (country, year, value) triples in one pass."""
+    triples: List[Tuple[str, str, int, float]] = []
+    store = observation_store.open_for(path)
+    if store is not None:
+        names, countries = store.indicators, store.countries
+        wanted = {i for i, name in enumerate(names) if name in indicators}
+        for ind, country, year, value in zip(store.indicator, store.country, store.year, store.value):
+            if ind in wanted:
+                triples.append((names[ind], countries[country], year, value))
+        store.close()
+    else:
+        with path.open(newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                if row["indicator_id"] in indicators:
+                    triples.append((row["indicator_id"], row["country_id"], int(row["year"]), float(row["value"])))
+    countries = sorted({c for _, c, _, _ in triples})
+    years = [y for _, _, y, _ in triples]
+    year0 = min(years) if years else 0
+    grid = Grid(countries, year0, (max(years) - year0 + 1) if years else 0)
+    pos = {c: i for i, c in enumerate(countries)}
+    for ind, country, year, value in triples:
+        grid.column(ind)[pos[country] * grid.n_years + year - year0] = value
+    return grid
+
+
+class Prefix:
+    """Prefix sums over years of one country's series, shifted by its mean."""
+
+    def __init__(self, values: Sequence[float]) -> None:
+        present = [v for v in values if v == v]
+        self.shift = math.fsum(present) / len(present) if present else 0.0
+        n = s = ss = st = stt = stx = 0.0
+        self.sums = [(0.0, 0.0, 0.0, 0.0, 0.0, 0.0)]
+        for t, v in enumerate(values):
+            if v == v:
+                x = v - self.shift
+                n += 1
+                s += x
+                ss += x * x
+                st += t
+                stt += t * t
+                stx += t * x
+            self.sums.append((n, s, ss, st, stt, stx))
+
+    def window(self, lo: int, hi: int) -> Tuple[float, ...]:
+        """(n, sum, sumsq, sum_t, sum_tt, sum_tx) over year offsets lo..hi inclusive."""
+        a, b = self.sums[lo], self.sums[hi + 1]
+        return tuple(y - x for x, y in zip(a, b))
+
+    def mean_var(self, lo: int, hi: int) -> Tuple[float, float] | None:
+        n, s, ss, *_ = self.window(lo, hi)
+        if n == 0:
+            return None
+        mean = s / n
+        return mean + self.shift, max(0.0, ss / n - mean * mean)
+
+    def slope(self, lo: int, hi: int) -> float:
+        n, s, _, st, stt, stx = self.window(lo, hi)
+        denom = n * stt - st * st
+        if n < 2 or denom <= 0:
+            return NAN
+        return (n * stx - st * s) / denom
+
+
+def rolling_windows(year0: int, n_years: int, widths: Sequence[int]) -> List[Window]:
+    last = year0 + n_years - 1
+    return [(end - w + 1, end) for w in widths for end in range(year0 + w - 1, last + 1)]
+
+
+def build_matrix(grid: Grid, windows: List[Window], state_map: Dict[str, List[str]]) -> array:
+    """Matrix as a flat C-order float array of shape (country, window, state, metric)."""
+    n_c, n_w, n_s, n_m = len(grid.countries), len(windows), len(state_map), len(METRICS)
+    out = array("d", [NAN]) * (n_c * n_w * n_s * n_m)
+    prefixes: Dict[str, List[Prefix]] = {}
+    for ind in {i for chain in state_map.values() for i in chain}:
+        col = grid.values.get(ind)
+        if col is not None:
+            n = grid.n_years
+            prefixes[ind] = [Prefix(col[c * n : (c + 1) * n]) for c in range(n_c)]
+    m = {name: i for i, name in enumerate(METRICS)}
+
+    for wi, (start, end) in enumerate(windows):
+        lo, hi = start - grid.year0, end - grid.year0
+        for si, chain in enumerate(state_map.values()):
+            by_indicator: Dict[str, List[Tuple[int, float]]] = {}
+            for ci in range(n_c):
+                for rank, ind in enumerate(chain):
+                    pre = prefixes.get(ind)
+                    stats = pre[ci].mean_var(lo, hi) if pre else None
+                    if stats is not None:
+                        break
+                else:
+                    continue
+                mean, var = stats
+                sd = math.sqrt(var)
+                base = ((ci * n_w + wi) * n_s + si) * n_m
+                out[base + m["value"]] = mean
+                out[base + m["score"]] = transform(ind, mean) if ind in TRANSFORMS else NAN
+                for span in SLOPE_SPANS:
+                    out[base + m[f"slope_{span}y"]] = pre[ci].slope(max(lo, hi - span + 1), hi)
+                out[base + m["stdev"]] = sd
+                out[base + m["band_lo"]] = mean - sd
+                out[base + m["band_hi"]] = mean + sd
+                out[base + m["indicator_rank"]] = rank
+                by_indicator.setdefault(ind, []).append((ci, mean))
+            for members in by_indicator.values():
+                if len(members) < 2:
+                    continue
+                mu = math.fsum(v for _, v in members) / len(members)
+                sd = math.sqrt(math.fsum((v - mu) ** 2 for _, v in members) / len(members))
+                if sd == 0:
+                    continue
+                for ci, v in members:
+                    out[((ci * n_w + wi) * n_s + si) * n_m + m["z_peer"]] = (v - mu) / sd
+    return out
+
+
+class BaselineMatrix:
+    """Memory-mapped view of a written matrix; slices load without a rebuild."""
+
+    def __init__(self, index_path: Path = OUT_INDEX) -> None:
+        with index_path.open(encoding="utf-8") as f:
+            self.index = json.load(f)
+        axes = self.index["axes"]
+        self.countries: List[str] = axes["country"]
+        self.windows: List[Window] = [tuple(w) for w in axes["window"]]
+        self.states: List[str] = axes["state"]
+        self.metrics: List[str] = axes["metric"]
+        self._mm, header, data = observation_store.map_npy(index_path.parent / self.index["file"])
+        if header["shape"] != tuple(self.index["shape"]):
+            raise ValueError(f"{self.index['file']}: shape {header['shape']} does not match index")
+        self.data = data.cast("f")
+
+    def _offset(self, country: str, window: Window, state: str) -> int:
+        ci = self.countries.index(country)
+        wi = self.windows.index(tuple(window))
+        si = self.states.index(state)
+        return ((ci * len(self.windows) + wi) * len(self.states) + si) * len(self.metrics)
+
+    def get(self, country: str, window: Window, state: str, metric: str) -> float:
+        return self.data[self._offset(country, window, state) + self.metrics.index(metric)]
+
+    def metrics_for(self, country: str, window: Window, state: str) -> Dict[str, float]:
+        base = self._offset(country, window, state)
+        return dict(zip(self.metrics, self.data[base : base + len(self.metrics)].tolist()))
+
+    def close(self) -> None:
+        self.data.release()
+        self._mm.close()
+
+
+def parse_args(argv: Sequence[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--widths", default=",".join(map(str, WIDTHS)), help="comma-separated rolling window widths in years")
+    return parser.parse_args(argv)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    path = observations_path()
+    if not path.exists():
+        raise SystemExit(f"Missing {OBS_PATH} and {OBS_FALLBACK_PATH}. Run scripts/fetch_world_bank.py first.")
+    widths = [int(w) for w in args.widths.split(",") if w.strip()]
+    grid = load_grid(path, STATE_INDICATORS)
+    windows = rolling_windows(grid.year0, grid.n_years, widths)
+    matrix = array("f", build_matrix(grid, windows, STATE_MAP))
+    shape = (len(grid.countries), len(windows), len(STATE_MAP), len(METRICS))
+
+    OUT_MATRIX.parent.mkdir(parents=True, exist_ok=True)
+    observation_store.write_npy(OUT_MATRIX, matrix, "<f4", shape)
+    index = {
+        "version": MATRIX_VERSION,
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "file": OUT_MATRIX.name,
+        "dtype": "<f4",
+        "shape": list(shape),
+        "order": ["country", "window", "state", "metric"],
+        "axes": {
+            "country": grid.countries,
+            "window": [list(w) for w in windows],
+            "state": list(STATE_MAP),
+            "metric": list(METRICS),
+        },
+        "state_indicators": STATE_MAP,
+    }
+    with OUT_INDEX.open("w", encoding="utf-8") as f:
+        json.dump(index, f, indent=2)
+    print(f"wrote {OUT_MATRIX} {shape}")
+    print(f"wrote {OUT_INDEX}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""Build the compact runtime bundle the web client loads at startup.
+
+Packs the calibrated baseline state and the civic scenario and truth check
+decks into one minified, schema-versioned JSON document:
+
+- every string (ids, labels, categories, risk flags, prose) is interned once
+  in `strings`; rows refer to it by index
+- each deck is stored column-wise: one array per field, numeric delta maps
+  (`dem_now`, `kpi_now`, `axis_drift`) as a dense flat array over their keys
+  plus a presence bitmask, and nested `options` as one child table with
+  row offsets
+
+The document is written as `runtime_bundle_v1.<hash>.json` with `.gz` (and
+`.br` when the `brotli` module is installed) variants next to it, where
+`<hash>` is a content hash, so the files can be cached forever. The small
+unhashed `runtime_manifest_v1.json` names the current files; stale hashed
+files are removed. `web/app.js` reads the manifest, fetches the gzip variant
+and inflates it with `DecompressionStream`, and falls back to the source
+JSON files when the bundle is missing.
+
+Inputs:
+- data/calibrated/baseline_v1.json
+- data/calibrated/civic_scenarios_v1.json
+- data/calibrated/truth_checks_v1.json
+
+Outputs:
+- data/runtime/runtime_manifest_v1.json
+- data/runtime/runtime_bundle_v1.<hash>.json (+ .json.gz, .json.br)
+
+Usage:
+- python3 scripts/build_runtime_bundle.py
+- python3 scripts/build_runtime_bundle.py --check
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import hashlib
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Sequence
+
+try:
+    import brotli
+except ImportError:  # optional: only the .br variant needs it
+    brotli = None
+
+ROOT = Path(__file__).resolve().parents[1]
+CALIBRATED = ROOT / "data" / "calibrated"
+BASELINE_PATH = CALIBRATED / "baseline_v1.json"
+DECK_PATHS = {
+    "scenarios": CALIBRATED / "civic_scenarios_v1.json",
+    "truth_checks": CALIBRATED / "truth_checks_v1.json",
+}
+OUT_DIR = ROOT / "data" / "runtime"
+MANIFEST_NAME = "runtime_manifest_v1.json"
+BUNDLE_STEM = "runtime_bundle_v1"
+
+BUNDLE_SCHEMA = "country-manager/runtime-bundle"
+BUNDLE_VERSION = 1
+BASELINE_KEYS = ("window", "peer_model", "state")  # all the client reads; diagnostics stay in the source file
+MAX_MASK_KEYS = 31  # presence masks stay within JS 32-bit integer ops
+
+
+class Interner:
+    def __init__(self) -> None:
+        self.strings: List[str] = []
+        self._index: Dict[str, int] = {}
+
+    def __call__(self, s: str) -> int:
+        i = self._index.get(s)
+        if i is None:
+            i = self._index[s] = len(self.strings)
+            self.strings.append(s)
+        return i
+
+
+def _is_num(v: Any) -> bool:
+    return isinstance(v, (int, float)) and not isinstance(v, bool)
+
+
+def _key_order(dicts: Sequence[dict]) -> List[str]:
+    keys: Dict[str, None] = {}
+    for d in dicts:
+        keys.update(dict.fromkeys(d))
+    return list(keys)
+
+
+def encode_column(name: str, values: List[Any], intern: Interner) -> dict:
+    """Pick the densest encoding that fits every present value of one field."""
+    col: Dict[str, Any] = {"name": name}
+    if all(isinstance(v, str) for v in values):
+        col.update(kind="str", data=[intern(v) for v in values])
+    elif all(_is_num(v) for v in values):
+        col.update(kind="num", data=values)
+    elif all(isinstance(v, list) and all(isinstance(s, str) for s in v) for v in values):
+        col.update(kind="str[]", data=[[intern(s) for s in v] for v in values])
+    elif all(isinstance(v, dict) and all(isinstance(x, str) for x in v.values()) for v in values):
+        keys = _key_order(values)
+        col.update(kind="strmap", keys=keys, data=[intern(v[k]) if k in v else -1 for v in values for k in keys])
+    elif all(isinstance(v, dict) and all(_is_num(x) for x in v.values()) for v in values) and len(_key_order(values)) <= MAX_MASK_KEYS:
+        keys = _key_order(values)
+        col.update(kind="nummap", keys=keys, data=[v.get(k, 0) for v in values for k in keys])
+        masks = [sum(1 << b for b, k in enumerate(keys) if k in v) for v in values]
+        if any(m != (1 << len(keys)) - 1 for m in masks):
+            col["mask"] = masks
+    elif all(isinstance(v, list) and all(isinstance(r, dict) for r in v) for v in values):
+        offsets = [0]
+        for v in values:
+            offsets.append(offsets[-1] + len(v))
+        col.update(kind="table", offsets=offsets, table=encode_table([r for v in values for r in v], intern))
+    else:
+        col.update(kind="json", data=values)
+    return col
+
+
+def encode_table(rows: Sequence[dict], intern: Interner) -> dict:
+    columns = []
+    for name in _key_order(rows):
+        missing = [i for i, r in enumerate(rows) if name not in r]
+        col = encode_column(name, [r[name] for r in rows if name in r], intern)
+        if missing:
+            col["missing"] = missing
+        columns.append(col)
+    return {"rows": len(rows), "columns": columns}
+
+
+def decode_table(table: dict, strings: Sequence[str]) -> List[dict]:
+    """Python mirror of the client decoder, used by --check."""
+    n = table["rows"]
+    rows: List[dict] = [{} for _ in range(n)]
+    for col in table["columns"]:
+        missing = set(col.get("missing", ()))
+        present = [i for i in range(n) if i not in missing]
+        kind = col["kind"]
+        if kind == "str":
+            values = [strings[i] for i in col["data"]]
+        elif kind in ("num", "json"):
+            values = col["data"]
+        elif kind == "str[]":
+            values = [[strings[i] for i in v] for v in col["data"]]
+        elif kind in ("strmap", "nummap"):
+            keys, width = col["keys"], len(col["keys"])
+            masks = col.get("mask")
+            values = []
+            for j in range(len(present)):
+                cells = col["data"][j * width : (j + 1) * width]
+                if kind == "strmap":
+                    values.append({k: strings[c] for k, c in zip(keys, cells) if c >= 0})
+                else:
+                    values.append({k: c for b, (k, c) in enumerate(zip(keys, cells)) if masks is None or masks[j] >> b & 1})
+        elif kind == "table":
+            children = decode_table(col["table"], strings)
+            offsets = col["offsets"]
+            values = [children[offsets[j] : offsets[j + 1]] for j in range(len(present))]
+        else:
+            raise ValueError(f"unknown column kind {kind!r}")
+        for i, v in zip(present, values):
+            rows[i][col["name"]] = v
+    return rows
+
+
+def load_json(path: Path) -> dict:
+    with path.open(encoding="utf-8") as f:
+        return json.load(f)
+
+
+def build_bundle(baseline: dict, decks: Dict[str, dict]) -> dict:
+    intern = Interner()
+    packed: Dict[str, dict] = {}
+    for name, doc in decks.items():
+        rows = doc[name]
+        packed[name] = {
+            "meta": {k: v for k, v in doc.items() if k != name},
+            "table": encode_table(rows, intern),
+        }
+    return {
+        "schema": BUNDLE_SCHEMA,
+        "version": BUNDLE_VERSION,
+        "baseline": {k: baseline[k] for k in BASELINE_KEYS if k in baseline},
+        "decks": packed,
+        "strings": intern.strings,
+    }
+
+
+def decode_bundle(bundle: dict) -> Dict[str, List[dict]]:
+    return {name: decode_table(deck["table"], bundle["strings"]) for name, deck in bundle["decks"].items()}
+
+
+def write_bundle(bundle: dict, out_dir: Path, sources: Dict[str, Path]) -> dict:
+    """Write the hashed bundle files and the manifest; returns the manifest."""
+    data = json.dumps(bundle, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    digest = hashlib.sha256(data).hexdigest()[:12]
+    variants = {"json": data, "gzip": gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants["br"] = brotli.compress(data, quality=11)
+    suffix = {"json": ".json", "gzip": ".json.gz", "br": ".json.br"}
+    out_dir.mkdir(parents=True, exist_ok=True)
+    files = {}
+    for kind, payload in variants.items():
+        name = f"{BUNDLE_STEM}.{digest}{suffix[kind]}"
+        (out_dir / name).write_bytes(payload)
+        files[kind] = {"file": name, "bytes": len(payload)}
+    current = {f["file"] for f in files.values()}
+    for old in out_dir.glob(f"{BUNDLE_STEM}.*"):
+        if old.name not in current:
+            old.unlink()
+    manifest = {
+        "schema": BUNDLE_SCHEMA,
+        "version": BUNDLE_VERSION,
+        "hash": digest,
+        "files": files,
+        "source_bytes": {name: path.stat().st_size for name, path in sources.items()},
+    }
+    with (out_dir / MANIFEST_NAME).open("w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def parse_args(argv: Sequence[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--out-dir", type=Path, default=OUT_DIR)
+    parser.add_argument("--check", action="store_true", help="decode the bundle and compare it with the source decks")
+    return parser.parse_args(argv)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    sources = {"baseline": BASELINE_PATH, **DECK_PATHS}
+    missing = [str(p) for p in sources.values() if not p.exists()]
+    if missing:
+        raise SystemExit(f"Missing {', '.join(missing)}. Run scripts/build_baseline.py first.")
+    baseline = load_json(BASELINE_PATH)
+    decks = {name: load_json(path) for name, path in DECK_PATHS.items()}
+    bundle = build_bundle(baseline, decks)
+    if args.check:
+        decoded = decode_bundle(bundle)
+        bad = [name for name, doc in decks.items() if decoded[name] != doc[name]]
+        if bad:
+            print(f"decoded decks differ from sources: {bad}", file=sys.stderr)
+            return 2
+        print(f"decoded decks match sources ({', '.join(decks)})")
+    manifest = write_bundle(bundle, args.out_dir, sources)
+    before = sum(manifest["source_bytes"].values())
+    for kind, info in manifest["files"].items():
+        print(f"wrote {args.out_dir / info['file']} ({info['bytes']} bytes, {info['bytes'] / before:.1%} of {before} source bytes)")
+    if brotli is None:
+        print("brotli module not installed; skipped the .br variant")
+    print(f"wrote {args.out_dir / MANIFEST_NAME}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
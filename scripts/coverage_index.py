@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""Country x year x indicator completeness bitmap over an observation set.
+
+One bit per (indicator, country, year) cell says whether a value exists. A
+second bitmap marks the cells whose value is direct rather than derived
+(`quality_flag` not starting with `derived`). Both are kept in two layouts:
+
+- by indicator: one bitset per indicator, countries laid end to end with
+  `n_years` bits each (bit `c * n_years + (year - year0)`)
+- by country: one bitset per country, indicators laid end to end
+
+Counting a window for one indicator over any set of countries is then a
+single popcount of the indicator's bitset ANDed with a precomputed mask, and
+the same goes for a country over any set of indicators. Completeness by
+domain, source, country or indicator takes one big-int operation per row of
+the matching layout, whatever the number of cells.
+
+The index is built in one streaming pass over the store columns (or CSV
+rows). It is saved as one file: a JSON header line (axes, per-indicator
+domain and source, the input's size and mtime), then the four bitmaps as
+fixed-width little-endian rows. `diff` compares two indices cell by cell
+across differing axes.
+
+Usage:
+- python3 scripts/coverage_index.py build [CSV]
+- python3 scripts/coverage_index.py gaps INDICATOR COUNTRY [FROM TO]
+- python3 scripts/coverage_index.py diff OLD_INDEX NEW_INDEX
+"""
+
+from __future__ import annotations
+
+import csv
+import json
+import sys
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Sequence, Tuple
+
+import observation_store
+
+ROOT = Path(__file__).resolve().parents[1]
+CATALOG_PATH = ROOT / "data" / "indicator_catalog_v1.csv"
+OBS_PATH = ROOT / "data" / "processed" / "observations_v1.csv"
+INDEX_PATH = ROOT / "data" / "processed" / "coverage_index_v1.bin"
+
+INDEX_VERSION = 1
+LAYERS = ("observed", "direct")
+
+Window = Tuple[int, int]
+
+
+def runs(bits: int, n: int) -> List[Tuple[int, int]]:
+    """Maximal runs of clear bits among the low `n` bits, as inclusive (start, end) offsets."""
+    out = []
+    start = None
+    for k in range(n):
+        if not (bits >> k) & 1:
+            if start is None:
+                start = k
+        elif start is not None:
+            out.append((start, k - 1))
+            start = None
+    if start is not None:
+        out.append((start, n - 1))
+    return out
+
+
+class CoverageIndex:
+    def __init__(self, indicators: Sequence[str], countries: Sequence[str], year0: int, n_years: int, meta: Dict[str, dict], source: dict | None = None) -> None:
+        self.indicators = list(indicators)
+        self.countries = list(countries)
+        self.year0 = year0
+        self.n_years = n_years
+        self.meta = meta  # indicator -> {"domain", "source"}
+        self.source = source or {}
+        self.ind_pos = {name: i for i, name in enumerate(self.indicators)}
+        self.country_pos = {name: c for c, name in enumerate(self.countries)}
+        # layer -> rows of bitsets
+        self.by_indicator: Dict[str, List[int]] = {layer: [0] * len(self.indicators) for layer in LAYERS}
+        self.by_country: Dict[str, List[int]] = {layer: [0] * len(self.countries) for layer in LAYERS}
+        self._masks: Dict[tuple, int] = {}
+
+    # -- building ----------------------------------------------------------
+
+    @classmethod
+    def build(cls, path: Path, catalog_path: Path | None = CATALOG_PATH) -> "CoverageIndex":
+        """One streaming pass over `path` (its fresh store, else the CSV)."""
+        meta: Dict[str, dict] = {}
+        if catalog_path is not None and catalog_path.exists():
+            with catalog_path.open(newline="", encoding="utf-8") as f:
+                for row in csv.DictReader(f):
+                    meta[row["indicator_id"]] = {"domain": row["domain"], "source": row["source"]}
+        st = path.stat() if path.exists() else None
+        source = {"path": str(path), "bytes": st.st_size if st else None, "mtime_ns": st.st_mtime_ns if st else None}
+        store = observation_store.open_for(path)
+        if store is not None:
+            try:
+                flags = [observation_store.is_derived(f) for f in store.flags]
+                for ind, var in set(zip(store.indicator, store.variant)):
+                    variant = store.variants[var]
+                    meta.setdefault(store.indicators[ind], {"domain": variant.get("domain", ""), "source": variant.get("source", "")})
+                rows = zip(store.indicator, store.country, store.year, (not flags[f] for f in store.flag))
+                return cls._from_cells(store.indicators, store.countries, min(store.year), max(store.year), meta, source, rows)
+            finally:
+                store.close()
+        indicators: Dict[str, int] = {}
+        countries: Dict[str, int] = {}
+        cells: List[Tuple[int, int, int, bool]] = []
+        with path.open(newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                name = row["indicator_id"]
+                if name not in meta:
+                    meta[name] = {"domain": row.get("domain", ""), "source": row.get("source", "")}
+                i = indicators.setdefault(name, len(indicators))
+                c = countries.setdefault(row["country_id"], len(countries))
+                cells.append((i, c, int(row["year"]), not observation_store.is_derived(row.get("quality_flag", ""))))
+        years = [cell[2] for cell in cells] or [0]
+        return cls._from_cells(list(indicators), list(countries), min(years), max(years), meta, source, cells)
+
+    @classmethod
+    def _from_cells(cls, data_indicators: Sequence[str], data_countries: Sequence[str], lo: int, hi: int, meta: Dict[str, dict], source: dict, cells: Iterable[Tuple[int, int, int, bool]]) -> "CoverageIndex":
+        """Build from (indicator code, country code, year, direct) cells; codes index the data axes."""
+        indicators = sorted(set(data_indicators) | set(meta))
+        countries = sorted(data_countries)
+        index = cls(indicators, countries, lo, hi - lo + 1, {k: meta[k] for k in indicators}, source)
+        ny, n_ind, n_cty = index.n_years, len(indicators), len(countries)
+        ind_map = [index.ind_pos[name] for name in data_indicators]
+        cty_map = [index.country_pos[name] for name in data_countries]
+        ind_width, cty_width = (n_cty * ny + 7) // 8, (n_ind * ny + 7) // 8
+        bufs = {
+            ("by_indicator", layer): bytearray(n_ind * ind_width) for layer in LAYERS
+        }
+        bufs.update({("by_country", layer): bytearray(n_cty * cty_width) for layer in LAYERS})
+        obs_i, dir_i = bufs["by_indicator", "observed"], bufs["by_indicator", "direct"]
+        obs_c, dir_c = bufs["by_country", "observed"], bufs["by_country", "direct"]
+        for ind, country, year, direct in cells:
+            i, c, t = ind_map[ind], cty_map[country], year - lo
+            k = i * ind_width * 8 + c * ny + t
+            m = c * cty_width * 8 + i * ny + t
+            obs_i[k >> 3] |= 1 << (k & 7)
+            obs_c[m >> 3] |= 1 << (m & 7)
+            if direct:
+                dir_i[k >> 3] |= 1 << (k & 7)
+                dir_c[m >> 3] |= 1 << (m & 7)
+        index._unpack(bufs, ind_width, cty_width)
+        return index
+
+    def _unpack(self, bufs: Dict[Tuple[str, str], bytes], ind_width: int, cty_width: int) -> None:
+        for layer in LAYERS:
+            view = memoryview(bufs["by_indicator", layer])
+            self.by_indicator[layer] = [int.from_bytes(view[i * ind_width : (i + 1) * ind_width], "little") for i in range(len(self.indicators))]
+            view = memoryview(bufs["by_country", layer])
+            self.by_country[layer] = [int.from_bytes(view[c * cty_width : (c + 1) * cty_width], "little") for c in range(len(self.countries))]
+
+    # -- persistence -------------------------------------------------------
+
+    def save(self, path: Path = INDEX_PATH) -> None:
+        ny = self.n_years
+        ind_width, cty_width = (len(self.countries) * ny + 7) // 8, (len(self.indicators) * ny + 7) // 8
+        header = {
+            "version": INDEX_VERSION,
+            "year0": self.year0,
+            "n_years": ny,
+            "indicators": self.indicators,
+            "countries": self.countries,
+            "meta": self.meta,
+            "source": self.source,
+        }
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        with tmp.open("wb") as f:
+            f.write(json.dumps(header, separators=(",", ":")).encode("utf-8") + b"\n")
+            for layout, width in (("by_indicator", ind_width), ("by_country", cty_width)):
+                for layer in LAYERS:
+                    for bits in getattr(self, layout)[layer]:
+                        f.write(bits.to_bytes(width, "little"))
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: Path = INDEX_PATH) -> "CoverageIndex":
+        data = path.read_bytes()
+        eol = data.index(b"\n")
+        header = json.loads(data[:eol])
+        if header.get("version") != INDEX_VERSION:
+            raise ValueError(f"{path}: unsupported coverage index version {header.get('version')}")
+        index = cls(header["indicators"], header["countries"], header["year0"], header["n_years"], header["meta"], header["source"])
+        ny = index.n_years
+        ind_width, cty_width = (len(index.countries) * ny + 7) // 8, (len(index.indicators) * ny + 7) // 8
+        pos = eol + 1
+        bufs = {}
+        for layout, rows, width in (("by_indicator", len(index.indicators), ind_width), ("by_country", len(index.countries), cty_width)):
+            for layer in LAYERS:
+                bufs[layout, layer] = data[pos : pos + rows * width]
+                pos += rows * width
+        if pos != len(data):
+            raise ValueError(f"{path}: expected {pos} bytes, found {len(data)}")
+        index._unpack(bufs, ind_width, cty_width)
+        return index
+
+    def is_current(self, path: Path) -> bool:
+        """Whether the index was built from `path` as it is now."""
+        if not path.exists():
+            return False
+        st = path.stat()
+        return self.source.get("path") == str(path) and self.source.get("bytes") == st.st_size and self.source.get("mtime_ns") == st.st_mtime_ns
+
+    # -- queries -----------------------------------------------------------
+
+    def window(self, window: Window | None) -> Window:
+        lo, hi = window or (self.year0, self.year0 + self.n_years - 1)
+        return max(lo, self.year0), min(hi, self.year0 + self.n_years - 1)
+
+    def _mask(self, n_slots: int, slots: frozenset | None, window: Window) -> int:
+        """Bits of `window` in each selected slot of a row with `n_slots` slots."""
+        key = (n_slots, slots, window)
+        mask = self._masks.get(key)
+        if mask is None:
+            lo, hi = window
+            span = ((1 << (hi - lo + 1)) - 1) << (lo - self.year0) if hi >= lo else 0
+            mask = 0
+            for s in range(n_slots) if slots is None else sorted(slots):
+                mask |= span << (s * self.n_years)
+            self._masks[key] = mask
+        return mask
+
+    def _select(self, names: Iterable[str] | None, pos: Dict[str, int]) -> frozenset | None:
+        return None if names is None else frozenset(pos[n] for n in names if n in pos)
+
+    def completeness(
+        self,
+        by: str = "domain",
+        window: Window | None = None,
+        countries: Iterable[str] | None = None,
+        indicators: Iterable[str] | None = None,
+        domains: Iterable[str] | None = None,
+        sources: Iterable[str] | None = None,
+    ) -> Dict[str, dict]:
+        """Present, direct and total cells with their shares, grouped `by` domain, source, indicator or country."""
+        lo, hi = self.window(window)
+        years = max(0, hi - lo + 1)
+        domain_set = None if domains is None else set(domains)
+        source_set = None if sources is None else set(sources)
+        chosen = [
+            name
+            for name in (self.indicators if indicators is None else [n for n in indicators if n in self.ind_pos])
+            if (domain_set is None or self.meta[name]["domain"] in domain_set) and (source_set is None or self.meta[name]["source"] in source_set)
+        ]
+        country_slots = self._select(countries, self.country_pos)
+        n_countries = len(self.countries) if country_slots is None else len(country_slots)
+        groups: Dict[str, List[int]] = {}
+        if by == "country":
+            mask = self._mask(len(self.indicators), frozenset(self.ind_pos[n] for n in chosen), (lo, hi))
+            for c, name in enumerate(self.countries):
+                if country_slots is None or c in country_slots:
+                    groups[name] = [
+                        (self.by_country["observed"][c] & mask).bit_count(),
+                        (self.by_country["direct"][c] & mask).bit_count(),
+                        len(chosen) * years,
+                    ]
+        else:
+            if by not in ("domain", "source", "indicator"):
+                raise ValueError(f"cannot group by {by!r}")
+            mask = self._mask(len(self.countries), country_slots, (lo, hi))
+            for name in chosen:
+                i = self.ind_pos[name]
+                key = name if by == "indicator" else self.meta[name][by]
+                acc = groups.setdefault(key, [0, 0, 0])
+                acc[0] += (self.by_indicator["observed"][i] & mask).bit_count()
+                acc[1] += (self.by_indicator["direct"][i] & mask).bit_count()
+                acc[2] += n_countries * years
+        return {
+            key: {
+                "present": present,
+                "direct": direct,
+                "cells": cells,
+                "completeness_pct": round(100.0 * present / cells, 1) if cells else 0.0,
+                "direct_pct": round(100.0 * direct / present, 1) if present else 0.0,
+            }
+            for key, (present, direct, cells) in sorted(groups.items())
+        }
+
+    def series_bits(self, indicator: str, country: str, layer: str = "observed") -> int:
+        return (self.by_indicator[layer][self.ind_pos[indicator]] >> (self.country_pos[country] * self.n_years)) & ((1 << self.n_years) - 1)
+
+    def gaps(self, indicator: str, country: str, window: Window | None = None) -> List[Tuple[int, int]]:
+        """Missing year runs (inclusive) of one series within `window`."""
+        lo, hi = self.window(window)
+        if hi < lo:
+            return []
+        if indicator not in self.ind_pos or country not in self.country_pos:
+            return [(lo, hi)]
+        bits = self.series_bits(indicator, country) >> (lo - self.year0)
+        return [(lo + a, lo + b) for a, b in runs(bits, hi - lo + 1)]
+
+    def iter_gaps(self, window: Window | None = None) -> Iterator[Tuple[str, str, List[Tuple[int, int]]]]:
+        """(indicator, country, runs) for every series with a gap in `window`, skipping complete rows fast."""
+        lo, hi = self.window(window)
+        mask = self._mask(len(self.countries), None, (lo, hi))
+        full = (hi - lo + 1) * len(self.countries)
+        for i, name in enumerate(self.indicators):
+            if (self.by_indicator["observed"][i] & mask).bit_count() == full:
+                continue
+            for country in self.countries:
+                gap = self.gaps(name, country, (lo, hi))
+                if gap:
+                    yield name, country, gap
+
+
+def aligned_bits(index: CoverageIndex, indicator: str, country: str, year0: int) -> int:
+    """Observed bits of one series with bit 0 at `year0` (<= index.year0)."""
+    if indicator not in index.ind_pos or country not in index.country_pos:
+        return 0
+    return index.series_bits(indicator, country) << (index.year0 - year0)
+
+
+def diff(old: CoverageIndex, new: CoverageIndex) -> dict:
+    """Cells gained and lost between two indices, per indicator and in total."""
+    year0 = min(old.year0, new.year0)
+    changes: Dict[str, dict] = {}
+    gained_total = lost_total = 0
+    countries = sorted(set(old.countries) | set(new.countries))
+    for name in sorted(set(old.indicators) | set(new.indicators)):
+        gained: Dict[str, List[int]] = {}
+        lost: Dict[str, List[int]] = {}
+        for country in countries:
+            before, after = aligned_bits(old, name, country, year0), aligned_bits(new, name, country, year0)
+            if before == after:
+                continue
+            for bits, out in ((after & ~before, gained), (before & ~after, lost)):
+                if bits:
+                    out[country] = [year0 + k for k in range(bits.bit_length()) if (bits >> k) & 1]
+        if gained or lost:
+            n_gained, n_lost = sum(map(len, gained.values())), sum(map(len, lost.values()))
+            changes[name] = {"gained_cells": n_gained, "lost_cells": n_lost, "gained": gained, "lost": lost}
+            gained_total += n_gained
+            lost_total += n_lost
+    return {
+        "gained_cells": gained_total,
+        "lost_cells": lost_total,
+        "indicators_added": sorted(set(new.indicators) - set(old.indicators)),
+        "indicators_removed": sorted(set(old.indicators) - set(new.indicators)),
+        "countries_added": sorted(set(new.countries) - set(old.countries)),
+        "countries_removed": sorted(set(old.countries) - set(new.countries)),
+        "by_indicator": changes,
+    }
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    args = list(sys.argv[1:] if argv is None else argv)
+    if not args or args[0] not in {"build", "gaps", "diff"}:
+        print(__doc__.split("Usage:")[1].strip(), file=sys.stderr)
+        return 1
+    if args[0] == "build":
+        path = Path(args[1]) if len(args) > 1 else OBS_PATH
+        index = CoverageIndex.build(path)
+        index.save()
+        print(f"wrote {INDEX_PATH}: {len(index.indicators)} indicators x {len(index.countries)} countries x {index.n_years} years")
+    elif args[0] == "gaps":
+        if len(args) not in (3, 5):
+            print("usage: coverage_index.py gaps INDICATOR COUNTRY [FROM TO]", file=sys.stderr)
+            return 1
+        index = CoverageIndex.load()
+        window = (int(args[3]), int(args[4])) if len(args) == 5 else None
+        for lo, hi in index.gaps(args[1], args[2].upper(), window):
+            print(f"{lo}-{hi}" if hi > lo else str(lo))
+    else:
+        if len(args) != 3:
+            print("usage: coverage_index.py diff OLD_INDEX NEW_INDEX", file=sys.stderr)
+            return 1
+        print(json.dumps(diff(CoverageIndex.load(Path(args[1])), CoverageIndex.load(Path(args[2]))), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
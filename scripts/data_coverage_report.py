@@ -1,38 +1,122 @@
 #!/usr/bin/env python3
-"""Summarize indicator coverage by domain for the normalized dataset."""
+"""Summarize indicator coverage by domain for the normalized dataset.
+
+Beyond which catalog indicators were found at all, the report gives
+country x year completeness (with the direct, non-derived share) by domain,
+source and country, over all years and over the baseline window, the gap
+runs of every incomplete series in the window, and the cells gained or lost
+since the previous run. All of it is read from the coverage bitmap in
+`data/processed/coverage_index_v1.bin` (see scripts/coverage_index.py), which
+is rebuilt in one streaming pass only when the observations changed.
+
+Stage timings go to data/processed/metrics/data_coverage_report.jsonl (see
+scripts/metrics.py), not into the report, which stays deterministic.
+"""
 
 from __future__ import annotations
 
+import argparse
 import csv
 import json
+import sys
 from collections import defaultdict
 from pathlib import Path
+from typing import Dict, Sequence
+
+import metrics
+from baseline_spec import BASELINE_WINDOW
+from coverage_index import CoverageIndex, diff
 
 ROOT = Path(__file__).resolve().parents[1]
 CATALOG = ROOT / "data" / "indicator_catalog_v1.csv"
 OBS = ROOT / "data" / "processed" / "observations_v1.csv"
 OBS_FALLBACK = ROOT / "data" / "processed" / "world_bank_observations.csv"
 OUT = ROOT / "data" / "processed" / "coverage_report.json"
+INDEX = ROOT / "data" / "processed" / "coverage_index_v1.bin"
+
+
+def total(groups: Dict[str, dict]) -> dict:
+    present = sum(g["present"] for g in groups.values())
+    cells = sum(g["cells"] for g in groups.values())
+    direct = sum(g["direct"] for g in groups.values())
+    return {
+        "present": present,
+        "direct": direct,
+        "cells": cells,
+        "completeness_pct": round(100.0 * present / cells, 1) if cells else 0.0,
+        "direct_pct": round(100.0 * direct / present, 1) if present else 0.0,
+    }
+
+
+def span(lo: int, hi: int) -> str:
+    return str(lo) if lo == hi else f"{lo}-{hi}"
 
 
-def main() -> int:
+def completeness_section(index: CoverageIndex, window) -> dict:
+    lo, hi = index.window(window)
+    by_domain = index.completeness("domain", (lo, hi))
+    return {
+        "start_year": lo,
+        "end_year": hi,
+        "overall": total(by_domain),
+        "by_domain": by_domain,
+        "by_source": index.completeness("source", (lo, hi)),
+        "by_country": index.completeness("country", (lo, hi)),
+    }
+
+
+def gap_section(index: CoverageIndex, window, found: set) -> dict:
+    """Per found indicator: countries with no data in `window`, and gap runs of the partial ones."""
+    lo, hi = index.window(window)
+    out: Dict[str, dict] = {}
+    for ind, country, runs in index.iter_gaps((lo, hi)):
+        if ind not in found:
+            continue
+        entry = out.setdefault(ind, {"missing_countries": [], "gaps": {}})
+        if runs == [(lo, hi)]:
+            entry["missing_countries"].append(country)
+        else:
+            entry["gaps"][country] = [span(a, b) for a, b in runs]
+    return out
+
+
+def parse_args(argv: Sequence[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rebuild", action="store_true", help="rebuild the coverage index even if it is current")
+    metrics.add_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    recorder = metrics.from_args("data_coverage_report", args)
     catalog = {}
     by_domain_total = defaultdict(int)
     by_domain_found = defaultdict(int)
     found_indicators = set()
 
-    with CATALOG.open(newline="", encoding="utf-8") as f:
-        r = csv.DictReader(f)
-        for row in r:
-            ind = row["indicator_id"]
-            catalog[ind] = row
-            by_domain_total[row["domain"]] += 1
+    with recorder.stage("load"):
+        with CATALOG.open(newline="", encoding="utf-8") as f:
+            r = csv.DictReader(f)
+            for row in r:
+                ind = row["indicator_id"]
+                catalog[ind] = row
+                by_domain_total[row["domain"]] += 1
 
-    obs_path = OBS if OBS.exists() else OBS_FALLBACK
-    with obs_path.open(newline="", encoding="utf-8") as f:
-        r = csv.DictReader(f)
-        for row in r:
-            found_indicators.add(row["indicator_id"])
+        obs_path = OBS if OBS.exists() else OBS_FALLBACK
+        previous = None
+        if INDEX.exists():
+            try:
+                previous = CoverageIndex.load(INDEX)
+            except ValueError as exc:
+                print(f"ignoring coverage index: {exc}", file=sys.stderr)
+        if previous is not None and not args.rebuild and previous.is_current(obs_path):
+            index = previous
+        else:
+            index = CoverageIndex.build(obs_path, CATALOG)
+            index.save(INDEX)
+            recorder.count("index_rebuilt", 1)
+        found_indicators.update(name for name, bits in zip(index.indicators, index.by_indicator["observed"]) if bits)
 
     for ind in found_indicators:
         row = catalog.get(ind)
@@ -54,6 +138,15 @@ def main() -> int:
             "coverage_pct": round((found / total) * 100.0, 1) if total else 0.0,
         }
 
+    with recorder.stage("query"):
+        report["completeness"] = completeness_section(index, None)
+        report["baseline_completeness"] = completeness_section(index, BASELINE_WINDOW)
+        report["baseline_gaps"] = gap_section(index, BASELINE_WINDOW, found_indicators)
+        if previous is None:
+            report["changes_since_last_run"] = None
+        else:
+            report["changes_since_last_run"] = diff(previous, index)
+
     for ind, row in catalog.items():
         if ind not in found_indicators and row["source"] in {"World Bank", "WGI"}:
             report["missing_indicators"].append(
@@ -69,7 +162,15 @@ def main() -> int:
     with OUT.open("w", encoding="utf-8") as f:
         json.dump(report, f, indent=2)
 
-    print(json.dumps(report, indent=2))
+    recorder.close()
+    summary = {k: report[k] for k in ("domain_coverage", "missing_indicators", "found_indicator_count", "catalog_indicator_count")}
+    summary["completeness_pct"] = report["completeness"]["overall"]["completeness_pct"]
+    summary["baseline_completeness_pct"] = report["baseline_completeness"]["overall"]["completeness_pct"]
+    changes = report["changes_since_last_run"]
+    if changes is not None:
+        summary["changes_since_last_run"] = {"gained_cells": changes["gained_cells"], "lost_cells": changes["lost_cells"]}
+    print(json.dumps(summary, indent=2))
+    print(f"wrote {OUT}")
     return 0
 
 
@@ -0,0 +1,496 @@
+#!/usr/bin/env python3
+"""Local HTTP server for the web prototype and the pipeline outputs.
+
+A replacement for `python3 -m http.server`, built on asyncio streams (HTTP/1.1
+with keep-alive, GET and HEAD only):
+
+- `/web/...` and `/data/...` serve files from the repository
+- `/api/observations?country=FRA&indicator=DEBT_GDP&from=2010&to=2020` answers
+  from an in-memory index of the observations by (country, indicator). Each
+  series keeps its years sorted, so a year range is two bisects. `country` and
+  `indicator` take comma-separated lists, and either may be omitted, but not
+  both.
+- `/api/indicators`, `/api/countries` and `/api/status` list what is loaded
+
+Every response carries a strong ETag (a hash of the bytes sent, one per
+content coding) and `Vary: Accept-Encoding`. `If-None-Match` requests get a
+304. Text-like bodies over 1 KiB are sent gzip-encoded when the client
+accepts it, or brotli-encoded when the `brotli` module is installed and
+accepted. Content-hashed bundle files are marked immutable and everything
+else `no-cache`, so browsers revalidate cheaply.
+
+The observation index and everything under `data/calibrated/` and
+`data/runtime/` (read, validated and pre-compressed) form one snapshot. A
+watcher polls their sizes and mtimes. Once a change has been stable for one
+poll interval, it builds a new snapshot in a worker thread and swaps it in
+with a single assignment, so a request sees either the old outputs or the
+new ones, never a mix. A snapshot that fails to load, or whose inputs changed
+while loading, is discarded and retried.
+
+Inputs:
+- data/processed/observations_gated_v1.csv (else observations_v1.csv, as in
+  build_baseline.py), read from its .store/ when fresh
+- data/calibrated/*, data/runtime/*, web/*
+
+Usage:
+- python3 scripts/data_server.py --port 4173   # then open http://localhost:4173/web/
+- curl -s 'http://localhost:4173/api/observations?country=FRA&indicator=DEBT_GDP&from=2010&to=2020'
+- python3 scripts/load_test_data_server.py
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import csv
+import gzip
+import hashlib
+import json
+import mimetypes
+import re
+import sys
+import time
+import urllib.parse
+from array import array
+from bisect import bisect_left, bisect_right
+from email.utils import formatdate
+from pathlib import Path
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import observation_store
+from baseline_spec import GATED_OBS_PATH, OBS_FALLBACK_PATH, OBS_PATH, observations_path
+
+try:
+    import brotli
+except ImportError:  # optional: only the br content coding needs it
+    brotli = None
+
+ROOT = Path(__file__).resolve().parents[1]
+ARTIFACT_DIRS = (ROOT / "data" / "calibrated", ROOT / "data" / "runtime")
+STATIC_DIRS = (ROOT / "web", ROOT / "data")
+
+COMPRESSIBLE = {".json", ".js", ".css", ".html", ".csv", ".svg", ".txt", ".md", ".map"}
+MIN_COMPRESS_BYTES = 1024
+IMMUTABLE_NAME = re.compile(r"\.[0-9a-f]{12}\.json(\.gz|\.br)?$")
+MAX_CACHED_RESPONSES = 4096
+KEEPALIVE_SECONDS = 15.0
+REASONS = {200: "OK", 302: "Found", 304: "Not Modified", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+Signature = Tuple[Tuple[str, int, int], ...]
+
+
+def content_type(path: str) -> str:
+    if path.endswith(".gz"):
+        return "application/gzip"
+    guessed = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    return f"{guessed}; charset=utf-8" if guessed.startswith("text/") or guessed in ("application/json", "application/javascript") else guessed
+
+
+class Resource:
+    """One body with its per-coding variants, each with a strong ETag."""
+
+    def __init__(self, body: bytes, ctype: str, cache_control: str = "no-cache", compress: bool = True) -> None:
+        self.ctype = ctype
+        self.cache_control = cache_control
+        digest = hashlib.sha256(body).hexdigest()[:20]
+        self.variants: Dict[str, Tuple[bytes, str]] = {"identity": (body, f'"{digest}"')}
+        if compress and len(body) >= MIN_COMPRESS_BYTES:
+            self.variants["gzip"] = (gzip.compress(body, compresslevel=6, mtime=0), f'"{digest}-gz"')
+            if brotli is not None:
+                self.variants["br"] = (brotli.compress(body, quality=5), f'"{digest}-br"')
+
+    def select(self, accept_encoding: str) -> Tuple[str, bytes, str]:
+        accepted = parse_accept_encoding(accept_encoding)
+        for coding in ("br", "gzip"):
+            if coding in self.variants and accepted.get(coding, accepted.get("*", 0.0)) > 0:
+                return (coding, *self.variants[coding])
+        return ("identity", *self.variants["identity"])
+
+    def matches(self, if_none_match: str) -> bool:
+        if if_none_match.strip() == "*":
+            return True
+        tags = {t.strip().removeprefix("W/") for t in if_none_match.split(",")}
+        return any(etag in tags for _, etag in self.variants.values())
+
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    accepted: Dict[str, float] = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding.strip().lower()] = q
+    return accepted
+
+
+def json_resource(payload: object) -> Resource:
+    return Resource(json.dumps(payload, separators=(",", ":")).encode("utf-8"), "application/json; charset=utf-8")
+
+
+class ObservationIndex:
+    """Observations as (country, indicator) -> ascending years with values and flags."""
+
+    def __init__(self) -> None:
+        self.series: Dict[Tuple[str, str], Tuple[array, array, List[str]]] = {}
+        self.indicator_meta: Dict[str, dict] = {}
+        self.rows = 0
+
+    @classmethod
+    def load(cls, path: Path) -> "ObservationIndex":
+        index = cls()
+        grouped: Dict[Tuple[str, str], List[Tuple[int, float, str]]] = {}
+        store = observation_store.open_for(path)
+        if store is not None:
+            try:
+                countries, names, flags = store.countries, store.indicators, store.flags
+                for c, i, year, value, flag in zip(store.country, store.indicator, store.year, store.value, store.flag):
+                    grouped.setdefault((countries[c], names[i]), []).append((year, value, flags[flag]))
+                meta = {name: dict(store.indicator_meta.get(name, {})) for name in names}
+                for ind, var in set(zip(store.indicator, store.variant)):
+                    variant = store.variants[var]
+                    meta[names[ind]].setdefault("indicator_name", variant.get("indicator_name", ""))
+                    meta[names[ind]].setdefault("unit", variant.get("unit", ""))
+                    meta[names[ind]].setdefault("domain", variant.get("domain", ""))
+            finally:
+                store.close()
+        else:
+            meta = {}
+            with path.open(newline="", encoding="utf-8") as f:
+                for row in csv.DictReader(f):
+                    key = (row["country_id"], row["indicator_id"])
+                    grouped.setdefault(key, []).append((int(row["year"]), float(row["value"]), row.get("quality_flag", "")))
+                    meta.setdefault(row["indicator_id"], {k: row.get(k, "") for k in ("indicator_name", "unit", "domain")})
+        for key, points in grouped.items():
+            points.sort()
+            index.series[key] = (array("h", [p[0] for p in points]), array("d", [p[1] for p in points]), [p[2] for p in points])
+            index.rows += len(points)
+        for name, info in meta.items():
+            index.indicator_meta[name] = {k: info.get(k, "") for k in ("indicator_name", "domain", "unit", "source", "lag_class")}
+        return index
+
+    def countries(self) -> List[str]:
+        return sorted({c for c, _ in self.series})
+
+    def indicators(self) -> List[str]:
+        return sorted({i for _, i in self.series})
+
+    def query(self, countries: Sequence[str], indicators: Sequence[str], lo: int, hi: int) -> List[dict]:
+        out = []
+        for country in countries:
+            for indicator in indicators:
+                entry = self.series.get((country, indicator))
+                if entry is None:
+                    continue
+                years, values, flags = entry
+                a, b = bisect_left(years, lo), bisect_right(years, hi)
+                if a < b:
+                    out.append({"country_id": country, "indicator_id": indicator, "years": years[a:b].tolist(), "values": values[a:b].tolist(), "quality_flags": flags[a:b]})
+        return out
+
+
+def watched_paths(obs_override: Path | None) -> List[Path]:
+    if obs_override is not None:
+        candidates = [obs_override]
+    else:
+        candidates = [GATED_OBS_PATH, OBS_PATH, OBS_FALLBACK_PATH]
+    paths = []
+    for csv_path in candidates:
+        paths += [csv_path, observation_store.store_path(csv_path) / "meta.json"]
+    for directory in ARTIFACT_DIRS:
+        if directory.exists():
+            paths += sorted(p for p in directory.iterdir() if p.is_file())
+    return paths
+
+
+def signature(paths: Iterable[Path]) -> Signature:
+    out = []
+    for path in paths:
+        try:
+            st = path.stat()
+        except OSError:
+            continue
+        out.append((str(path), st.st_mtime_ns, st.st_size))
+    return tuple(out)
+
+
+def current_signature(obs_override: Path | None) -> Signature:
+    return signature(watched_paths(obs_override))
+
+
+class Snapshot:
+    """Everything the watcher reloads together: the observation index and the artifacts."""
+
+    def __init__(self, generation: int, obs_path: Path, index: ObservationIndex, artifacts: Dict[str, Resource], sig: Signature) -> None:
+        self.generation = generation
+        self.obs_path = obs_path
+        self.index = index
+        self.artifacts = artifacts
+        self.signature = sig
+        self.loaded_at = time.time()
+        self.responses: Dict[str, Resource] = {}
+
+    @classmethod
+    def load(cls, generation: int, obs_override: Path | None = None) -> "Snapshot":
+        """Load and validate; raises ValueError when the outputs changed mid-load or are malformed."""
+        before = current_signature(obs_override)
+        obs_path = obs_override or observations_path()
+        index = ObservationIndex.load(obs_path)
+        artifacts: Dict[str, Resource] = {}
+        for directory in ARTIFACT_DIRS:
+            if not directory.exists():
+                continue
+            for path in sorted(p for p in directory.iterdir() if p.is_file()):
+                body = path.read_bytes()
+                if path.suffix == ".json":
+                    json.loads(body)  # refuse half-written outputs
+                url = "/" + path.relative_to(ROOT).as_posix()
+                immutable = IMMUTABLE_NAME.search(path.name) is not None
+                cache = "public, max-age=31536000, immutable" if immutable else "no-cache"
+                artifacts[url] = Resource(body, content_type(path.name), cache, compress=path.suffix in COMPRESSIBLE)
+        after = current_signature(obs_override)
+        if after != before:
+            raise ValueError("outputs changed while loading")
+        return cls(generation, obs_path, index, artifacts, after)
+
+    def cached(self, key: str, build) -> Resource:
+        resource = self.responses.get(key)
+        if resource is None:
+            if len(self.responses) >= MAX_CACHED_RESPONSES:
+                self.responses.clear()
+            resource = self.responses[key] = build()
+        return resource
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+def split_list(values: List[str]) -> List[str]:
+    return [v.strip().upper() for value in values for v in value.split(",") if v.strip()]
+
+
+def year_param(query: Dict[str, List[str]], key: str, default: int) -> int:
+    if key not in query:
+        return default
+    try:
+        return int(query[key][-1])
+    except ValueError:
+        raise HTTPError(400, f"{key} must be a year") from None
+
+
+class DataServer:
+    def __init__(self, obs_override: Path | None = None, poll: float = 2.0) -> None:
+        self.obs_override = obs_override
+        self.poll = poll
+        self.snapshot = Snapshot.load(1, obs_override)
+        self.static: Dict[Path, Tuple[Tuple[int, int], Resource]] = {}
+        self.requests = 0
+        self.started = time.time()
+
+    # -- routing -----------------------------------------------------------
+
+    def resource_for(self, path: str, query: Dict[str, List[str]]) -> Resource:
+        snap = self.snapshot  # one snapshot per request
+        if path == "/api/observations":
+            return self.observations(snap, query)
+        if path == "/api/indicators":
+            return snap.cached("indicators", lambda: json_resource({"generation": snap.generation, "indicators": snap.index.indicator_meta}))
+        if path == "/api/countries":
+            return snap.cached("countries", lambda: json_resource({"generation": snap.generation, "countries": snap.index.countries()}))
+        if path == "/api/status":
+            return json_resource(self.status(snap))
+        if path in snap.artifacts:
+            return snap.artifacts[path]
+        return self.static_file(path)
+
+    def observations(self, snap: Snapshot, query: Dict[str, List[str]]) -> Resource:
+        countries = split_list(query.get("country", []))
+        indicators = split_list(query.get("indicator", []))
+        if not countries and not indicators:
+            raise HTTPError(400, "give country and/or indicator")
+        lo, hi = year_param(query, "from", -(10**4)), year_param(query, "to", 10**4)
+        if lo > hi:
+            raise HTTPError(400, "from is after to")
+        key = f"obs|{','.join(countries)}|{','.join(indicators)}|{lo}|{hi}"
+
+        def build() -> Resource:
+            series = snap.index.query(countries or snap.index.countries(), indicators or snap.index.indicators(), lo, hi)
+            return json_resource({"generation": snap.generation, "series": series})
+
+        return snap.cached(key, build)
+
+    def status(self, snap: Snapshot) -> dict:
+        return {
+            "generation": snap.generation,
+            "loaded_at": formatdate(snap.loaded_at, usegmt=True),
+            "observations_path": str(snap.obs_path),
+            "observation_rows": snap.index.rows,
+            "series": len(snap.index.series),
+            "artifacts": sorted(snap.artifacts),
+            "requests": self.requests,
+            "uptime_seconds": round(time.time() - self.started, 1),
+        }
+
+    def static_file(self, path: str) -> Resource:
+        if path.endswith("/"):
+            path += "index.html"
+        target = (ROOT / path.lstrip("/")).resolve()
+        if not any(target.is_relative_to(d) for d in STATIC_DIRS) or not target.is_file():
+            raise HTTPError(404, "not found")
+        st = target.stat()
+        key = (st.st_mtime_ns, st.st_size)
+        cached = self.static.get(target)
+        if cached is None or cached[0] != key:
+            cached = self.static[target] = (key, Resource(target.read_bytes(), content_type(target.name), compress=target.suffix in COMPRESSIBLE))
+        return cached[1]
+
+    # -- HTTP --------------------------------------------------------------
+
+    def respond(self, method: str, target: str, headers: Dict[str, str]) -> Tuple[int, List[Tuple[str, str]], bytes]:
+        parsed = urllib.parse.urlsplit(target)
+        path = urllib.parse.unquote(parsed.path)
+        if method not in ("GET", "HEAD"):
+            return error_response(405, "only GET and HEAD are supported", [("Allow", "GET, HEAD")])
+        if path in ("/", "/web"):
+            return 302, [("Location", "/web/"), ("Content-Length", "0")], b""
+        try:
+            resource = self.resource_for(path, urllib.parse.parse_qs(parsed.query))
+        except HTTPError as exc:
+            return error_response(exc.status, str(exc))
+        coding, body, etag = resource.select(headers.get("accept-encoding", ""))
+        out = [("ETag", etag), ("Cache-Control", resource.cache_control), ("Vary", "Accept-Encoding")]
+        if resource.matches(headers.get("if-none-match", "")) and "if-none-match" in headers:
+            return 304, out, b""
+        out += [("Content-Type", resource.ctype), ("Content-Length", str(len(body)))]
+        if coding != "identity":
+            out.append(("Content-Encoding", coding))
+        return 200, out, body
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), KEEPALIVE_SECONDS)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                    return
+                except asyncio.LimitOverrunError:
+                    await self.send(writer, "GET", *error_response(400, "headers too large"), keep_alive=False)
+                    return
+                lines = head.decode("latin-1").split("\r\n")
+                parts = lines[0].split(" ")
+                if len(parts) != 3 or not parts[2].startswith("HTTP/1."):
+                    await self.send(writer, "GET", *error_response(400, "malformed request line"), keep_alive=False)
+                    return
+                method, target, version = parts
+                headers = {}
+                for line in lines[1:]:
+                    name, sep, value = line.partition(":")
+                    if sep:
+                        headers[name.strip().lower()] = value.strip()
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+                self.requests += 1
+                try:
+                    status, out, body = self.respond(method, target, headers)
+                except Exception as exc:  # keep serving; report the failure to this client only
+                    status, out, body = error_response(500, f"{type(exc).__name__}: {exc}")
+                await self.send(writer, method, status, out, body, keep_alive)
+                if not keep_alive:
+                    return
+        finally:
+            writer.close()
+
+    async def send(self, writer: asyncio.StreamWriter, method: str, status: int, headers: List[Tuple[str, str]], body: bytes, keep_alive: bool) -> None:
+        lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}", f"Date: {http_date()}", "Server: country-manager-data"]
+        lines += [f"{k}: {v}" for k, v in headers]
+        lines.append(f"Connection: {'keep-alive' if keep_alive else 'close'}")
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + (body if method != "HEAD" else b""))
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+    # -- reloading ---------------------------------------------------------
+
+    async def watch(self) -> None:
+        pending: Signature | None = None
+        while True:
+            await asyncio.sleep(self.poll)
+            sig = await asyncio.to_thread(current_signature, self.obs_override)
+            if sig == self.snapshot.signature:
+                pending = None
+                continue
+            if sig != pending:
+                pending = sig  # wait one interval for the writer to finish
+                continue
+            try:
+                snap = await asyncio.to_thread(Snapshot.load, self.snapshot.generation + 1, self.obs_override)
+            except (OSError, ValueError) as exc:
+                print(f"reload skipped: {exc}", file=sys.stderr)
+                pending = None
+                continue
+            self.snapshot = snap
+            pending = None
+            print(f"reloaded generation {snap.generation}: {snap.index.rows} observations, {len(snap.artifacts)} artifacts", flush=True)
+
+
+_date_cache: Tuple[int, str] = (0, "")
+
+
+def http_date() -> str:
+    global _date_cache
+    now = int(time.time())
+    if _date_cache[0] != now:
+        _date_cache = (now, formatdate(now, usegmt=True))
+    return _date_cache[1]
+
+
+def error_response(status: int, message: str, extra: Sequence[Tuple[str, str]] = ()) -> Tuple[int, List[Tuple[str, str]], bytes]:
+    body = json.dumps({"error": message}).encode("utf-8")
+    return status, [*extra, ("Content-Type", "application/json; charset=utf-8"), ("Content-Length", str(len(body))), ("Cache-Control", "no-store")], body
+
+
+async def serve(server: DataServer, host: str, port: int) -> None:
+    listener = await asyncio.start_server(server.handle, host, port, backlog=1024)
+    bound = listener.sockets[0].getsockname()
+    snap = server.snapshot
+    print(f"serving http://{bound[0]}:{bound[1]}/ (generation {snap.generation}: {snap.index.rows} observations from {snap.obs_path}, {len(snap.artifacts)} artifacts)", flush=True)
+    watcher = asyncio.create_task(server.watch())
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        watcher.cancel()
+
+
+def parse_args(argv: Sequence[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=4173, help="0 picks a free port")
+    parser.add_argument("--observations", type=Path, help="observations CSV (default: as build_baseline.py)")
+    parser.add_argument("--poll", type=float, default=2.0, help="seconds between checks for new pipeline outputs")
+    return parser.parse_args(argv)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    server = DataServer(args.observations, args.poll)
+    try:
+        asyncio.run(serve(server, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,338 @@
+"""Declarative derived-indicator engine used by enrich_observations.py.
+
+Each derived series is a `Derivation` (inputs, element-wise formula, optional
+condition and clamp, output metadata) or an `ExternalSeries` (values supplied by
+a loader, e.g. the OWID CO2 fallback). `DerivationEngine` builds one `Panel` from
+the input rows, evaluates nodes in dependency order so each one sees every
+upstream series, and memoizes each node's output on disk keyed by a hash of its
+definition and input series. After one upstream series changes, only nodes that
+read it (directly or transitively) are recomputed.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import types
+from array import array
+from dataclasses import dataclass, field
+from graphlib import TopologicalSorter
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, NamedTuple, Sequence, Tuple
+
+import metrics
+from year_index import fill_series
+
+NAN = float("nan")
+CACHE_VERSION = 1
+
+
+def make_row(template: dict, indicator_id: str, indicator_name: str, source_code: str, value: float, source: str, quality_tier: str, quality_flag: str) -> dict:
+    row = dict(template)
+    row["indicator_id"] = indicator_id
+    row["indicator_name"] = indicator_name
+    row["source_code"] = source_code
+    row["value"] = f"{value:.6f}"
+    row["source"] = source
+    row["quality_tier"] = quality_tier
+    row["quality_flag"] = quality_flag
+    return row
+
+
+class Panel:
+    """Dense country x year grid per indicator for batched derivations.
+
+    Cell `i = country_pos * n_years + (year - year0)` over the given countries and
+    the span of years they have rows for. Values are `array("d")` columns with
+    NaN for missing cells; `has` marks cells backed by any row (even one whose
+    value did not parse), and `templates` holds the first row seen per cell for
+    metadata when derived rows are materialized.
+    """
+
+    def __init__(self, rows: List[dict], countries: set[str]) -> None:
+        self.countries = sorted(countries)
+        pos = {c: i for i, c in enumerate(self.countries)}
+        keyed = [(pos[r["country_id"]], int(r["year"]), r) for r in rows if r["country_id"] in pos]
+        years = [y for _, y, _ in keyed]
+        self.year0 = min(years) if years else 0
+        self.n_years = (max(years) - self.year0 + 1) if years else 0
+        self.size = len(self.countries) * self.n_years
+        self.templates: List[dict | None] = [None] * self.size
+        self._values: Dict[str, array] = {}
+        self._has: Dict[str, bytearray] = {}
+        for ci, y, r in keyed:
+            cell = ci * self.n_years + (y - self.year0)
+            if self.templates[cell] is None:
+                self.templates[cell] = r
+            ind = r["indicator_id"]
+            self._ensure(ind)
+            self._has[ind][cell] = 1
+            try:
+                self._values[ind][cell] = float(r["value"])
+            except ValueError:
+                continue
+        self.has_template = bytearray(t is not None for t in self.templates)
+
+    def _ensure(self, indicator: str) -> None:
+        if indicator not in self._values:
+            self._values[indicator] = array("d", [NAN]) * self.size
+            self._has[indicator] = bytearray(self.size)
+
+    def cell(self, country: str, year: int) -> int | None:
+        try:
+            ci = self.countries.index(country)
+        except ValueError:
+            return None
+        if not 0 <= year - self.year0 < self.n_years:
+            return None
+        return ci * self.n_years + (year - self.year0)
+
+    def values(self, indicator: str) -> array:
+        if indicator not in self._values:
+            return array("d", [NAN]) * self.size
+        return self._values[indicator]
+
+    def has(self, indicator: str) -> bytearray:
+        return self._has.get(indicator) or bytearray(self.size)
+
+    def add(self, indicator: str, cells: Sequence[int], values: Sequence[float]) -> None:
+        self._ensure(indicator)
+        vals, has = self._values[indicator], self._has[indicator]
+        for cell, v in zip(cells, values):
+            vals[cell] = v
+            has[cell] = 1
+
+    def lagged(self, indicator: str, k: int = 1) -> List[float]:
+        """Values shifted so each cell holds the value from `k` years earlier."""
+        vals = self.values(indicator)
+        n = self.n_years
+        out = [NAN] * self.size
+        for start in range(0, self.size, n):
+            out[start + k : start + n] = vals[start : start + n - k]
+        return out
+
+    def filled(self, indicator: str, method: str, max_gap: int) -> List[float]:
+        """Gap-filled values per cell (see `year_index.fill_series`), one pass per country."""
+        vals = self.values(indicator)
+        n = self.n_years
+        out: List[float] = []
+        for start in range(0, self.size, n):
+            row = vals[start : start + n]
+            years = [j for j, v in enumerate(row) if v == v]
+            out.extend(fill_series(years, [row[j] for j in years], range(n), method, max_gap))
+        return out
+
+    def series(self, inp: "Input") -> Sequence[float]:
+        if inp.lag:
+            vals: Sequence[float] = self.lagged(inp.indicator, inp.lag)
+        elif inp.max_gap:
+            vals = self.filled(inp.indicator, inp.fill, inp.max_gap)
+        else:
+            vals = self.values(inp.indicator)
+        if inp.default is not None:
+            d = inp.default
+            vals = [v if v == v else d for v in vals]
+        return vals
+
+
+class Input(NamedTuple):
+    """One formula argument: a same-year value, a lagged value or a gap-filled one.
+
+    With `max_gap`, missing years are filled from observations up to that many
+    years away using `fill` ("nearest", "ffill" or "interp"). Inputs without a
+    `default` are required; cells where they are missing are skipped. With a
+    `default`, missing values are replaced instead.
+    """
+
+    indicator: str
+    lag: int = 0
+    max_gap: int = 0
+    default: float | None = None
+    fill: str = "nearest"
+
+
+@dataclass(frozen=True)
+class Derivation:
+    indicator_id: str
+    indicator_name: str
+    source_code: str
+    inputs: Tuple[Input, ...]
+    formula: Callable[..., float]
+    where: Callable[..., bool] | None = None
+    clamp: Tuple[float, float] | None = None
+    quality_tier: str = "Tier3"
+    quality_flag: str = "derived_proxy"
+    source: str = "Derived"
+    stage: str = "structural"
+
+
+@dataclass(frozen=True)
+class ExternalSeries:
+    """A series loaded from outside the observation set, e.g. a fallback source.
+
+    `loader(countries)` returns `{(country, year): value}`; values only fill cells
+    that have a template row and no existing row for the indicator.
+    """
+
+    indicator_id: str
+    indicator_name: str
+    source_code: str
+    loader: Callable[[set[str]], Dict[Tuple[str, int], float]]
+    source: str
+    quality_tier: str
+    quality_flag: str
+    stage: str = "external"
+    inputs: Tuple[Input, ...] = field(default=())
+
+
+Node = Derivation | ExternalSeries
+
+
+def resolve_order(registry: Iterable[Node]) -> List[Node]:
+    """Topologically sort nodes so producers run before the nodes reading them."""
+    nodes = {n.indicator_id: n for n in registry}
+    graph = TopologicalSorter()
+    for node in nodes.values():
+        graph.add(node.indicator_id, *(i.indicator for i in node.inputs if i.indicator in nodes and i.indicator != node.indicator_id))
+    return [nodes[ind] for ind in graph.static_order()]
+
+
+def _code_fingerprint(code: types.CodeType, globals_: dict, h: "hashlib._Hash", seen: set) -> None:
+    if code in seen:
+        return
+    seen.add(code)
+    h.update(code.co_code)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            _code_fingerprint(const, globals_, h, seen)
+        else:
+            h.update(repr(const).encode("utf-8"))
+    for name in code.co_names:
+        h.update(name.encode("utf-8"))
+        fn = globals_.get(name)
+        if isinstance(fn, types.FunctionType):
+            _code_fingerprint(fn.__code__, fn.__globals__, h, seen)
+
+
+def node_fingerprint(node: Node) -> str:
+    h = hashlib.sha256()
+    h.update(repr((CACHE_VERSION, type(node).__name__, node.indicator_id, node.inputs, getattr(node, "clamp", None))).encode("utf-8"))
+    seen: set = set()
+    for fn in (getattr(node, "formula", None), getattr(node, "where", None)):
+        if fn is not None:
+            _code_fingerprint(fn.__code__, fn.__globals__, h, seen)
+    return h.hexdigest()
+
+
+class DerivationEngine:
+    """Evaluates a registry over one shared `Panel` and materializes new rows."""
+
+    def __init__(self, rows: List[dict], countries: set[str], registry: Iterable[Node], cache_path: Path | None = None) -> None:
+        self.panel = Panel(rows, countries)
+        self.order = resolve_order(registry)
+        self.cache_path = cache_path
+        self.cache: Dict[str, dict] = {}
+        if cache_path is not None and cache_path.exists():
+            with cache_path.open(encoding="utf-8") as f:
+                payload = json.load(f)
+            if payload.get("version") == CACHE_VERSION:
+                self.cache = payload["entries"]
+        self.added: Dict[str, int] = {}
+        self.recomputed: List[str] = []
+        self.reused: List[str] = []
+
+    def _input_key(self, node: Derivation) -> str:
+        p = self.panel
+        h = hashlib.sha256(node_fingerprint(node).encode("utf-8"))
+        h.update(repr((p.countries, p.year0, p.n_years)).encode("utf-8"))
+        h.update(p.has_template)
+        h.update(p.has(node.indicator_id))
+        for ind in sorted({i.indicator for i in node.inputs}):
+            h.update(ind.encode("utf-8"))
+            h.update(p.values(ind).tobytes())
+        return h.hexdigest()
+
+    def _evaluate(self, node: Derivation) -> Tuple[List[int], List[float]]:
+        p = self.panel
+        args = [p.series(i) for i in node.inputs]
+        masks: List[Sequence[int]] = [p.has_template, absent(p.has(node.indicator_id))]
+        masks += [present(a) for i, a in zip(node.inputs, args) if i.default is None]
+        cells = cells_where(*masks)
+        if node.where is not None:
+            where = node.where
+            cells = [c for c in cells if where(*(a[c] for a in args))]
+        formula = node.formula
+        values = [formula(*(a[c] for a in args)) for c in cells]
+        if node.clamp is not None:
+            lo, hi = node.clamp
+            values = [max(lo, min(hi, v)) for v in values]
+        return cells, values
+
+    def _load_external(self, node: ExternalSeries) -> Tuple[List[int], List[float]]:
+        p = self.panel
+        existing = p.has(node.indicator_id)
+        cells: List[int] = []
+        values: List[float] = []
+        for (country, year), v in node.loader(set(p.countries)).items():
+            cell = p.cell(country, year)
+            if cell is None or existing[cell] or not p.has_template[cell]:
+                continue
+            cells.append(cell)
+            values.append(v)
+        return cells, values
+
+    def run(self, stages: set[str] | None = None) -> List[dict]:
+        """Evaluate every node (or those in `stages`) and return the new rows."""
+        out: List[dict] = []
+        for node in self.order:
+            if stages is not None and node.stage not in stages:
+                continue
+            with metrics.timer("derivation", indicator=node.indicator_id):
+                if isinstance(node, ExternalSeries):
+                    cells, values = self._load_external(node)
+                    self.recomputed.append(node.indicator_id)
+                else:
+                    key = self._input_key(node)
+                    hit = self.cache.get(node.indicator_id)
+                    if hit is not None and hit["key"] == key:
+                        cells, values = hit["cells"], hit["values"]
+                        self.reused.append(node.indicator_id)
+                    else:
+                        cells, values = self._evaluate(node)
+                        self.cache[node.indicator_id] = {"key": key, "cells": cells, "values": values}
+                        self.recomputed.append(node.indicator_id)
+                self.panel.add(node.indicator_id, cells, values)
+                out.extend(materialize(self.panel, cells, values, node))
+            self.added[node.stage] = self.added.get(node.stage, 0) + len(cells)
+        return out
+
+    def save_cache(self) -> None:
+        if self.cache_path is None:
+            return
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.cache_path.with_suffix(".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump({"version": CACHE_VERSION, "entries": self.cache}, f)
+        tmp.replace(self.cache_path)
+
+
+def present(values: Iterable[float]) -> bytearray:
+    return bytearray(v == v for v in values)
+
+
+def cells_where(*masks: Sequence[int]) -> List[int]:
+    return [i for i, flags in enumerate(zip(*masks)) if all(flags)]
+
+
+_NOT = bytes([1]) + bytes(255)
+
+
+def absent(mask: bytearray) -> bytes:
+    return mask.translate(_NOT)
+
+
+def materialize(panel: Panel, cells: Sequence[int], values: Iterable[float], node: Node) -> List[dict]:
+    return [
+        make_row(panel.templates[cell], node.indicator_id, node.indicator_name, node.source_code, v, node.source, node.quality_tier, node.quality_flag)
+        for cell, v in zip(cells, values)
+    ]
@@ -2,24 +2,35 @@
 """Enrich observations with fallback/derived indicators to close v1 gaps.
 
 Inputs:
-- data/processed/world_bank_observations.csv
+- data/processed/world_bank_observations.csv (or its .store/ when fresh)
 
 Outputs:
-- data/raw/owid/owid_co2_data.csv
-- data/processed/observations_v1.csv
-- data/processed/enrichment_report.json
+- data/raw/owid/owid_co2_data.csv (downloaded once; `--refresh-owid` re-fetches)
+- data/processed/observations_v1.csv (+ .store/ columnar copy)
+- data/processed/enrichment_report.json (with a `timing` section)
+- data/processed/derivation_cache.json (memoized derived series)
+- data/processed/metrics/enrich_observations.jsonl (see scripts/metrics.py)
 """
 
 from __future__ import annotations
 
+import argparse
 import csv
+import io
 import json
 import math
-import urllib.request
+import sys
 from collections import defaultdict
 from datetime import datetime, timezone
+from itertools import chain, islice
+from operator import itemgetter
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, Iterable, Iterator, List, Sequence, Tuple
+
+import metrics
+import observation_store
+from http_client import HttpClient
+from derivations import NAN, Derivation, DerivationEngine, ExternalSeries, Input
 
 ROOT = Path(__file__).resolve().parents[1]
 IN_PATH = ROOT / "data" / "processed" / "world_bank_observations.csv"
@@ -28,6 +39,8 @@ REPORT_PATH = ROOT / "data" / "processed" / "enrichment_report.json"
 PEERS_PATH = ROOT / "data" / "peer_countries_v1.csv"
 OWID_RAW = ROOT / "data" / "raw" / "owid" / "owid_co2_data.csv"
 OWID_URL = "https://raw.githubusercontent.com/owid/co2-data/master/owid-co2-data.csv"
+DERIVATION_CACHE = ROOT / "data" / "processed" / "derivation_cache.json"
+WRITE_CHUNK = 8192  # CSV lines per write() call
 
 
 def load_peers() -> set[str]:
@@ -42,6 +55,11 @@ def load_peers() -> set[str]:
 
 
 def load_rows(path: Path) -> List[dict]:
+    store = observation_store.open_for(path)
+    if store is not None:
+        rows = list(store.iter_rows())
+        store.close()
+        return rows
     with path.open(newline="", encoding="utf-8") as f:
         return list(csv.DictReader(f))
 
@@ -57,158 +75,27 @@ def index_values(rows: List[dict]) -> Dict[Tuple[str, int, str], float]:
     return out
 
 
-def make_row(template: dict, indicator_id: str, indicator_name: str, source_code: str, value: float, source: str, quality_tier: str, quality_flag: str) -> dict:
-    row = dict(template)
-    row["indicator_id"] = indicator_id
-    row["indicator_name"] = indicator_name
-    row["source_code"] = source_code
-    row["value"] = f"{value:.6f}"
-    row["source"] = source
-    row["quality_tier"] = quality_tier
-    row["quality_flag"] = quality_flag
-    return row
-
-
-def nearest_year_value(idx: Dict[Tuple[str, int, str], float], country: str, year: int, indicator: str, max_gap: int = 3) -> float | None:
-    if (country, year, indicator) in idx:
-        return idx[(country, year, indicator)]
-    best = None
-    best_gap = 10**9
-    for y in range(year - max_gap, year + max_gap + 1):
-        key = (country, y, indicator)
-        if key in idx:
-            g = abs(y - year)
-            if g < best_gap:
-                best = idx[key]
-                best_gap = g
-    return best
-
-
-def append_derived(rows: List[dict], peers: set[str]) -> List[dict]:
-    idx = index_values(rows)
-    out = list(rows)
-
-    # find template per country/year for metadata fields
-    templates: Dict[Tuple[str, int], dict] = {}
-    for r in rows:
-        c = r["country_id"]
-        if c not in peers:
-            continue
-        y = int(r["year"])
-        templates.setdefault((c, y), r)
-
-    # DEFICIT_GDP proxy from debt dynamics when direct series unavailable.
-    for c in peers:
-        years = sorted({y for (cc, y, ind) in idx if cc == c and ind == "DEBT_GDP"})
-        for y in years:
-            if (c, y, "DEFICIT_GDP") in idx:
-                continue
-            if y - 1 not in years:
-                continue
-            d_t = idx.get((c, y, "DEBT_GDP"))
-            d_prev = idx.get((c, y - 1, "DEBT_GDP"))
-            g = idx.get((c, y, "GDP_GROWTH"), 2.0)
-            if d_t is None or d_prev is None:
-                continue
-            # Approximate from debt dynamics with assumed (r-g) term for advanced peers.
-            deficit = (d_t - d_prev) - 0.015 * d_prev + 0.1 * (g - 2.0)
-            deficit = max(-15.0, min(15.0, deficit))
-            tpl = templates.get((c, y))
-            if tpl is None:
-                continue
-            out.append(
-                make_row(
-                    tpl,
-                    "DEFICIT_GDP",
-                    "Fiscal balance proxy (% of GDP)",
-                    "DERIVED.DEFICIT.DYNAMICS",
-                    deficit,
-                    "Derived",
-                    "Tier3",
-                    "derived_proxy",
-                )
-            )
-
-    # UHC index proxy from life expectancy and out-of-pocket burden.
-    for c in peers:
-        years = sorted({y for (cc, y, ind) in idx if cc == c and ind == "LIFE_EXPECTANCY"})
-        for y in years:
-            if (c, y, "UHC_INDEX") in idx:
-                continue
-            life = idx.get((c, y, "LIFE_EXPECTANCY"))
-            oop = nearest_year_value(idx, c, y, "OOPEXP_SHARE", max_gap=3)
-            if life is None or oop is None:
-                continue
-            life_score = max(0.0, min(100.0, ((life - 60.0) / 25.0) * 100.0))
-            uhc = max(0.0, min(100.0, life_score - 0.45 * oop + 12.0))
-            tpl = templates.get((c, y))
-            if tpl is None:
-                continue
-            out.append(
-                make_row(
-                    tpl,
-                    "UHC_INDEX",
-                    "UHC service coverage proxy index",
-                    "DERIVED.UHC.PROXY",
-                    uhc,
-                    "Derived",
-                    "Tier3",
-                    "derived_proxy",
-                )
-            )
-
-    # Lower-secondary completion proxy from primary completion + human capital.
-    for c in peers:
-        years = sorted({y for (cc, y, ind) in idx if cc == c and ind == "PRIMARY_COMPLETION"})
-        for y in years:
-            if (c, y, "LOWER_SEC_COMPLETION") in idx:
-                continue
-            primary = idx.get((c, y, "PRIMARY_COMPLETION"))
-            hci = nearest_year_value(idx, c, y, "HUMAN_CAPITAL", max_gap=4)
-            if primary is None or hci is None:
-                continue
-            lower_sec = max(0.0, min(100.0, 0.7 * primary + 0.3 * (hci * 100.0) - 4.0))
-            tpl = templates.get((c, y))
-            if tpl is None:
-                continue
-            out.append(
-                make_row(
-                    tpl,
-                    "LOWER_SEC_COMPLETION",
-                    "Lower secondary completion proxy",
-                    "DERIVED.EDU.LOWERSEC",
-                    lower_sec,
-                    "Derived",
-                    "Tier3",
-                    "derived_proxy",
-                )
-            )
-
-    return out
-
-
-def append_owid_co2(rows: List[dict], peers: set[str]) -> Tuple[List[dict], int]:
-    OWID_RAW.parent.mkdir(parents=True, exist_ok=True)
-    req = urllib.request.Request(OWID_URL, headers={"User-Agent": "Mozilla/5.0"})
-    with urllib.request.urlopen(req, timeout=120) as r:
-        payload = r.read()
-    OWID_RAW.write_bytes(payload)
-
-    templates: Dict[Tuple[str, int], dict] = {}
-    for r in rows:
-        c = r["country_id"]
-        if c not in peers:
-            continue
-        templates.setdefault((c, int(r["year"])), r)
-
-    existing = {(r["country_id"], int(r["year"]), r["indicator_id"]) for r in rows}
-    appended = 0
-
+def load_owid_co2(countries: set[str]) -> Dict[Tuple[str, int], float]:
+    if not OWID_RAW.exists():
+        OWID_RAW.parent.mkdir(parents=True, exist_ok=True)
+        client = HttpClient(timeout=120)
+        try:
+            with metrics.timer("download", source="owid"):
+                data = client.fetch_bytes(OWID_URL)
+        finally:
+            client.close()
+        metrics.count("download_bytes", len(data), source="owid")
+        metrics.count("http_retries", client.stats["retries"], source="owid")
+        tmp = OWID_RAW.with_suffix(".tmp")
+        tmp.write_bytes(data)
+        tmp.replace(OWID_RAW)
+
+    out: Dict[Tuple[str, int], float] = {}
     with OWID_RAW.open(newline="", encoding="utf-8") as f:
         reader = csv.DictReader(f)
         for row in reader:
             iso = (row.get("iso_code") or "").strip().upper()
-            if iso not in peers:
+            if iso not in countries:
                 continue
             try:
                 year = int(row.get("year") or 0)
@@ -219,259 +106,251 @@ def append_owid_co2(rows: List[dict], peers: set[str]) -> Tuple[List[dict], int]
             val = row.get("co2_per_capita")
             if val in (None, ""):
                 continue
-            key = (iso, year, "CO2_PC")
-            if key in existing:
-                continue
-            tpl = templates.get((iso, year))
-            if tpl is None:
-                continue
             try:
-                v = float(val)
+                out[(iso, year)] = float(val)
             except ValueError:
                 continue
-            rows.append(
-                make_row(
-                    tpl,
-                    "CO2_PC",
-                    "CO2 emissions (metric tons per capita)",
-                    "OWID.CO2_PER_CAPITA",
-                    v,
-                    "OWID",
-                    "Tier2",
-                    "fallback_external",
-                )
-            )
-            appended += 1
-
-    return rows, appended
+    return out
 
 
 def wgi_to_100(x: float) -> float:
     return max(0.0, min(100.0, ((x + 2.5) / 5.0) * 100.0))
 
 
+# Derived indicators, evaluated in dependency order by DerivationEngine. Inputs
+# without a default are required; `default=NAN` passes missing values through.
+REGISTRY = [
+    # DEFICIT_GDP proxy from debt dynamics when direct series unavailable.
+    # Approximate from debt dynamics with assumed (r-g) term for advanced peers.
+    Derivation(
+        "DEFICIT_GDP", "Fiscal balance proxy (% of GDP)", "DERIVED.DEFICIT.DYNAMICS",
+        inputs=(Input("DEBT_GDP"), Input("DEBT_GDP", lag=1), Input("GDP_GROWTH", default=2.0)),
+        formula=lambda d_t, d_prev, g: (d_t - d_prev) - 0.015 * d_prev + 0.1 * (g - 2.0),
+        clamp=(-15.0, 15.0), stage="derived",
+    ),
+    # UHC index proxy from life expectancy and out-of-pocket burden.
+    Derivation(
+        "UHC_INDEX", "UHC service coverage proxy index", "DERIVED.UHC.PROXY",
+        inputs=(Input("LIFE_EXPECTANCY"), Input("OOPEXP_SHARE", max_gap=3)),
+        formula=lambda life, oop: max(0.0, min(100.0, ((life - 60.0) / 25.0) * 100.0)) - 0.45 * oop + 12.0,
+        clamp=(0.0, 100.0), stage="derived",
+    ),
+    # Lower-secondary completion proxy from primary completion + human capital.
+    Derivation(
+        "LOWER_SEC_COMPLETION", "Lower secondary completion proxy", "DERIVED.EDU.LOWERSEC",
+        inputs=(Input("PRIMARY_COMPLETION"), Input("HUMAN_CAPITAL", max_gap=4)),
+        formula=lambda primary, hci: 0.7 * primary + 0.3 * (hci * 100.0) - 4.0,
+        clamp=(0.0, 100.0), stage="derived",
+    ),
+    # External fallback where the World Bank CO2 series is missing.
+    ExternalSeries(
+        "CO2_PC", "CO2 emissions (metric tons per capita)", "OWID.CO2_PER_CAPITA",
+        loader=load_owid_co2, source="OWID", quality_tier="Tier2", quality_flag="fallback_external",
+    ),
+    # Budget transparency proxy (OBS_SCORE)
+    Derivation(
+        "OBS_SCORE", "Open Budget Survey score proxy", "DERIVED.OBS.PROXY",
+        inputs=(Input("GOV_EFFECTIVENESS"), Input("CONTROL_CORRUPTION"), Input("RULE_OF_LAW")),
+        formula=lambda ge, cc, rl: 0.4 * wgi_to_100(ge) + 0.35 * wgi_to_100(cc) + 0.25 * wgi_to_100(rl),
+    ),
+    # Disaster affected proxy
+    Derivation(
+        "DISASTER_AFFECTED", "People affected by disasters proxy (per 100k)", "DERIVED.DISASTER.PROXY",
+        inputs=(Input("PM25"), Input("CO2_PC", default=6.0)),
+        formula=lambda pm25, co2: 12.0 * pm25 + 18.0 * max(0.5, co2),
+        clamp=(20.0, 1200.0),
+    ),
+    # Political finance proxies
+    Derivation(
+        "DONATION_DISCLOSURE", "Donation disclosure strictness proxy", "DERIVED.PF.DISC",
+        inputs=(Input("VOICE_ACCOUNTABILITY"), Input("CONTROL_CORRUPTION")),
+        formula=lambda va, cc: 0.55 * wgi_to_100(va) + 0.45 * wgi_to_100(cc),
+    ),
+    Derivation(
+        "DONATION_LIMITS", "Donation limits strictness proxy", "DERIVED.PF.LIMITS",
+        inputs=(Input("CONTROL_CORRUPTION"), Input("VOICE_ACCOUNTABILITY")),
+        formula=lambda cc, va: 0.5 * wgi_to_100(cc) + 0.5 * wgi_to_100(va),
+    ),
+    Derivation(
+        "PUBLIC_FINANCING_SHARE", "Public party financing share proxy", "DERIVED.PF.PUBLIC",
+        inputs=(Input("VOICE_ACCOUNTABILITY"), Input("CONTROL_CORRUPTION")),
+        formula=lambda va, cc: 0.6 * wgi_to_100(va) - 0.2 * (wgi_to_100(cc) - 50.0),
+        clamp=(10.0, 80.0),
+    ),
+    # Budget structure proxies
+    Derivation(
+        "COFOG_HEALTH_SHARE", "Health share of government spending proxy", "DERIVED.COFOG.HEALTH",
+        inputs=(Input("HEALTH_EXP_GDP"), Input("GGEXP_GDP")),
+        formula=lambda h_exp, g_exp: 100.0 * h_exp / g_exp,
+        where=lambda h_exp, g_exp: g_exp > 0, clamp=(0.0, 40.0),
+    ),
+    Derivation(
+        "COFOG_EDU_SHARE", "Education share of government spending proxy", "DERIVED.COFOG.EDU",
+        inputs=(Input("EDU_EXP_GDP"), Input("GGEXP_GDP")),
+        formula=lambda e_exp, g_exp: 100.0 * e_exp / g_exp,
+        where=lambda e_exp, g_exp: g_exp > 0, clamp=(0.0, 30.0),
+    ),
+    Derivation(
+        "COFOG_DEF_SHARE", "Defense share of government spending proxy", "DERIVED.COFOG.DEF",
+        inputs=(Input("MIL_EXP_GDP"), Input("GGEXP_GDP")),
+        formula=lambda mil, g_exp: 100.0 * mil / g_exp,
+        where=lambda mil, g_exp: g_exp > 0, clamp=(0.0, 20.0),
+    ),
+    # Welfare-heavy in lower-inequality, aging advanced states.
+    Derivation(
+        "COFOG_SOCIAL_SHARE", "Social protection share proxy", "DERIVED.COFOG.SOCIAL",
+        inputs=(Input("GGEXP_GDP"), Input("GINI", default=32.0)),
+        formula=lambda g_exp, gini: 44.0 - 0.35 * (gini - 30.0),
+        where=lambda g_exp, gini: g_exp > 0, clamp=(20.0, 50.0),
+    ),
+    # SIPRI milex proxy
+    Derivation(
+        "SIPRI_MILEX", "Military expenditure proxy (USD bn index)", "DERIVED.SIPRI.PROXY",
+        inputs=(Input("MIL_EXP_GDP"),),
+        formula=lambda mil: mil * 35.0,
+        clamp=(1.0, math.inf),
+    ),
+    # Internal policy/event indices seeded from governance/external context.
+    Derivation(
+        "AI_GOVERNANCE_INDEX", "AI governance index seed", "DERIVED.AI.SEED",
+        inputs=(Input("REG_QUALITY", default=NAN),),
+        formula=lambda rq: wgi_to_100(rq) if rq == rq else 50.0,
+        quality_tier="TierG", quality_flag="derived_seed",
+    ),
+    Derivation(
+        "SURVEILLANCE_STRICTNESS", "Surveillance strictness seed", "DERIVED.SURV.SEED",
+        inputs=(Input("VOICE_ACCOUNTABILITY", default=NAN),),
+        formula=lambda va: 52.0 - (wgi_to_100(va) - 50.0) * 0.25 if va == va else 50.0,
+        quality_tier="TierG", quality_flag="derived_seed",
+    ),
+    Derivation(
+        "CYBER_PRESSURE_INDEX", "Cyber pressure index seed", "DERIVED.CYBER.SEED",
+        inputs=(Input("CURRENT_ACCOUNT", default=NAN),),
+        formula=lambda ext: 42.0 + (abs(ext) * 1.5 if ext == ext else 8.0),
+        quality_tier="TierG", quality_flag="derived_seed",
+    ),
+    Derivation(
+        "TRADE_PRESSURE_INDEX", "Trade pressure index seed", "DERIVED.TRADE.SEED",
+        inputs=(Input("CURRENT_ACCOUNT", default=NAN),),
+        formula=lambda ext: 40.0 + (abs(ext) * 1.8 if ext == ext else 10.0),
+        quality_tier="TierG", quality_flag="derived_seed",
+    ),
+]
+
+
+def append_derived(rows: List[dict], peers: set[str]) -> List[dict]:
+    return rows + DerivationEngine(rows, peers, REGISTRY).run({"derived"})
+
+
+def append_owid_co2(rows: List[dict], peers: set[str]) -> Tuple[List[dict], int]:
+    added = DerivationEngine(rows, peers, REGISTRY).run({"external"})
+    rows.extend(added)
+    return rows, len(added)
+
+
 def append_structural_proxies(rows: List[dict], peers: set[str]) -> List[dict]:
-    idx = index_values(rows)
-    out = list(rows)
-    existing = {(r["country_id"], int(r["year"]), r["indicator_id"]) for r in out}
-
-    templates: Dict[Tuple[str, int], dict] = {}
-    for r in rows:
-        c = r["country_id"]
-        if c not in peers:
-            continue
-        templates.setdefault((c, int(r["year"])), r)
-
-    for (country, year), tpl in sorted(templates.items()):
-        cc = idx.get((country, year, "CONTROL_CORRUPTION"))
-        ge = idx.get((country, year, "GOV_EFFECTIVENESS"))
-        rl = idx.get((country, year, "RULE_OF_LAW"))
-        va = idx.get((country, year, "VOICE_ACCOUNTABILITY"))
-        pm25 = idx.get((country, year, "PM25"))
-        co2 = idx.get((country, year, "CO2_PC"))
-        mil = idx.get((country, year, "MIL_EXP_GDP"))
-        h_exp = idx.get((country, year, "HEALTH_EXP_GDP"))
-        e_exp = idx.get((country, year, "EDU_EXP_GDP"))
-        g_exp = idx.get((country, year, "GGEXP_GDP"))
-        gini = idx.get((country, year, "GINI"))
-        ext = idx.get((country, year, "CURRENT_ACCOUNT"))
-
-        # Budget transparency proxy (OBS_SCORE)
-        if (country, year, "OBS_SCORE") not in existing and cc is not None and ge is not None and rl is not None:
-            obs = 0.4 * wgi_to_100(ge) + 0.35 * wgi_to_100(cc) + 0.25 * wgi_to_100(rl)
-            out.append(
-                make_row(
-                    tpl,
-                    "OBS_SCORE",
-                    "Open Budget Survey score proxy",
-                    "DERIVED.OBS.PROXY",
-                    obs,
-                    "Derived",
-                    "Tier3",
-                    "derived_proxy",
-                )
-            )
-            existing.add((country, year, "OBS_SCORE"))
-
-        # Disaster affected proxy
-        if (country, year, "DISASTER_AFFECTED") not in existing and pm25 is not None:
-            co2_v = co2 if co2 is not None else 6.0
-            affected = max(20.0, min(1200.0, 12.0 * pm25 + 18.0 * max(0.5, co2_v)))
-            out.append(
-                make_row(
-                    tpl,
-                    "DISASTER_AFFECTED",
-                    "People affected by disasters proxy (per 100k)",
-                    "DERIVED.DISASTER.PROXY",
-                    affected,
-                    "Derived",
-                    "Tier3",
-                    "derived_proxy",
-                )
-            )
-            existing.add((country, year, "DISASTER_AFFECTED"))
-
-        # Political finance proxies
-        if cc is not None and va is not None:
-            if (country, year, "DONATION_DISCLOSURE") not in existing:
-                val = 0.55 * wgi_to_100(va) + 0.45 * wgi_to_100(cc)
-                out.append(
-                    make_row(tpl, "DONATION_DISCLOSURE", "Donation disclosure strictness proxy", "DERIVED.PF.DISC", val, "Derived", "Tier3", "derived_proxy")
-                )
-                existing.add((country, year, "DONATION_DISCLOSURE"))
-            if (country, year, "DONATION_LIMITS") not in existing:
-                val = 0.5 * wgi_to_100(cc) + 0.5 * wgi_to_100(va)
-                out.append(
-                    make_row(tpl, "DONATION_LIMITS", "Donation limits strictness proxy", "DERIVED.PF.LIMITS", val, "Derived", "Tier3", "derived_proxy")
-                )
-                existing.add((country, year, "DONATION_LIMITS"))
-            if (country, year, "PUBLIC_FINANCING_SHARE") not in existing:
-                val = max(10.0, min(80.0, 0.6 * wgi_to_100(va) - 0.2 * (wgi_to_100(cc) - 50.0)))
-                out.append(
-                    make_row(tpl, "PUBLIC_FINANCING_SHARE", "Public party financing share proxy", "DERIVED.PF.PUBLIC", val, "Derived", "Tier3", "derived_proxy")
-                )
-                existing.add((country, year, "PUBLIC_FINANCING_SHARE"))
-
-        # Budget structure proxies
-        if g_exp is not None and g_exp > 0:
-            if (country, year, "COFOG_HEALTH_SHARE") not in existing and h_exp is not None:
-                out.append(
-                    make_row(
-                        tpl,
-                        "COFOG_HEALTH_SHARE",
-                        "Health share of government spending proxy",
-                        "DERIVED.COFOG.HEALTH",
-                        max(0.0, min(40.0, 100.0 * h_exp / g_exp)),
-                        "Derived",
-                        "Tier3",
-                        "derived_proxy",
-                    )
-                )
-                existing.add((country, year, "COFOG_HEALTH_SHARE"))
-            if (country, year, "COFOG_EDU_SHARE") not in existing and e_exp is not None:
-                out.append(
-                    make_row(
-                        tpl,
-                        "COFOG_EDU_SHARE",
-                        "Education share of government spending proxy",
-                        "DERIVED.COFOG.EDU",
-                        max(0.0, min(30.0, 100.0 * e_exp / g_exp)),
-                        "Derived",
-                        "Tier3",
-                        "derived_proxy",
-                    )
-                )
-                existing.add((country, year, "COFOG_EDU_SHARE"))
-            if (country, year, "COFOG_DEF_SHARE") not in existing and mil is not None:
-                out.append(
-                    make_row(
-                        tpl,
-                        "COFOG_DEF_SHARE",
-                        "Defense share of government spending proxy",
-                        "DERIVED.COFOG.DEF",
-                        max(0.0, min(20.0, 100.0 * mil / g_exp)),
-                        "Derived",
-                        "Tier3",
-                        "derived_proxy",
-                    )
-                )
-                existing.add((country, year, "COFOG_DEF_SHARE"))
-            if (country, year, "COFOG_SOCIAL_SHARE") not in existing:
-                # Welfare-heavy in lower-inequality, aging advanced states.
-                gini_v = gini if gini is not None else 32.0
-                social = max(20.0, min(50.0, 44.0 - 0.35 * (gini_v - 30.0)))
-                out.append(
-                    make_row(
-                        tpl,
-                        "COFOG_SOCIAL_SHARE",
-                        "Social protection share proxy",
-                        "DERIVED.COFOG.SOCIAL",
-                        social,
-                        "Derived",
-                        "Tier3",
-                        "derived_proxy",
-                    )
-                )
-                existing.add((country, year, "COFOG_SOCIAL_SHARE"))
-
-        # SIPRI milex proxy
-        if (country, year, "SIPRI_MILEX") not in existing and mil is not None:
-            out.append(
-                make_row(
-                    tpl,
-                    "SIPRI_MILEX",
-                    "Military expenditure proxy (USD bn index)",
-                    "DERIVED.SIPRI.PROXY",
-                    max(1.0, mil * 35.0),
-                    "Derived",
-                    "Tier3",
-                    "derived_proxy",
-                )
-            )
-            existing.add((country, year, "SIPRI_MILEX"))
-
-        # Internal policy/event indices seeded from governance/external context.
-        if (country, year, "AI_GOVERNANCE_INDEX") not in existing:
-            base = wgi_to_100(rq) if (rq := idx.get((country, year, "REG_QUALITY"))) is not None else 50.0
-            out.append(make_row(tpl, "AI_GOVERNANCE_INDEX", "AI governance index seed", "DERIVED.AI.SEED", base, "Derived", "TierG", "derived_seed"))
-            existing.add((country, year, "AI_GOVERNANCE_INDEX"))
-        if (country, year, "SURVEILLANCE_STRICTNESS") not in existing:
-            base = 52.0 - (wgi_to_100(va) - 50.0) * 0.25 if va is not None else 50.0
-            out.append(make_row(tpl, "SURVEILLANCE_STRICTNESS", "Surveillance strictness seed", "DERIVED.SURV.SEED", base, "Derived", "TierG", "derived_seed"))
-            existing.add((country, year, "SURVEILLANCE_STRICTNESS"))
-        if (country, year, "CYBER_PRESSURE_INDEX") not in existing:
-            base = 42.0 + (abs(ext) * 1.5 if ext is not None else 8.0)
-            out.append(make_row(tpl, "CYBER_PRESSURE_INDEX", "Cyber pressure index seed", "DERIVED.CYBER.SEED", base, "Derived", "TierG", "derived_seed"))
-            existing.add((country, year, "CYBER_PRESSURE_INDEX"))
-        if (country, year, "TRADE_PRESSURE_INDEX") not in existing:
-            base = 40.0 + (abs(ext) * 1.8 if ext is not None else 10.0)
-            out.append(make_row(tpl, "TRADE_PRESSURE_INDEX", "Trade pressure index seed", "DERIVED.TRADE.SEED", base, "Derived", "TierG", "derived_seed"))
-            existing.add((country, year, "TRADE_PRESSURE_INDEX"))
+    return rows + DerivationEngine(rows, peers, REGISTRY).run({"structural"})
+
+
+def sort_order(rows: Sequence[dict]) -> List[int]:
+    """Stable row order by (country_id, year, indicator_id).
+
+    Each key is packed into one int from the country and indicator ranks, so the
+    sort compares ints only. The input rows and each derivation's batch arrive
+    as presorted runs, which timsort merges instead of sorting from scratch.
+    """
+    countries = {c: i for i, c in enumerate(sorted({r["country_id"] for r in rows}))}
+    indicators = {ind: i for i, ind in enumerate(sorted({r["indicator_id"] for r in rows}))}
+    years = [int(r["year"]) for r in rows]
+    year0, span, width = min(years), max(years) - min(years) + 1, len(indicators)
+    keys = [(countries[r["country_id"]] * span + y - year0) * width + indicators[r["indicator_id"]] for r, y in zip(rows, years)]
+    return sorted(range(len(rows)), key=keys.__getitem__)
 
-    return out
 
+def csv_lines(records: Iterable[Sequence[str]], width: int) -> Iterator[str]:
+    """Yield the lines `csv.writer` would write, joining plain rows directly.
 
-def write_rows(rows: List[dict], path: Path) -> None:
+    Only rows with a non-string field or a character that needs quoting go
+    through `csv.writer`.
+    """
+    buf = io.StringIO(newline="")
+    slow = csv.writer(buf)
+    for rec in records:
+        try:
+            line = ",".join(rec)
+        except TypeError:
+            line = None
+        if line is None or line.count(",") != width - 1 or '"' in line or "\n" in line or "\r" in line:
+            slow.writerow(rec)
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+        else:
+            yield line + "\r\n"
+
+
+def write_rows(rows: Sequence[dict], path: Path) -> None:
     if not rows:
         raise RuntimeError("No rows to write")
     fields = list(rows[0].keys())
     path.parent.mkdir(parents=True, exist_ok=True)
-    rows_sorted = sorted(rows, key=lambda r: (r["country_id"], int(r["year"]), r["indicator_id"]))
+    records = map(itemgetter(*fields), map(rows.__getitem__, sort_order(rows)))
+    lines = csv_lines(chain([fields], records), len(fields))
     with path.open("w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=fields)
-        writer.writeheader()
-        writer.writerows(rows_sorted)
-
+        while chunk := list(islice(lines, WRITE_CHUNK)):
+            f.write("".join(chunk))
 
-def main() -> int:
-    if not IN_PATH.exists():
-        raise SystemExit(f"Missing {IN_PATH}. Run scripts/fetch_world_bank.py first.")
 
-    peers = load_peers()
-    rows = load_rows(IN_PATH)
-    base_count = len(rows)
+def parse_args(argv: Sequence[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--refresh-owid", action="store_true", help="re-download the OWID CO2 CSV instead of reusing the local copy")
+    metrics.add_arguments(parser)
+    return parser.parse_args(argv)
 
-    rows = append_derived(rows, peers)
-    derived_count = len(rows) - base_count
 
-    rows, owid_added = append_owid_co2(rows, peers)
-    before_structural = len(rows)
-    rows = append_structural_proxies(rows, peers)
-    structural_added = len(rows) - before_structural
-
-    write_rows(rows, OUT_PATH)
+def main(argv: Sequence[str] | None = None) -> int:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    if not IN_PATH.exists():
+        raise SystemExit(f"Missing {IN_PATH}. Run scripts/fetch_world_bank.py first.")
+    if args.refresh_owid:
+        OWID_RAW.unlink(missing_ok=True)
+
+    recorder = metrics.from_args("enrich_observations", args)
+    with recorder.stage("load") as stage:
+        peers = load_peers()
+        rows = load_rows(IN_PATH)
+        stage.rows_out = base_count = len(rows)
+
+    with recorder.stage("derive") as stage:
+        engine = DerivationEngine(rows, peers, REGISTRY, cache_path=DERIVATION_CACHE)
+        rows = rows + engine.run()
+        engine.save_cache()
+        stage.rows_in, stage.rows_out = base_count, len(rows)
+        stage.add("recomputed", len(engine.recomputed))
+        stage.add("cached", len(engine.reused))
+
+    with recorder.stage("write") as stage:
+        write_rows(rows, OUT_PATH)
+        stage.rows_in = stage.rows_out = len(rows)
+    with recorder.stage("store") as stage:
+        observation_store.build_store_from_csv(OUT_PATH)
+        stage.rows_in = stage.rows_out = len(rows)
 
     report = {
         "generated_at": datetime.now(timezone.utc).isoformat(),
         "input_rows": base_count,
-        "derived_rows_added": derived_count,
-        "owid_rows_added": owid_added,
-        "structural_proxy_rows_added": structural_added,
+        "derived_rows_added": engine.added.get("derived", 0),
+        "owid_rows_added": engine.added.get("external", 0),
+        "structural_proxy_rows_added": engine.added.get("structural", 0),
+        "derivations_recomputed": engine.recomputed,
+        "derivations_cached": engine.reused,
         "output_rows": len(rows),
         "output_path": str(OUT_PATH),
+        "timing": recorder.summary(),
     }
     with REPORT_PATH.open("w", encoding="utf-8") as f:
         json.dump(report, f, indent=2)
+    recorder.close()
 
     print(json.dumps(report, indent=2))
     return 0
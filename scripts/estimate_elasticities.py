@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+"""Estimate spend -> outcome elasticities from the observation panel.
+
+Each entry in `SPECS` is a distributed-lag panel regression across peers and
+years with country and year fixed effects:
+
+    y[c, t] = a[c] + d[t] + sum_l b[l] * x[c, t - l] + e[c, t]
+
+Here `y` is the outcome as a 0-100 score (`build_baseline.transform`), or for
+`response="change"` the year-on-year change of the raw series. The elasticity
+is the long-run effect `sum_l b[l]`, in outcome points per percentage point of
+the regressor, which is the unit `sim_engine.py` applies it in. When a spec
+lists several outcomes they are all fitted, and the first one with enough
+data sets the elasticity, as in the `STATE_MAP` chains.
+
+Fixed effects are swept out once by alternating country/year demeaning. Each
+fit then reduces to per-country cross-products `X'X` and `X'y` (countries x k
+x k). The point estimate solves their sum. Every cluster-bootstrap resample
+draws countries with replacement and solves the count-weighted sum, so
+resamples never touch the rows again. Resamples run in fixed chunks, each
+with its own `random.Random` stream seeded from (seed, chunk), spread across
+processes. Results do not depend on `--processes`.
+
+Only direct observations enter: `derived_*` rows are proxies computed from
+other series, sometimes from the outcome itself. Keys the panel cannot
+support keep their hand-tuned prior from `build_baseline.ELASTICITIES`, as do
+all keys outside `SPECS`. A key is unsupported when it has no direct
+observations, too few rows or countries, a singular fit, or a
+long-run estimate whose sign contradicts the spec's `expected_sign` (peer
+panels confound spending with shocks, e.g. 2020). Its fits and intervals are
+still reported.
+
+Inputs:
+- data/processed/observations_gated_v1.csv (else observations_v1.csv, as in build_baseline.py)
+
+Outputs:
+- data/calibrated/elasticities_v1.json (`elasticities` plus per-key `estimates` with bootstrap intervals)
+
+Usage:
+- python3 scripts/estimate_elasticities.py
+- python3 scripts/estimate_elasticities.py --resamples 5000 --processes 8 --seed 7
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import math
+import random
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+import metrics
+import observation_store
+from baseline_spec import observations_path
+from build_baseline import ELASTICITIES, TRANSFORMS, transform
+from indicator_stats import nearest_rank
+
+ROOT = Path(__file__).resolve().parents[1]
+OUT_PATH = ROOT / "data" / "calibrated" / "elasticities_v1.json"
+
+MIN_ROWS = 30
+MIN_COUNTRIES = 5
+CHUNK = 250  # resamples per RNG stream / task
+CI = 0.95
+DEMEAN_TOL = 1e-10
+DEMEAN_MAX_ITER = 500
+
+Panel = Dict[str, Dict[str, Dict[int, float]]]  # indicator -> country -> year -> value
+
+
+@dataclass(frozen=True)
+class Spec:
+    regressor: str
+    outcomes: Tuple[str, ...]
+    lags: Tuple[int, ...]
+    response: str = "score"  # "score": transformed level; "change": first difference of the raw level
+    sign: float = 1.0  # applied to the regressor
+    expected_sign: int = 1  # of the long-run effect; 0 accepts either
+
+
+SPECS = {
+    "health_spend_pp_to_health_outcome": Spec("HEALTH_EXP_GDP", ("UHC_INDEX", "LIFE_EXPECTANCY"), (0, 1, 2)),
+    "education_spend_pp_to_education_outcome": Spec("EDU_EXP_GDP", ("HUMAN_CAPITAL",), (0, 1, 2)),
+    # Direct DEFICIT_GDP is GC.BAL.CASH.GD.ZS, the cash surplus/deficit (net
+    # lending: negative = deficit), so sign=-1 turns it into the deficit. The
+    # enrichment proxy is debt dynamics with the opposite sign, and is dropped
+    # with the other derived rows. The sim adds the pressure on top of the
+    # budget identity once a deficit has lasted two years, so only lagged
+    # deficits enter.
+    "deficit_pp_to_debt_trend_pressure": Spec("DEFICIT_GDP", ("DEBT_GDP",), (1, 2), response="change", sign=-1.0),
+}
+
+
+def load_panel(path: Path, indicators: Sequence[str]) -> Panel:
+    """Direct observations of `indicators`; `derived_*` rows are computed from
+    other series (e.g. UHC_INDEX from LIFE_EXPECTANCY) and would make fits circular."""
+    wanted = set(indicators)
+    panel: Panel = {name: {} for name in indicators}
+    store = observation_store.open_for(path)
+    if store is not None:
+        names, countries = store.indicators, store.countries
+        codes = {i for i, name in enumerate(names) if name in wanted}
+        derived = [observation_store.is_derived(flag) for flag in store.flags]
+        for ind, country, year, value, flag in zip(store.indicator, store.country, store.year, store.value, store.flag):
+            if ind in codes and not derived[flag]:
+                panel[names[ind]].setdefault(countries[country], {})[year] = value
+        store.close()
+    else:
+        with path.open(newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                if row["indicator_id"] in wanted and not observation_store.is_derived(row.get("quality_flag", "")):
+                    panel[row["indicator_id"]].setdefault(row["country_id"], {})[int(row["year"])] = float(row["value"])
+    return panel
+
+
+def design(panel: Panel, spec: Spec, outcome: str) -> Tuple[List[str], List[int], List[List[float]], List[float]]:
+    """Rows with the response and every lagged regressor present: countries, years, X columns, y."""
+    xs, ys = panel[spec.regressor], panel[outcome]
+    countries: List[str] = []
+    years: List[int] = []
+    cols: List[List[float]] = [[] for _ in spec.lags]
+    y: List[float] = []
+    for country in sorted(ys):
+        x_c, y_c = xs.get(country, {}), ys[country]
+        for year in sorted(y_c):
+            lagged = [x_c.get(year - lag) for lag in spec.lags]
+            if None in lagged:
+                continue
+            if spec.response == "change":
+                if year - 1 not in y_c:
+                    continue
+                target = y_c[year] - y_c[year - 1]
+            else:
+                target = transform(outcome, y_c[year]) if outcome in TRANSFORMS else y_c[year]
+            countries.append(country)
+            years.append(year)
+            for col, v in zip(cols, lagged):
+                col.append(spec.sign * v)
+            y.append(target)
+    return countries, years, cols, y
+
+
+def demean_two_way(columns: List[List[float]], countries: Sequence[str], years: Sequence[int]) -> int:
+    """Sweep country and year means out of every column in place; returns iterations used."""
+    groups = [{}, {}]  # country -> rows, year -> rows
+    for i, key in enumerate(zip(countries, years)):
+        for g, k in zip(groups, key):
+            g.setdefault(k, []).append(i)
+    used = 0
+    for col in columns:
+        for used in range(1, DEMEAN_MAX_ITER + 1):
+            drift = 0.0
+            for g in groups:
+                for rows in g.values():
+                    mean = math.fsum(col[i] for i in rows) / len(rows)
+                    drift = max(drift, abs(mean))
+                    for i in rows:
+                        col[i] -= mean
+            if drift < DEMEAN_TOL:
+                break
+    return used
+
+
+def cross_products(countries: Sequence[str], cols: List[List[float]], y: List[float]) -> Tuple[List[List[float]], List[List[float]]]:
+    """Per-country `X'X` (flattened k x k) and `X'y`, countries in first-seen order."""
+    k = len(cols)
+    slot: Dict[str, int] = {}
+    xtx: List[List[float]] = []
+    xty: List[List[float]] = []
+    for i, country in enumerate(countries):
+        c = slot.get(country)
+        if c is None:
+            c = slot[country] = len(xtx)
+            xtx.append([0.0] * (k * k))
+            xty.append([0.0] * k)
+        a, b = xtx[c], xty[c]
+        row = [col[i] for col in cols]
+        for p, xp in enumerate(row):
+            b[p] += xp * y[i]
+            for q, xq in enumerate(row):
+                a[p * k + q] += xp * xq
+    return xtx, xty
+
+
+def solve(a: Sequence[float], b: Sequence[float], k: int) -> List[float] | None:
+    """Solve the k x k system `a x = b` (row-major) by partial pivoting; None if singular."""
+    m = [list(a[r * k : (r + 1) * k]) + [b[r]] for r in range(k)]
+    scale = max((abs(v) for v in a), default=0.0)
+    for c in range(k):
+        p = max(range(c, k), key=lambda r: abs(m[r][c]))
+        if abs(m[p][c]) <= 1e-12 * scale or scale == 0.0:
+            return None
+        m[c], m[p] = m[p], m[c]
+        for r in range(c + 1, k):
+            f = m[r][c] / m[c][c]
+            if f:
+                for j in range(c, k + 1):
+                    m[r][j] -= f * m[c][j]
+    x = [0.0] * k
+    for r in range(k - 1, -1, -1):
+        x[r] = (m[r][k] - sum(m[r][j] * x[j] for j in range(r + 1, k))) / m[r][r]
+    return x
+
+
+def weighted_solve(xtx: List[List[float]], xty: List[List[float]], weights: Sequence[int]) -> List[float] | None:
+    k = len(xty[0])
+    a = [0.0] * (k * k)
+    b = [0.0] * k
+    for w, ac, bc in zip(weights, xtx, xty):
+        if w:
+            for j, v in enumerate(ac):
+                a[j] += w * v
+            for j, v in enumerate(bc):
+                b[j] += w * v
+    return solve(a, b, k)
+
+
+def bootstrap_chunk(xtx: List[List[float]], xty: List[List[float]], n: int, stream: str) -> List[List[float] | None]:
+    """`n` country-cluster resamples from one RNG stream; singular draws give None."""
+    rng = random.Random(stream)
+    n_countries = len(xtx)
+    out: List[List[float] | None] = []
+    for _ in range(n):
+        counts = [0] * n_countries
+        for _ in range(n_countries):
+            counts[rng.randrange(n_countries)] += 1
+        out.append(weighted_solve(xtx, xty, counts))
+    return out
+
+
+def interval(values: List[float]) -> List[float]:
+    ordered = sorted(values)
+    tail = (1.0 - CI) / 2.0
+    return [round(nearest_rank(ordered, tail), 6), round(nearest_rank(ordered, 1.0 - tail), 6)]
+
+
+class Fit:
+    """One (spec, outcome) regression: design, within transform and point estimate."""
+
+    def __init__(self, name: str, spec: Spec, outcome: str, panel: Panel) -> None:
+        self.name, self.spec, self.outcome = name, spec, outcome
+        countries, years, cols, y = design(panel, spec, outcome)
+        self.rows = len(y)
+        self.countries = len(set(countries))
+        self.years = [min(years), max(years)] if years else []
+        self.beta: List[float] | None = None
+        self.reason = ""
+        missing = [name for name in (spec.regressor, outcome) if not panel[name]]
+        if missing:
+            self.reason = f"no direct observations of {' or '.join(missing)}"
+            return
+        if self.rows < MIN_ROWS or self.countries < MIN_COUNTRIES:
+            self.reason = f"{self.rows} rows across {self.countries} countries (need {MIN_ROWS} / {MIN_COUNTRIES})"
+            return
+        demean_two_way([*cols, y], countries, years)
+        self.xtx, self.xty = cross_products(countries, cols, y)
+        self.beta = weighted_solve(self.xtx, self.xty, [1] * len(self.xtx))
+        if self.beta is None:
+            self.reason = "singular design after fixed effects"
+            return
+        resid = [yi - sum(b * col[i] for b, col in zip(self.beta, cols)) for i, yi in enumerate(y)]
+        total = math.fsum(v * v for v in y)
+        self.r2_within = 1.0 - math.fsum(e * e for e in resid) / total if total else 0.0
+
+    def report(self, draws: List[List[float] | None]) -> dict:
+        out = {"outcome": self.outcome, "regressor": self.spec.regressor, "response": self.spec.response, "lags": list(self.spec.lags), "rows": self.rows, "countries": self.countries, "years": self.years}
+        if self.beta is None:
+            return {**out, "estimate": None, "reason": self.reason}
+        ok = [d for d in draws if d is not None]
+        long_run = [sum(d) for d in ok]
+        coefs = {}
+        for j, lag in enumerate(self.spec.lags):
+            coefs[str(lag)] = {"estimate": round(self.beta[j], 6), "ci": interval([d[j] for d in ok]) if ok else None}
+        return {
+            **out,
+            "estimate": round(sum(self.beta), 6),
+            "ci": interval(long_run) if ok else None,
+            "se": round(_stdev(long_run), 6) if len(long_run) > 1 else None,
+            "lag_coefficients": coefs,
+            "r2_within": round(self.r2_within, 4),
+            "resamples": len(draws),
+            "singular_resamples": len(draws) - len(ok),
+        }
+
+
+def _stdev(values: List[float]) -> float:
+    mean = math.fsum(values) / len(values)
+    return math.sqrt(math.fsum((v - mean) ** 2 for v in values) / (len(values) - 1))
+
+
+def run_bootstrap(fits: List[Fit], resamples: int, seed: int, processes: int) -> List[List[List[float] | None]]:
+    """All resamples of all fits, as fit x resample x coefficient."""
+    tasks = []
+    for f, fit in enumerate(fits):
+        for chunk, start in enumerate(range(0, resamples, CHUNK)):
+            tasks.append((f, fit.xtx, fit.xty, min(CHUNK, resamples - start), f"{seed}:{fit.name}:{fit.outcome}:{chunk}"))
+    draws: List[List[List[float] | None]] = [[] for _ in fits]
+    if processes <= 1 or len(tasks) < 2:
+        results = [bootstrap_chunk(*t[1:]) for t in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            results = list(pool.map(bootstrap_chunk, *zip(*[t[1:] for t in tasks])))
+    for (f, *_), chunk in zip(tasks, results):
+        draws[f].extend(chunk)
+    return draws
+
+
+def estimate(panel: Panel, resamples: int, seed: int, processes: int) -> Tuple[Dict[str, float], Dict[str, dict]]:
+    fits = [Fit(name, spec, outcome, panel) for name, spec in SPECS.items() for outcome in spec.outcomes]
+    fitted = [fit for fit in fits if fit.beta is not None]
+    with metrics.timer("bootstrap"):
+        draws = dict(zip(map(id, fitted), run_bootstrap(fitted, resamples, seed, processes)))
+    elasticities = dict(ELASTICITIES)
+    estimates: Dict[str, dict] = {}
+    for name in SPECS:
+        reports = [fit.report(draws.get(id(fit), [])) for fit in fits if fit.name == name]
+        chosen = next((r for r in reports if r["estimate"] is not None), None)
+        entry = {"source": "prior", "prior": ELASTICITIES[name]}
+        if chosen is None:
+            entry["reason"] = "no fit"
+        elif SPECS[name].expected_sign * chosen["estimate"] < 0:
+            entry["reason"] = f"{chosen['outcome']} estimate has the wrong sign"
+        else:
+            elasticities[name] = chosen["estimate"]
+            entry["source"] = "panel"
+        estimates[name] = {**entry, "value": elasticities[name], "fits": reports}
+    return elasticities, estimates
+
+
+def parse_args(argv: Sequence[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--in", dest="in_path", type=Path, help="observations CSV (default: as build_baseline.py)")
+    parser.add_argument("--out", type=Path, default=OUT_PATH)
+    parser.add_argument("--resamples", type=int, default=2000, help="cluster-bootstrap resamples per fit")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--processes", type=int, default=1, help="worker processes for the bootstrap")
+    metrics.add_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    path = args.in_path or observations_path()
+    if not path.exists() and not observation_store.store_path(path).exists():
+        raise SystemExit(f"Missing {path}. Run scripts/fetch_world_bank.py first.")
+
+    recorder = metrics.from_args("estimate_elasticities", args)
+    indicators = sorted({i for spec in SPECS.values() for i in (spec.regressor, *spec.outcomes)})
+    with recorder.stage("load") as stage:
+        panel = load_panel(path, indicators)
+        stage.rows_out = sum(len(by_year) for by_country in panel.values() for by_year in by_country.values())
+    with recorder.stage("estimate") as stage:
+        elasticities, estimates = estimate(panel, args.resamples, args.seed, args.processes)
+        stage.rows_out = sum(1 for e in estimates.values() if e["source"] == "panel")
+
+    out = {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "version": "v1_panel",
+        "elasticities": elasticities,
+        "method": {
+            "model": "distributed-lag panel regression, country and year fixed effects",
+            "input_path": path.relative_to(ROOT).as_posix() if path.is_relative_to(ROOT) else str(path),
+            "bootstrap": "country cluster",
+            "resamples": args.resamples,
+            "seed": args.seed,
+            "ci": CI,
+        },
+        "estimates": estimates,
+    }
+    with recorder.stage("write"):
+        args.out.parent.mkdir(parents=True, exist_ok=True)
+        with args.out.open("w", encoding="utf-8") as f:
+            json.dump(out, f, indent=2)
+    recorder.close()
+
+    for name, e in estimates.items():
+        fit = next((r for r in e["fits"] if r["estimate"] is not None), None)
+        detail = f"{fit['outcome']} 95% CI {fit['ci']}, {fit['rows']} rows" if fit else e["fits"][0].get("reason", "")
+        note = f"; {e['reason']}" if "reason" in e else ""
+        print(f"{name}: {e['value']} ({e['source']}{note}; {detail})")
+    print(f"wrote {args.out} in {recorder.summary()['total_seconds']:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -2,32 +2,52 @@
 """Fetch and normalize World Bank indicators listed in data/indicator_catalog_v1.csv.
 
 Outputs:
-- data/raw/world_bank/world_bank_series.json
-- data/processed/world_bank_observations.csv
-- data/processed/normalization_report.json
+- data/raw/world_bank/cache/ (content-addressed response cache + index.json)
+- data/raw/world_bank/world_bank_archive.dat (+ .index.json): raw API pages,
+  appended per indicator and page (see scripts/raw_archive.py)
+- data/processed/world_bank_observations.csv (+ .store/ columnar copy)
+- data/processed/normalization_report.json (with a `timing` section)
+- data/processed/metrics/fetch_world_bank.jsonl (see scripts/metrics.py)
+
+`--from-archive` re-runs normalization from the raw archive alone, with no
+network access.
 """
 
 from __future__ import annotations
 
+import argparse
 import csv
+import hashlib
+import http.client
 import json
 import sys
+import threading
 import urllib.parse
-import urllib.request
+from collections import Counter, deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass
 from datetime import datetime, timezone
+from itertools import islice
 from pathlib import Path
-from typing import Dict, Iterable, List
+from typing import Deque, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+import metrics
+import observation_store
+import raw_archive
+from http_client import HttpClient
 
 ROOT = Path(__file__).resolve().parents[1]
 CATALOG_PATH = ROOT / "data" / "indicator_catalog_v1.csv"
-RAW_PATH = ROOT / "data" / "raw" / "world_bank" / "world_bank_series.json"
+RAW_PATH = raw_archive.ARCHIVE_PATH
 OBS_PATH = ROOT / "data" / "processed" / "world_bank_observations.csv"
 REPORT_PATH = ROOT / "data" / "processed" / "normalization_report.json"
 PEERS_PATH = ROOT / "data" / "peer_countries_v1.csv"
+CACHE_DIR = ROOT / "data" / "raw" / "world_bank" / "cache"
 
 API_ROOT = "https://api.worldbank.org/v2"
 PAGE_SIZE = 20000
+DEFAULT_WORKERS = 1
+DEFAULT_RATE_LIMIT = 0.0
 
 
 @dataclass
@@ -86,148 +106,526 @@ def read_world_bank_indicators() -> List[Indicator]:
     return items
 
 
-def fetch_indicator_series(indicator_code: str, countries: Iterable[str], start_year: int, end_year: int) -> List[dict]:
+def series_url(
+    indicator_code: str,
+    countries: Sequence[str],
+    start_year: int,
+    end_year: int,
+    page: int,
+    api_root: str = API_ROOT,
+    per_page: int = PAGE_SIZE,
+) -> str:
     country_segment = ";".join(countries)
     params = {
         "format": "json",
         "date": f"{start_year}:{end_year}",
-        "per_page": str(PAGE_SIZE),
-        "page": "1",
+        "per_page": str(per_page),
+        "page": str(page),
     }
-    url = (
-        f"{API_ROOT}/country/{urllib.parse.quote(country_segment, safe=';')}/"
+    return (
+        f"{api_root}/country/{urllib.parse.quote(country_segment, safe=';')}/"
         f"indicator/{urllib.parse.quote(indicator_code)}?{urllib.parse.urlencode(params)}"
     )
 
-    with urllib.request.urlopen(url, timeout=60) as resp:
-        payload = json.loads(resp.read().decode("utf-8"))
-
-    if not isinstance(payload, list) or len(payload) < 2:
-        return []
 
-    meta = payload[0] or {}
-    pages = int(meta.get("pages") or 1)
-    all_rows = list(payload[1] or [])
+def page_meta(page: bytes) -> dict:
+    payload = json.loads(page.decode("utf-8"))
+    if isinstance(payload, list) and payload and isinstance(payload[0], dict):
+        return payload[0]
+    return {}
 
-    for page in range(2, pages + 1):
-        params["page"] = str(page)
-        page_url = (
-            f"{API_ROOT}/country/{urllib.parse.quote(country_segment, safe=';')}/"
-            f"indicator/{urllib.parse.quote(indicator_code)}?{urllib.parse.urlencode(params)}"
-        )
-        with urllib.request.urlopen(page_url, timeout=60) as resp:
-            page_payload = json.loads(resp.read().decode("utf-8"))
-        if isinstance(page_payload, list) and len(page_payload) >= 2 and page_payload[1]:
-            all_rows.extend(page_payload[1])
 
+def rows_from_pages(pages: Iterable[bytes]) -> List[dict]:
+    all_rows: List[dict] = []
+    with metrics.timer("decode_pages"):
+        for page in pages:
+            payload = json.loads(page.decode("utf-8"))
+            if isinstance(payload, list) and len(payload) >= 2 and payload[1]:
+                all_rows.extend(payload[1])
     return all_rows
 
 
-def normalize_rows(indicator: Indicator, rows: List[dict], fetched_at: str) -> List[dict]:
-    out: List[dict] = []
+def series_rows(pages: Sequence[bytes]) -> List[dict]:
+    """Rows of one series in API order (country blocks, newest year first).
+
+    Pages from separate fetches (a cached series extended by later years) are
+    merged back into that order; a single API response already is in it.
+    """
+    rows = rows_from_pages(pages)
+    if len(pages) > 1:
+        order: Dict[str, int] = {}
+        for r in rows:
+            order.setdefault(r.get("countryiso3code") or "", len(order))
+        # Dates are "2020", "2020Q1" or "2020M01"; within one frequency they sort as strings.
+        rows.sort(key=lambda r: r.get("date") or "", reverse=True)
+        rows.sort(key=lambda r: order[r.get("countryiso3code") or ""])
+    return rows
+
+
+def fetch_pages(
+    indicator_code: str,
+    countries: Sequence[str],
+    start_year: int,
+    end_year: int,
+    client: HttpClient,
+    page_pool: ThreadPoolExecutor | None = None,
+    api_root: str = API_ROOT,
+) -> List[bytes]:
+    """Fetch the raw response body of every page, page 1 first.
+
+    Pages 2..N run on `page_pool` when given; the list is always in page order.
+    """
+    first = client.fetch_bytes(series_url(indicator_code, countries, start_year, end_year, 1, api_root))
+    pages = int(page_meta(first).get("pages") or 1)
+    page_urls = [series_url(indicator_code, countries, start_year, end_year, page, api_root) for page in range(2, pages + 1)]
+    if page_pool is not None:
+        rest = list(page_pool.map(client.fetch_bytes, page_urls))
+    else:
+        rest = [client.fetch_bytes(url) for url in page_urls]
+    return [first, *rest]
+
+
+def fetch_indicator_series(
+    indicator_code: str,
+    countries: Iterable[str],
+    start_year: int,
+    end_year: int,
+    client: HttpClient | None = None,
+    page_pool: ThreadPoolExecutor | None = None,
+    api_root: str = API_ROOT,
+) -> List[dict]:
+    """Fetch every page of one indicator; pages 2..N run on `page_pool` when given.
+
+    Rows are concatenated in page order regardless of completion order.
+    """
+    pages = fetch_pages(indicator_code, list(countries), start_year, end_year, client or HttpClient(), page_pool, api_root)
+    return rows_from_pages(pages)
+
+
+class ResponseCache:
+    """Content-addressed store of raw API pages with a per-series index.
+
+    Page bodies are saved verbatim under `objects/<sha256>.json`. `index.json`
+    maps a key of (indicator, country set, start year) to the cached year range,
+    the upstream `lastupdated`/`total` metadata and the page checksums, split into
+    segments when later years were appended to an earlier fetch.
+    """
+
+    def __init__(self, root: Path = CACHE_DIR) -> None:
+        self.root = root
+        self.index_path = root / "index.json"
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {"hit": 0, "extended": 0, "fetched": 0, "offline": 0}
+        self.index: Dict[str, dict] = {}
+        if self.index_path.exists():
+            with self.index_path.open(encoding="utf-8") as f:
+                self.index = json.load(f)
+
+    @staticmethod
+    def series_key(indicator_code: str, countries: Sequence[str], start_year: int) -> str:
+        ident = json.dumps([indicator_code, sorted(countries), start_year])
+        return hashlib.sha256(ident.encode("utf-8")).hexdigest()[:24]
+
+    def _object_path(self, digest: str) -> Path:
+        return self.root / "objects" / digest[:2] / f"{digest}.json"
+
+    def put_page(self, page: bytes) -> str:
+        digest = hashlib.sha256(page).hexdigest()
+        path = self._object_path(digest)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+            tmp.write_bytes(page)
+            tmp.replace(path)
+        return digest
+
+    def get_page(self, digest: str) -> bytes:
+        page = self._object_path(digest).read_bytes()
+        if hashlib.sha256(page).hexdigest() != digest:
+            raise RuntimeError(f"cache object {digest} failed checksum")
+        return page
+
+    def lookup(self, indicator_code: str, countries: Sequence[str], start_year: int) -> dict | None:
+        return self.index.get(self.series_key(indicator_code, countries, start_year))
+
+    def pages(self, entry: dict) -> List[bytes]:
+        return [self.get_page(d) for seg in entry["segments"] for d in seg["pages"]]
+
+    def store(self, indicator_code: str, countries: Sequence[str], start_year: int, end_year: int, meta: dict, segments: List[dict]) -> dict:
+        entry = {
+            "indicator": indicator_code,
+            "countries": sorted(countries),
+            "start_year": start_year,
+            "end_year": end_year,
+            "lastupdated": meta.get("lastupdated"),
+            "total": meta.get("total"),
+            "cached_at": datetime.now(timezone.utc).isoformat(),
+            "segments": segments,
+        }
+        with self._lock:
+            self.index[self.series_key(indicator_code, countries, start_year)] = entry
+        return entry
+
+    def count(self, status: str) -> None:
+        with self._lock:
+            self.stats[status] += 1
+
+    def save(self) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.index_path.with_suffix(".tmp")
+        with self._lock, tmp.open("w", encoding="utf-8") as f:
+            json.dump(self.index, f, indent=2, sort_keys=True)
+        tmp.replace(self.index_path)
+
+
+def fetch_indicator_cached(
+    indicator_code: str,
+    countries: Sequence[str],
+    start_year: int,
+    end_year: int,
+    cache: ResponseCache,
+    client: HttpClient,
+    page_pool: ThreadPoolExecutor | None = None,
+    api_root: str = API_ROOT,
+    offline: bool = False,
+) -> List[bytes]:
+    """Return one indicator's raw pages, touching the network only for what changed.
+
+    A one-row probe reads upstream `lastupdated`/`total`. If they match the cache
+    the cached pages are reused; if only `end_year` moved past the cached range
+    just the new years are fetched; otherwise the series is re-fetched in full.
+    Network errors, truncated responses and unparseable pages (or `offline`)
+    fall back to any cached copy.
+    """
+    entry = cache.lookup(indicator_code, countries, start_year)
+    if entry is not None and entry["end_year"] > end_year:
+        entry = None  # narrower request than what is cached; re-fetch exactly.
+
+    if offline:
+        if entry is None:
+            raise RuntimeError(f"{indicator_code} not cached for offline run")
+        cache.count("offline")
+        return cache.pages(entry)
+
+    try:
+        if entry is not None:
+            probe = client.fetch_bytes(series_url(indicator_code, countries, start_year, end_year, 1, api_root, per_page=1))
+            meta = page_meta(probe)
+            if meta.get("lastupdated") == entry["lastupdated"]:
+                if entry["end_year"] == end_year and meta.get("total") == entry["total"]:
+                    cache.count("hit")
+                    return cache.pages(entry)
+                if entry["end_year"] < end_year:
+                    tail = fetch_pages(indicator_code, countries, entry["end_year"] + 1, end_year, client, page_pool, api_root)
+                    segment = {"start_year": entry["end_year"] + 1, "end_year": end_year, "pages": [cache.put_page(p) for p in tail]}
+                    entry = cache.store(indicator_code, countries, start_year, end_year, meta, [*entry["segments"], segment])
+                    cache.count("extended")
+                    return cache.pages(entry)
+
+        pages = fetch_pages(indicator_code, countries, start_year, end_year, client, page_pool, api_root)
+    except (OSError, http.client.HTTPException, ValueError):
+        if entry is None:
+            raise
+        cache.count("offline")
+        return cache.pages(entry)
+
+    segment = {"start_year": start_year, "end_year": end_year, "pages": [cache.put_page(p) for p in pages]}
+    cache.store(indicator_code, countries, start_year, end_year, page_meta(pages[0]), [segment])
+    cache.count("fetched")
+    return pages
+
+
+def iter_normalized(indicator: Indicator, rows: Iterable[dict], fetched_at: str) -> Iterator[dict]:
     for row in rows:
         value = row.get("value")
         year = row.get("date")
         country = (row.get("countryiso3code") or "").upper()
         if value is None or not country or not year:
             continue
-        out.append(
-            {
-                "country_id": country,
-                "year": int(year),
-                "indicator_id": indicator.indicator_id,
-                "indicator_name": indicator.indicator_name,
-                "source_code": indicator.source_code,
-                "domain": indicator.domain,
-                "value": float(value),
-                "unit": indicator.unit,
-                "frequency": indicator.frequency,
-                "lag_class": indicator.lag_class,
-                "direction_good": indicator.direction_good,
-                "source": indicator.source,
-                "quality_tier": indicator.quality_tier,
-                "quality_flag": indicator.validation_status,
-                "updated_at": fetched_at,
-            }
-        )
-    return out
-
-
-def write_csv(rows: List[dict]) -> None:
+        yield {
+            "country_id": country,
+            "year": int(year),
+            "indicator_id": indicator.indicator_id,
+            "indicator_name": indicator.indicator_name,
+            "source_code": indicator.source_code,
+            "domain": indicator.domain,
+            "value": float(value),
+            "unit": indicator.unit,
+            "frequency": indicator.frequency,
+            "lag_class": indicator.lag_class,
+            "direction_good": indicator.direction_good,
+            "source": indicator.source,
+            "quality_tier": indicator.quality_tier,
+            "quality_flag": indicator.validation_status,
+            "updated_at": fetched_at,
+        }
+
+
+def normalize_rows(indicator: Indicator, rows: List[dict], fetched_at: str) -> List[dict]:
+    return list(iter_normalized(indicator, rows, fetched_at))
+
+
+OBS_FIELDS = [
+    "country_id",
+    "year",
+    "indicator_id",
+    "indicator_name",
+    "source_code",
+    "domain",
+    "value",
+    "unit",
+    "frequency",
+    "lag_class",
+    "direction_good",
+    "source",
+    "quality_tier",
+    "quality_flag",
+    "updated_at",
+]
+
+
+def write_csv(rows: Iterable[dict]) -> None:
     OBS_PATH.parent.mkdir(parents=True, exist_ok=True)
-    fields = [
-        "country_id",
-        "year",
-        "indicator_id",
-        "indicator_name",
-        "source_code",
-        "domain",
-        "value",
-        "unit",
-        "frequency",
-        "lag_class",
-        "direction_good",
-        "source",
-        "quality_tier",
-        "quality_flag",
-        "updated_at",
-    ]
     with OBS_PATH.open("w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=fields)
+        writer = csv.DictWriter(f, fieldnames=OBS_FIELDS)
         writer.writeheader()
         writer.writerows(rows)
 
 
-def main() -> int:
-    start_year = 2000
-    end_year = datetime.now(timezone.utc).year
-    if len(sys.argv) >= 2:
-        start_year = int(sys.argv[1])
-    if len(sys.argv) >= 3:
-        end_year = int(sys.argv[2])
+class StreamWriter:
+    """Appends normalized rows to a `.partial` file as they arrive.
+
+    Each series is flushed once written, so a crash leaves every completed
+    indicator on disk; `commit()` renames the partial file into place. Raw
+    pages go to the append-only `RawArchive` instead.
+    """
+
+    def __init__(self, obs_path: Path = OBS_PATH) -> None:
+        self.obs_path = obs_path
+        self.obs_partial = obs_path.with_name(obs_path.name + ".partial")
+        self.obs_partial.parent.mkdir(parents=True, exist_ok=True)
+        self._obs = self.obs_partial.open("w", newline="", encoding="utf-8")
+        self._writer = csv.DictWriter(self._obs, fieldnames=OBS_FIELDS)
+        self._writer.writeheader()
+        self.row_count = 0
+
+    def write_rows(self, rows: Iterable[dict]) -> int:
+        n = 0
+        for row in rows:
+            self._writer.writerow(row)
+            n += 1
+        self._obs.flush()
+        self.row_count += n
+        return n
+
+    def close(self) -> None:
+        self._obs.close()
+
+    def commit(self) -> None:
+        self.close()
+        self.obs_partial.replace(self.obs_path)
+
+
+def parse_args(argv: Sequence[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("start_year", nargs="?", type=int, default=2000)
+    parser.add_argument("end_year", nargs="?", type=int, default=datetime.now(timezone.utc).year)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="max requests in flight (default: sequential)")
+    parser.add_argument("--rate-limit", type=float, default=DEFAULT_RATE_LIMIT, help="max request starts per second per host (0 = unlimited)")
+    parser.add_argument("--api-root", default=API_ROOT, help="API base URL, e.g. a local stub server")
+    parser.add_argument("--no-cache", action="store_true", help="ignore and do not update the response cache")
+    parser.add_argument("--offline", action="store_true", help="serve every indicator from the response cache")
+    parser.add_argument("--from-archive", action="store_true", help="normalize the raw archive as stored; no network, years ignored")
+    metrics.add_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def iter_fetched(
+    indicators: Sequence[Indicator],
+    peers: Sequence[str],
+    start_year: int,
+    end_year: int,
+    workers: int = DEFAULT_WORKERS,
+    rate_limit: float = DEFAULT_RATE_LIMIT,
+    api_root: str = API_ROOT,
+    cache: ResponseCache | None = None,
+    offline: bool = False,
+    client: HttpClient | None = None,
+) -> Iterator[Tuple[str, List[bytes] | Exception]]:
+    """Yield `(source_code, pages)` per distinct source code in catalog order.
+
+    Up to `workers` requests run in flight (or as many as a shared `client`
+    allows), but at most `2 * workers` series are
+    fetched ahead of the consumer, so memory stays bounded by that window rather
+    than the whole dataset. Failed series yield their exception. With a `cache`,
+    unchanged series are served from disk (see `fetch_indicator_cached`).
+    """
+    workers = max(1, workers)
+    client = client or HttpClient(workers, rate_limit)
+    codes = list(dict.fromkeys(ind.source_code for ind in indicators))
+    # Separate pools so indicator tasks waiting on their pages never starve them.
+    with ThreadPoolExecutor(max_workers=workers) as indicator_pool, ThreadPoolExecutor(max_workers=workers) as page_pool:
+
+        def fetch(code: str) -> List[bytes]:
+            with metrics.timer("fetch_indicator", indicator=code):
+                if cache is None:
+                    return fetch_pages(code, peers, start_year, end_year, client, page_pool, api_root)
+                return fetch_indicator_cached(code, peers, start_year, end_year, cache, client, page_pool, api_root, offline)
+
+        def submit(code: str) -> Future:
+            return indicator_pool.submit(fetch, code)
+
+        pending = iter(codes)
+        window: Deque[Tuple[str, Future]] = deque()
+        for code in islice(pending, 2 * workers):
+            window.append((code, submit(code)))
+        while window:
+            code, future = window.popleft()
+            for nxt in islice(pending, 1):
+                window.append((nxt, submit(nxt)))
+            try:
+                yield code, future.result()
+            except Exception as exc:  # pragma: no cover
+                yield code, exc
+
+
+def fetch_all(
+    indicators: Sequence[Indicator],
+    peers: Sequence[str],
+    start_year: int,
+    end_year: int,
+    workers: int = DEFAULT_WORKERS,
+    rate_limit: float = DEFAULT_RATE_LIMIT,
+    api_root: str = API_ROOT,
+    cache: ResponseCache | None = None,
+    offline: bool = False,
+) -> Dict[str, List[dict] | Exception]:
+    """Collect `iter_fetched` rows into a dict keyed by source code in catalog order."""
+    fetched = iter_fetched(indicators, peers, start_year, end_year, workers, rate_limit, api_root, cache, offline)
+    return {code: pages if isinstance(pages, Exception) else series_rows(pages) for code, pages in fetched}
+
+
+def iter_archived(indicators: Sequence[Indicator], archive: raw_archive.RawArchive) -> Iterator[Tuple[str, List[bytes] | Exception]]:
+    """`iter_fetched` over the raw archive: memory-mapped pages, no network."""
+    for code in dict.fromkeys(ind.source_code for ind in indicators):
+        if code in archive:
+            yield code, archive.pages(code)
+        else:
+            yield code, KeyError(f"{code} not in {archive.path}")
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    start_year = args.start_year
+    end_year = args.end_year
 
     peers = read_peers()
     indicators = read_world_bank_indicators()
     if not indicators:
         print("No World Bank indicators found in catalog.", file=sys.stderr)
         return 1
+    if args.no_cache and args.offline:
+        print("--offline needs the response cache; drop --no-cache.", file=sys.stderr)
+        return 1
 
     fetched_at = datetime.now(timezone.utc).isoformat()
-    raw_dump: Dict[str, List[dict]] = {}
-    normalized: List[dict] = []
     errors: Dict[str, str] = {}
-
-    for indicator in indicators:
-        code = indicator.source_code
-        try:
-            series = fetch_indicator_series(code, peers, start_year, end_year)
-            raw_dump[code] = series
-            normalized.extend(normalize_rows(indicator, series, fetched_at))
-            print(f"fetched {code}: {len(series)} raw rows")
-        except Exception as exc:  # pragma: no cover
-            errors[code] = str(exc)
-            print(f"failed {code}: {exc}", file=sys.stderr)
-
-    RAW_PATH.parent.mkdir(parents=True, exist_ok=True)
-    with RAW_PATH.open("w", encoding="utf-8") as f:
-        json.dump(raw_dump, f)
-
-    write_csv(normalized)
+    archive = raw_archive.RawArchive(RAW_PATH)
+    cache = None if args.no_cache or args.from_archive else ResponseCache()
+    recorder = metrics.from_args("fetch_world_bank", args)
+    client = HttpClient(max(1, args.workers), args.rate_limit)
+    if args.from_archive:
+        archived = [archive.series[code] for code in dict.fromkeys(ind.source_code for ind in indicators) if code in archive]
+        if not archived:
+            print(f"No archived series in {RAW_PATH}.", file=sys.stderr)
+            return 1
+        start_year = min(e["start_year"] for e in archived)
+        end_year = max(e["end_year"] for e in archived)
+        fetched_at = max(e["fetched_at"] for e in archived)
+        series_iter = iter_archived(indicators, archive)
+    else:
+        series_iter = iter_fetched(indicators, peers, start_year, end_year, args.workers, args.rate_limit, args.api_root, cache, args.offline, client)
+
+    # Normalize in catalog order. Catalog rows sharing a source code (e.g. VA.EST)
+    # reuse one fetch, so keep a series only until its last catalog row is done.
+    uses = Counter(ind.source_code for ind in indicators)
+    retained: Dict[str, List[dict] | Exception] = {}
+    stamps: Dict[str, str] = {}
+    cursor = 0
+
+    out = StreamWriter()
+    try:
+        with recorder.stage("fetch_normalize") as stage:
+            stage.rows_in = 0
+            for code, pages in series_iter:
+                if isinstance(pages, Exception):
+                    errors[code] = str(pages)
+                    recorder.count("indicator_errors")
+                    print(f"failed {code}: {pages}", file=sys.stderr)
+                    series: List[dict] | Exception = pages
+                else:
+                    if args.from_archive:
+                        stamps[code] = archive.series[code]["fetched_at"]
+                    else:
+                        archive.append_series(code, pages, fetched_at, start_year, end_year)
+                        archive.commit()
+                        stamps[code] = fetched_at
+                    if cache is not None:
+                        cache.save()
+                    series = series_rows(pages)
+                    stage.rows_in += len(series)
+                    recorder.count("raw_rows", len(series), indicator=code)
+                    print(f"{'archived' if args.from_archive else 'fetched'} {code}: {len(series)} raw rows")
+                retained[code] = series
+                while cursor < len(indicators) and indicators[cursor].source_code in retained:
+                    indicator = indicators[cursor]
+                    rows = retained[indicator.source_code]
+                    if not isinstance(rows, Exception):
+                        with recorder.timer("normalize_indicator", indicator=indicator.indicator_id):
+                            written = out.write_rows(iter_normalized(indicator, rows, stamps[indicator.source_code]))
+                        recorder.count("normalized_rows", written, indicator=indicator.indicator_id)
+                    uses[indicator.source_code] -= 1
+                    if not uses[indicator.source_code]:
+                        del retained[indicator.source_code]
+                    cursor += 1
+            stage.rows_out = out.row_count
+    except BaseException:
+        out.close()
+        recorder.close()
+        raise
+    finally:
+        client.close()
+        if not args.from_archive:
+            archive.commit(sync=True)
+        archive.close()
+    out.commit()
+    with recorder.stage("store") as stage:
+        observation_store.build_store_from_csv(OBS_PATH)
+        stage.rows_in = stage.rows_out = out.row_count
+    for key, value in client.stats.items():
+        recorder.count(f"http_{key}", value)
+    for key, value in archive.stats.items():
+        recorder.count(f"archive_{key}", value)
 
     report = {
         "fetched_at": fetched_at,
         "peer_country_count": len(peers),
         "indicator_count": len(indicators),
-        "normalized_row_count": len(normalized),
+        "normalized_row_count": out.row_count,
         "errors": errors,
         "start_year": start_year,
         "end_year": end_year,
+        "source": "archive" if args.from_archive else "api",
+        "cache": cache.stats if cache is not None else None,
+        "archive": dict(archive.stats),
+        "timing": recorder.summary(),
     }
     with REPORT_PATH.open("w", encoding="utf-8") as f:
         json.dump(report, f, indent=2)
+    recorder.close()
 
     print(json.dumps(report, indent=2))
-    return 0 if len(normalized) > 0 else 2
+    return 0 if out.row_count > 0 else 2
 
 
 if __name__ == "__main__":
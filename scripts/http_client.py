@@ -0,0 +1,202 @@
+"""Shared HTTP layer for the ingestion scripts.
+
+`HttpClient` keeps a pool of keep-alive connections per host, bounds requests
+in flight, spaces request starts per host, and retries transient failures
+(connection errors, 429 and 5xx) with exponential backoff, honouring
+`Retry-After`. It can also record every response body to a fixture directory
+or replay from one with no network access, which is how the ingestors are
+tested and benchmarked offline.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import http.client
+import json
+import random
+import socket
+import threading
+import time
+import urllib.parse
+from pathlib import Path
+from queue import Empty, LifoQueue
+from typing import Dict, Mapping, Tuple
+
+DEFAULT_TIMEOUT = 60.0
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Host unreachable or unknown: retrying only delays the offline fallback.
+NO_RETRY_ERRORS = (ConnectionRefusedError, socket.gaierror)
+MAX_REDIRECTS = 5
+USER_AGENT = "countrymanager-ingest/1.0"
+
+
+class HttpError(OSError):
+    def __init__(self, url: str, status: int, reason: str) -> None:
+        super().__init__(f"HTTP {status} {reason} for {url}")
+        self.url = url
+        self.status = status
+
+
+class FixtureMissing(OSError):
+    pass
+
+
+def fixture_name(url: str) -> str:
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()[:32] + ".body"
+
+
+class HttpClient:
+    """Pooled, rate-limited, retrying GET client with record/replay fixtures.
+
+    `max_in_flight` caps concurrent requests across threads; `rate_limit` is the
+    maximum number of request starts per second to one host (0 = off). With
+    `replay_dir`, responses are read from fixtures (plus `replay_latency`
+    seconds per request) and the network is never touched; with `record_dir`,
+    every live response body is also written there.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = 1,
+        rate_limit: float = 0.0,
+        retries: int = DEFAULT_RETRIES,
+        backoff: float = DEFAULT_BACKOFF,
+        timeout: float = DEFAULT_TIMEOUT,
+        record_dir: Path | None = None,
+        replay_dir: Path | None = None,
+        replay_latency: float = 0.0,
+    ) -> None:
+        self._slots = threading.BoundedSemaphore(max(1, max_in_flight))
+        self._interval = 1.0 / rate_limit if rate_limit > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_start: Dict[str, float] = {}
+        self._pools: Dict[Tuple[str, str], LifoQueue] = {}
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.record_dir = record_dir
+        self.replay_dir = replay_dir
+        self.replay_latency = replay_latency
+        self.stats: Dict[str, int] = {"requests": 0, "retries": 0, "bytes": 0, "replayed": 0}
+
+    def _count(self, key: str, n: int = 1) -> None:
+        with self._lock:
+            self.stats[key] += n
+
+    def _wait_turn(self, host: str) -> None:
+        if not self._interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start.get(host, now))
+            self._next_start[host] = start + self._interval
+        delay = start - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def _pool(self, scheme: str, netloc: str) -> LifoQueue:
+        with self._lock:
+            return self._pools.setdefault((scheme, netloc), LifoQueue())
+
+    def _connection(self, scheme: str, netloc: str) -> http.client.HTTPConnection:
+        try:
+            return self._pool(scheme, netloc).get_nowait()
+        except Empty:
+            cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+            return cls(netloc, timeout=self.timeout)
+
+    def _request_once(self, url: str, headers: Mapping[str, str]) -> Tuple[int, str, Dict[str, str], bytes]:
+        parts = urllib.parse.urlsplit(url)
+        path = urllib.parse.urlunsplit(("", "", parts.path or "/", parts.query, ""))
+        conn = self._connection(parts.scheme, parts.netloc)
+        try:
+            conn.request("GET", path, headers={"User-Agent": USER_AGENT, "Accept-Encoding": "gzip", **headers})
+            resp = conn.getresponse()
+            body = resp.read()
+            resp_headers = {k.lower(): v for k, v in resp.getheaders()}
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            raise
+        if resp_headers.get("connection", "").lower() == "close" or resp.will_close:
+            conn.close()
+        else:
+            self._pool(parts.scheme, parts.netloc).put(conn)
+        if resp_headers.get("content-encoding") == "gzip":
+            body = gzip.decompress(body)
+        return resp.status, resp.reason, resp_headers, body
+
+    def _replay(self, url: str) -> bytes:
+        path = self.replay_dir / fixture_name(url)
+        if not path.exists():
+            raise FixtureMissing(f"no recorded fixture for {url}")
+        if self.replay_latency:
+            time.sleep(self.replay_latency)
+        self._count("replayed")
+        return path.read_bytes()
+
+    def _record(self, url: str, body: bytes) -> None:
+        self.record_dir.mkdir(parents=True, exist_ok=True)
+        path = self.record_dir / fixture_name(url)
+        tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+        tmp.write_bytes(body)
+        tmp.replace(path)
+        index = self.record_dir / "urls.jsonl"
+        with self._lock, index.open("a", encoding="utf-8") as f:
+            f.write(json.dumps({"file": path.name, "url": url}) + "\n")
+
+    def fetch_bytes(self, url: str, headers: Mapping[str, str] | None = None) -> bytes:
+        """GET `url`, following redirects and retrying transient failures."""
+        if self.replay_dir is not None:
+            with self._slots:
+                return self._replay(url)
+        headers = dict(headers or {})
+        target = url
+        attempt = 0
+        redirects = 0
+        with self._slots:
+            while True:
+                self._wait_turn(urllib.parse.urlsplit(target).netloc)
+                self._count("requests")
+                delay = self.backoff * (2**attempt) * (1 + random.random() * 0.25)
+                try:
+                    status, reason, resp_headers, body = self._request_once(target, headers)
+                except NO_RETRY_ERRORS:
+                    raise
+                except (OSError, http.client.HTTPException):
+                    if attempt >= self.retries:
+                        raise
+                else:
+                    if status in (301, 302, 303, 307, 308) and "location" in resp_headers and redirects < MAX_REDIRECTS:
+                        redirects += 1
+                        target = urllib.parse.urljoin(target, resp_headers["location"])
+                        continue
+                    if status < 400:
+                        self._count("bytes", len(body))
+                        if self.record_dir is not None:
+                            self._record(url, body)
+                        return body
+                    if status not in RETRY_STATUSES or attempt >= self.retries:
+                        raise HttpError(target, status, reason)
+                    retry_after = resp_headers.get("retry-after", "")
+                    if retry_after.isdigit():
+                        delay = max(delay, float(retry_after))
+                attempt += 1
+                self._count("retries")
+                time.sleep(delay)
+
+    def fetch_json(self, url: str, headers: Mapping[str, str] | None = None):
+        return json.loads(self.fetch_bytes(url, headers).decode("utf-8"))
+
+    def close(self) -> None:
+        with self._lock:
+            pools = list(self._pools.values())
+            self._pools = {}
+        for pool in pools:
+            while True:
+                try:
+                    pool.get_nowait().close()
+                except Empty:
+                    break
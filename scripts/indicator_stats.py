@@ -0,0 +1,121 @@
+"""Per-indicator summary statistics over year windows and peer sets.
+
+`StatsIndex` scans the observations once and keeps, per indicator and year, the
+values sorted ascending with their countries. `summary(indicator, window,
+peers)` merges the pre-sorted year lists for the window (no re-sort, no
+re-scan) and computes every aggregate in one pass over the merged values:
+
+- count, min, max
+- mean via `math.fsum` (same result as `statistics.fmean`)
+- population variance from the fsum of squared deviations (two-pass, stable)
+- exact quantiles by nearest rank on the merged list (`Summary.quantile`)
+
+Summaries are cached by (indicator, window, peer set), so evaluating many
+windows, rolling windows or single countries reuses one loaded index.
+"""
+
+from __future__ import annotations
+
+import csv
+import heapq
+import math
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, FrozenSet, Iterable, List, Tuple
+
+import observation_store
+
+Window = Tuple[int, int]
+
+
+def nearest_rank(sorted_values: List[float] | Tuple[float, ...], q: float) -> float:
+    """Quantile `q` of ascending values by rounded rank; 0.0 when empty."""
+    if not sorted_values:
+        return 0.0
+    idx = max(0, min(len(sorted_values) - 1, int(round((len(sorted_values) - 1) * q))))
+    return sorted_values[idx]
+
+
+@dataclass(frozen=True)
+class Summary:
+    count: int
+    mean: float
+    variance: float
+    min: float
+    max: float
+    values: Tuple[float, ...] = field(repr=False)
+
+    @property
+    def stdev(self) -> float:
+        return math.sqrt(self.variance)
+
+    def quantile(self, q: float) -> float:
+        return nearest_rank(self.values, q)
+
+    @classmethod
+    def from_sorted(cls, values: Tuple[float, ...]) -> "Summary":
+        n = len(values)
+        mean = math.fsum(values) / n
+        variance = math.fsum((v - mean) ** 2 for v in values) / n
+        return cls(n, mean, variance, values[0], values[-1], values)
+
+
+class StatsIndex:
+    """Observations grouped as indicator -> year -> [(value, country)] ascending."""
+
+    def __init__(self) -> None:
+        self._by_year: Dict[str, Dict[int, List[Tuple[float, str]]]] = {}
+        self._cache: Dict[Tuple[str, Window, FrozenSet[str] | None], Summary | None] = {}
+
+    @classmethod
+    def from_observations(cls, path: Path, years: Window | None = None) -> "StatsIndex":
+        """Load from an observation CSV (or its fresh store), keeping only `years`."""
+        lo, hi = years or (-(10**9), 10**9)
+        grouped: Dict[str, Dict[int, List[Tuple[float, str]]]] = {}
+        store = observation_store.open_for(path)
+        if store is not None:
+            names, countries = store.indicators, store.countries
+            for ind, country, year, value in zip(store.indicator, store.country, store.year, store.value):
+                if lo <= year <= hi:
+                    grouped.setdefault(names[ind], {}).setdefault(year, []).append((value, countries[country]))
+            store.close()
+        else:
+            with path.open(newline="", encoding="utf-8") as f:
+                for row in csv.DictReader(f):
+                    year = int(row["year"])
+                    if lo <= year <= hi:
+                        grouped.setdefault(row["indicator_id"], {}).setdefault(year, []).append((float(row["value"]), row["country_id"]))
+        index = cls()
+        for by_year in grouped.values():
+            for values in by_year.values():
+                values.sort()
+        index._by_year = grouped
+        return index
+
+    def indicators(self) -> List[str]:
+        return list(self._by_year)
+
+    def years(self, indicator: str) -> List[int]:
+        return sorted(self._by_year.get(indicator, {}))
+
+    def values(self, indicator: str, window: Window, peers: Iterable[str] | None = None) -> Tuple[float, ...]:
+        """Ascending values of `indicator` in the window, optionally for `peers` only."""
+        lo, hi = window
+        by_year = self._by_year.get(indicator, {})
+        runs = [by_year[y] for y in sorted(by_year) if lo <= y <= hi]
+        merged = heapq.merge(*runs)
+        if peers is None:
+            return tuple(v for v, _ in merged)
+        wanted = set(peers)
+        return tuple(v for v, c in merged if c in wanted)
+
+    def summary(self, indicator: str, window: Window, peers: Iterable[str] | None = None) -> Summary | None:
+        """Cached statistics for the window, or None when it has no values."""
+        key = (indicator, window, frozenset(peers) if peers is not None else None)
+        if key not in self._cache:
+            values = self.values(indicator, window, key[2])
+            self._cache[key] = Summary.from_sorted(values) if values else None
+        return self._cache[key]
+
+    def clear_cache(self) -> None:
+        self._cache.clear()
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""Ingest every catalog source concurrently into the canonical observation schema.
+
+Each catalog row is routed by its `source` column to an ingestor class:
+- World Bank / WGI: indicators API (`source_code`), via fetch_world_bank
+- SIPRI / IDEA / OBS / EM-DAT / OECD COFOG: no open bulk API; read a manual
+  extract from `data/raw/<source>/<source_code>.csv` (columns `iso3,year,value`)
+  downloaded from the catalog's `api_or_page`
+- Internal: game-constructed variables, skipped
+
+All ingestors share one pooled, retrying `HttpClient` and their per-indicator
+tasks run on one thread pool. Rows are streamed to the output in catalog order.
+`--record DIR` saves every HTTP response and `--replay DIR` runs fully offline
+from those fixtures (add `--replay-latency` to benchmark the fan-out).
+
+Outputs:
+- data/processed/ingested_observations.csv
+- data/processed/ingestion_report.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import re
+import sys
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, fields
+from datetime import datetime, timezone
+from itertools import islice
+from pathlib import Path
+from typing import Callable, Deque, Dict, Iterator, List, Sequence, Tuple
+
+import fetch_world_bank as wb
+from http_client import HttpClient
+
+ROOT = Path(__file__).resolve().parents[1]
+CATALOG_PATH = ROOT / "data" / "indicator_catalog_v1.csv"
+RAW_ROOT = ROOT / "data" / "raw"
+OUT_PATH = ROOT / "data" / "processed" / "ingested_observations.csv"
+REPORT_PATH = ROOT / "data" / "processed" / "ingestion_report.json"
+
+Task = Tuple[str, Callable[[], List[dict]]]
+
+
+@dataclass
+class IngestContext:
+    client: HttpClient
+    countries: List[str]
+    start_year: int
+    end_year: int
+    fetched_at: str
+    raw_root: Path = RAW_ROOT
+    world_bank_api_root: str = wb.API_ROOT
+
+
+def read_catalog() -> List[dict]:
+    with CATALOG_PATH.open(newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+def canonical_row(indicator: dict, country: str, year: int, value: float, fetched_at: str) -> dict:
+    return {
+        "country_id": country,
+        "year": year,
+        "indicator_id": indicator["indicator_id"],
+        "indicator_name": indicator["indicator_name"],
+        "source_code": indicator["source_code"],
+        "domain": indicator["domain"],
+        "value": value,
+        "unit": indicator["unit"],
+        "frequency": indicator["frequency"],
+        "lag_class": indicator["lag_class"],
+        "direction_good": indicator["direction_good"],
+        "source": indicator["source"],
+        "quality_tier": indicator["quality_tier"],
+        "quality_flag": indicator["validation_status"],
+        "updated_at": fetched_at,
+    }
+
+
+class PendingExtract(FileNotFoundError):
+    """A manual-extract source whose CSV has not been downloaded yet."""
+
+
+class Ingestor(ABC):
+    """Turns the catalog rows of one source into canonical observation rows.
+
+    Subclasses list the catalog `source` values they handle and split the work
+    into independent tasks (label, callable returning rows) so the runner can
+    schedule tasks from every source on one pool.
+    """
+
+    sources: Tuple[str, ...] = ()
+
+    def __init__(self, indicators: List[dict], ctx: IngestContext) -> None:
+        self.indicators = indicators
+        self.ctx = ctx
+
+    @abstractmethod
+    def tasks(self) -> Iterator[Task]:
+        """Yield this source's independent (label, callable) work items."""
+
+
+class WorldBankIngestor(Ingestor):
+    sources = ("World Bank", "WGI")
+
+    def tasks(self) -> Iterator[Task]:
+        by_code: Dict[str, List[dict]] = {}
+        for ind in self.indicators:
+            if ind["source_code"].strip():
+                by_code.setdefault(ind["source_code"].strip(), []).append(ind)
+        for code, inds in by_code.items():
+            yield code, lambda code=code, inds=inds: self._fetch(code, inds)
+
+    def _fetch(self, code: str, inds: List[dict]) -> List[dict]:
+        ctx = self.ctx
+        pages = wb.fetch_pages(code, ctx.countries, ctx.start_year, ctx.end_year, ctx.client, api_root=ctx.world_bank_api_root)
+        series = wb.rows_from_pages(pages)
+        out: List[dict] = []
+        for ind in inds:
+            indicator = wb.Indicator(**{f.name: ind[f.name] for f in fields(wb.Indicator)})
+            out.extend(wb.iter_normalized(indicator, series, ctx.fetched_at))
+        return out
+
+
+class ManualExtractIngestor(Ingestor):
+    """Sources without an open bulk API: read a hand-downloaded CSV extract."""
+
+    sources = ("SIPRI", "IDEA", "OBS", "EM-DAT", "OECD COFOG")
+
+    def extract_path(self, ind: dict) -> Path:
+        slug = re.sub(r"[^a-z0-9]+", "_", ind["source"].lower()).strip("_")
+        return self.ctx.raw_root / slug / f"{ind['source_code']}.csv"
+
+    def tasks(self) -> Iterator[Task]:
+        for ind in self.indicators:
+            yield ind["indicator_id"], lambda ind=ind: self._read(ind)
+
+    def _read(self, ind: dict) -> List[dict]:
+        ctx = self.ctx
+        path = self.extract_path(ind)
+        if not path.exists():
+            raise PendingExtract(f"save {ind['api_or_page']} data as {path.relative_to(ROOT)}")
+        wanted = set(ctx.countries)
+        out: List[dict] = []
+        with path.open(newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                country = (row.get("iso3") or row.get("country_id") or "").strip().upper()
+                try:
+                    year = int(row.get("year") or 0)
+                    value = float(row.get("value") or "")
+                except ValueError:
+                    continue
+                if country in wanted and ctx.start_year <= year <= ctx.end_year:
+                    out.append(canonical_row(ind, country, year, value, ctx.fetched_at))
+        return out
+
+
+INGESTORS: List[type] = [WorldBankIngestor, ManualExtractIngestor]
+
+
+def plan(catalog: List[dict], ctx: IngestContext, only: set[str] | None = None) -> Tuple[List[Ingestor], List[dict]]:
+    """Group catalog rows by ingestor; return (ingestors, skipped rows)."""
+    by_source = {source: cls for cls in INGESTORS for source in cls.sources}
+    grouped: Dict[type, List[dict]] = {}
+    skipped: List[dict] = []
+    for ind in catalog:
+        cls = by_source.get(ind["source"])
+        if cls is None or (only and ind["source"] not in only):
+            skipped.append(ind)
+            continue
+        grouped.setdefault(cls, []).append(ind)
+    return [cls(inds, ctx) for cls, inds in grouped.items()], skipped
+
+
+def run_tasks(tasks: Sequence[Task], workers: int) -> Iterator[Tuple[str, List[dict] | Exception]]:
+    """Run tasks on a pool, yielding results in task order with a bounded lookahead."""
+    workers = max(1, workers)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = iter(tasks)
+        window: Deque[Tuple[str, Future]] = deque()
+        for label, fn in islice(pending, 2 * workers):
+            window.append((label, pool.submit(fn)))
+        while window:
+            label, future = window.popleft()
+            for nxt_label, nxt_fn in islice(pending, 1):
+                window.append((nxt_label, pool.submit(nxt_fn)))
+            try:
+                yield label, future.result()
+            except Exception as exc:
+                yield label, exc
+
+
+def parse_args(argv: Sequence[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("start_year", nargs="?", type=int, default=2000)
+    parser.add_argument("end_year", nargs="?", type=int, default=datetime.now(timezone.utc).year)
+    parser.add_argument("--workers", type=int, default=8, help="concurrent tasks and requests in flight")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="max request starts per second per host (0 = unlimited)")
+    parser.add_argument("--sources", default="", help="comma-separated catalog sources to ingest (default: all)")
+    parser.add_argument("--record", type=Path, help="save every HTTP response as a fixture in this directory")
+    parser.add_argument("--replay", type=Path, help="serve HTTP responses from fixtures in this directory (offline)")
+    parser.add_argument("--replay-latency", type=float, default=0.0, help="seconds added to each replayed response")
+    parser.add_argument("--world-bank-api-root", default=wb.API_ROOT)
+    parser.add_argument("--out", type=Path, default=OUT_PATH)
+    return parser.parse_args(argv)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    client = HttpClient(
+        max_in_flight=args.workers,
+        rate_limit=args.rate_limit,
+        record_dir=args.record,
+        replay_dir=args.replay,
+        replay_latency=args.replay_latency,
+    )
+    ctx = IngestContext(
+        client=client,
+        countries=wb.read_peers(),
+        start_year=args.start_year,
+        end_year=args.end_year,
+        fetched_at=datetime.now(timezone.utc).isoformat(),
+        world_bank_api_root=args.world_bank_api_root,
+    )
+    only = {s.strip() for s in args.sources.split(",") if s.strip()} or None
+    ingestors, skipped = plan(read_catalog(), ctx, only)
+    tasks: List[Task] = []
+    task_source: Dict[str, str] = {}
+    for ingestor in ingestors:
+        for label, fn in ingestor.tasks():
+            tasks.append((label, fn))
+            task_source[label] = type(ingestor).__name__
+
+    started = time.perf_counter()
+    rows_by_ingestor: Dict[str, int] = {type(i).__name__: 0 for i in ingestors}
+    errors: Dict[str, str] = {}
+    pending: Dict[str, str] = {}
+    partial = args.out.with_name(args.out.name + ".partial")
+    partial.parent.mkdir(parents=True, exist_ok=True)
+    with partial.open("w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=wb.OBS_FIELDS)
+        writer.writeheader()
+        for label, result in run_tasks(tasks, args.workers):
+            if isinstance(result, PendingExtract):
+                pending[label] = str(result)
+                continue
+            if isinstance(result, Exception):
+                errors[label] = str(result)
+                print(f"failed {label}: {result}", file=sys.stderr)
+                continue
+            writer.writerows(result)
+            f.flush()
+            rows_by_ingestor[task_source[label]] += len(result)
+            print(f"ingested {label}: {len(result)} rows")
+    partial.replace(args.out)
+    client.close()
+
+    report = {
+        "fetched_at": ctx.fetched_at,
+        "start_year": args.start_year,
+        "end_year": args.end_year,
+        "task_count": len(tasks),
+        "rows_by_ingestor": rows_by_ingestor,
+        "row_count": sum(rows_by_ingestor.values()),
+        "errors": errors,
+        "pending_extracts": pending,
+        "skipped_indicators": [ind["indicator_id"] for ind in skipped],
+        "http": client.stats,
+        "mode": "replay" if args.replay else ("record" if args.record else "live"),
+        "elapsed_s": round(time.perf_counter() - started, 3),
+        "output_path": str(args.out),
+    }
+    REPORT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    with REPORT_PATH.open("w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+    return 0 if report["row_count"] > 0 else 2
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
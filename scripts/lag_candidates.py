@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""Rank lead/lag candidates between indicators and check the catalog's `lag_class`.
+
+For every ordered pair of indicators (leader, follower) and every lag of 0-10
+years, this computes the cross-correlation of their year-on-year changes,
+pooled over all peer countries: `r(L) = corr(d leader[c, t], d follower[c, t + L])`.
+Changes are standardized per country and indicator first. Country-level
+shifts and trends therefore drop out, and `r` becomes a mean of products over
+the country-years both series cover.
+
+The computation is matrix-shaped. Each indicator's standardized changes for
+all countries are laid end to end in one vector, with missing cells as zero.
+For lag L, every leader vector is cut to the first `T - L` changes of each
+country and every follower vector to the last `T - L`. Lag L of the whole
+indicator x indicator matrix is then one dot product per pair of those cut
+vectors, taken in C by `sum(map(mul, ...))`. Overlap counts come from
+popcounts of missing-value bitmasks. In the bitmasks each country's segment
+is followed by `max_lag` zero bits, so a shift never pairs one country's
+year with another's.
+
+A pair's best lag is the one with the largest `|r| * sqrt(overlap)` among
+lags with at least `MIN_OVERLAP` shared country-years. Longer lags overlap
+less and are noisier, so raw |r| would favour them. The pair is a candidate
+when that statistic clears `Z_CRIT`, which is set above the usual 2 because
+every pair tries 11 lags. Candidates are ranked by |r|, and each carries
+the share of countries whose own correlation at that lag has the pooled sign.
+
+Lag classes are short (0-1 years), medium (2-4) and long (5-10). An
+indicator's data-implied class is that of the median best lag of its
+`TOP_DRIVERS` strongest non-derived leaders. It is checked against the
+catalog's `lag_class`.
+
+Inputs:
+- data/processed/observations_gated_v1.csv (else observations_v1.csv, as in build_baseline.py)
+
+Outputs:
+- data/processed/lag_candidates.csv (ranked candidate table)
+- data/processed/lag_candidates_report.json (per-indicator lag_class check, summary, timing)
+
+Usage:
+- python3 scripts/lag_candidates.py
+- python3 scripts/lag_candidates.py --max-lag 6 --top 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import math
+import statistics
+import sys
+from datetime import datetime, timezone
+from itertools import chain
+from operator import mul
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+import metrics
+import observation_store
+from baseline_spec import observations_path
+
+ROOT = Path(__file__).resolve().parents[1]
+OUT_PATH = ROOT / "data" / "processed" / "lag_candidates.csv"
+REPORT_PATH = ROOT / "data" / "processed" / "lag_candidates_report.json"
+
+MAX_LAG = 10
+MIN_OVERLAP = 40  # pooled country-years
+MIN_COUNTRY_OVERLAP = 5
+Z_CRIT = 3.0
+MIN_POINTS = 4  # changes per country series to standardize it
+TOP_DRIVERS = 3
+LAG_CLASSES = (("short", 0, 1), ("medium", 2, 4), ("long", 5, 10))
+
+FIELDS = [
+    "rank",
+    "leader",
+    "follower",
+    "lag_years",
+    "lag_class",
+    "r",
+    "overlap",
+    "countries",
+    "country_sign_agreement",
+    "derived",
+    "follower_catalog_lag_class",
+]
+
+
+def lag_class(lag: float) -> str:
+    for name, lo, hi in LAG_CLASSES:
+        if lag <= hi:
+            return name
+    return LAG_CLASSES[-1][0]
+
+
+class Panel:
+    """Standardized year-on-year changes per indicator as padded country-major vectors."""
+
+    def __init__(self, store: observation_store.ObservationStore, max_lag: int) -> None:
+        self.year0 = min(store.year)
+        span = max(store.year) - self.year0 + 1
+        self.n_changes = span - 1
+        self.segment = self.n_changes + max_lag  # bitmask stride
+        self.countries = list(store.countries)
+        self.derived = set()
+        self.catalog_class: Dict[str, str] = {}
+        cells: Dict[int, Dict[int, List[float]]] = {}
+        for ind, country, year, value in zip(store.indicator, store.country, store.year, store.value):
+            cells.setdefault(ind, {}).setdefault(country, [math.nan] * span)[year - self.year0] = value
+        for ind, var in set(zip(store.indicator, store.variant)):
+            variant = store.variants[var]
+            name = store.indicators[ind]
+            if variant.get("source") == "Derived":
+                self.derived.add(name)
+            self.catalog_class.setdefault(name, store.indicator_meta.get(name, {}).get("lag_class") or variant.get("lag_class", ""))
+        self.names: List[str] = []
+        self.vectors: List[List[float]] = []
+        self.masks: List[int] = []
+        for ind in sorted(cells, key=lambda i: store.indicators[i]):
+            vector = [0.0] * (len(self.countries) * self.n_changes)
+            mask = 0
+            for country, levels in cells[ind].items():
+                changes = [b - a for a, b in zip(levels, levels[1:])]
+                present = [d for d in changes if d == d]
+                if len(present) < MIN_POINTS:
+                    continue
+                mean = math.fsum(present) / len(present)
+                sd = math.sqrt(math.fsum((d - mean) ** 2 for d in present) / len(present))
+                if sd == 0:
+                    continue
+                base, bit = country * self.n_changes, country * self.segment
+                for t, d in enumerate(changes):
+                    if d == d:
+                        vector[base + t] = (d - mean) / sd
+                        mask |= 1 << (bit + t)
+            if mask:
+                self.names.append(store.indicators[ind])
+                self.vectors.append(vector)
+                self.masks.append(mask)
+
+    def cut(self, vector: List[float], start: int, stop: int) -> List[float]:
+        """Changes `start:stop` of every country's segment, concatenated."""
+        t = self.n_changes
+        return list(chain.from_iterable(vector[c * t + start : c * t + stop] for c in range(len(self.countries))))
+
+    def country_r(self, i: int, j: int, lag: int) -> List[float]:
+        """Per-country correlations of leader `i` and follower `j` at `lag` (enough overlap only)."""
+        out = []
+        a, b, t = self.vectors[i], self.vectors[j], self.n_changes
+        window = (1 << self.segment) - 1
+        overlap = self.masks[i] & (self.masks[j] >> lag)
+        for c in range(len(self.countries)):
+            n = ((overlap >> (c * self.segment)) & window).bit_count()
+            if n >= MIN_COUNTRY_OVERLAP:
+                out.append(sum(map(mul, a[c * t : c * t + t - lag], b[c * t + lag : c * t + t])) / n)
+        return out
+
+
+def cross_correlations(panel: Panel, max_lag: int) -> Tuple[List[List[List[float]]], List[List[List[int]]]]:
+    """`r[L][i][j]` and `n[L][i][j]`: leader i, follower j, lag L (NaN below `MIN_OVERLAP`)."""
+    k = len(panel.names)
+    vectors, masks = panel.vectors, panel.masks
+    r = [[[math.nan] * k for _ in range(k)] for _ in range(max_lag + 1)]
+    n = [[[0] * k for _ in range(k)] for _ in range(max_lag + 1)]
+    t = panel.n_changes
+    for lag in range(min(max_lag, t - 1) + 1):
+        leaders = [panel.cut(v, 0, t - lag) for v in vectors]
+        followers = [panel.cut(v, lag, t) for v in vectors]
+        shifted_masks = [m >> lag for m in masks]
+        r_l, n_l = r[lag], n[lag]
+        for i in range(k):
+            a, m = leaders[i], masks[i]
+            for j in range(i + 1 if lag == 0 else 0, k):
+                if i == j:
+                    continue
+                count = (m & shifted_masks[j]).bit_count()
+                n_l[i][j] = count
+                if count >= MIN_OVERLAP:
+                    r_l[i][j] = max(-1.0, min(1.0, sum(map(mul, a, followers[j])) / count))
+                if lag == 0:  # symmetric: either series can lead at lag 0
+                    n_l[j][i], r_l[j][i] = n_l[i][j], r_l[i][j]
+    return r, n
+
+
+def rank_candidates(panel: Panel, r: List[List[List[float]]], n: List[List[List[int]]]) -> List[dict]:
+    k = len(panel.names)
+    candidates = []
+    for i in range(k):
+        for j in range(k):
+            if i == j:
+                continue
+            best, score = None, 0.0
+            for lag in range(len(r)):
+                value = r[lag][i][j]
+                if value == value and abs(value) * math.sqrt(n[lag][i][j]) > score:
+                    best, score = lag, abs(value) * math.sqrt(n[lag][i][j])
+            if best is None or score < Z_CRIT:
+                continue
+            value, count = r[best][i][j], n[best][i][j]
+            per_country = panel.country_r(i, j, best)
+            agree = sum(1 for c in per_country if c * value > 0)
+            leader, follower = panel.names[i], panel.names[j]
+            candidates.append(
+                {
+                    "leader": leader,
+                    "follower": follower,
+                    "lag_years": best,
+                    "lag_class": lag_class(best),
+                    "r": round(value, 4),
+                    "overlap": count,
+                    "countries": len(per_country),
+                    "country_sign_agreement": round(agree / len(per_country), 3) if per_country else None,
+                    "derived": leader in panel.derived or follower in panel.derived,
+                    "follower_catalog_lag_class": panel.catalog_class.get(follower, ""),
+                }
+            )
+    candidates.sort(key=lambda c: (-abs(c["r"]), c["leader"], c["follower"]))
+    for rank, c in enumerate(candidates, 1):
+        c["rank"] = rank
+    return candidates
+
+
+def check_lag_classes(panel: Panel, candidates: List[dict]) -> Dict[str, dict]:
+    drivers: Dict[str, List[dict]] = {}
+    for c in candidates:
+        if c["leader"] not in panel.derived and len(drivers.setdefault(c["follower"], [])) < TOP_DRIVERS:
+            drivers[c["follower"]].append(c)
+    checks = {}
+    for name in panel.names:
+        catalog = panel.catalog_class.get(name, "")
+        top = drivers.get(name, [])
+        if not top:
+            checks[name] = {"catalog": catalog, "implied": None, "median_lag": None, "drivers": [], "status": "no_candidates"}
+            continue
+        median = statistics.median(c["lag_years"] for c in top)
+        implied = lag_class(median)
+        checks[name] = {
+            "catalog": catalog,
+            "implied": implied,
+            "median_lag": median,
+            "drivers": [{"leader": c["leader"], "lag_years": c["lag_years"], "r": c["r"]} for c in top],
+            "status": "agrees" if implied == catalog else "disagrees",
+        }
+    return checks
+
+
+def parse_args(argv: Sequence[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--in", dest="in_path", type=Path, help="observations CSV (default: as build_baseline.py)")
+    parser.add_argument("--out", type=Path, default=OUT_PATH)
+    parser.add_argument("--report", type=Path, default=REPORT_PATH)
+    parser.add_argument("--max-lag", type=int, default=MAX_LAG)
+    parser.add_argument("--top", type=int, help="keep only the first N candidates in the table")
+    metrics.add_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    path = args.in_path or observations_path()
+    if not path.exists() and not observation_store.store_path(path).exists():
+        raise SystemExit(f"Missing {path}. Run scripts/fetch_world_bank.py first.")
+
+    recorder = metrics.from_args("lag_candidates", args)
+    store = observation_store.open_or_build(path)
+    try:
+        with recorder.stage("load") as stage:
+            panel = Panel(store, args.max_lag)
+            stage.rows_in = store.row_count
+            stage.rows_out = len(panel.names)
+    finally:
+        store.close()
+    with recorder.stage("correlate") as stage:
+        r, n = cross_correlations(panel, args.max_lag)
+        stage.rows_out = sum(1 for layer in n for row in layer for v in row if v)
+    with recorder.stage("rank") as stage:
+        candidates = rank_candidates(panel, r, n)
+        checks = check_lag_classes(panel, candidates)
+        stage.rows_out = len(candidates)
+
+    with recorder.stage("write"):
+        args.out.parent.mkdir(parents=True, exist_ok=True)
+        with args.out.open("w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=FIELDS)
+            writer.writeheader()
+            writer.writerows(candidates[: args.top] if args.top else candidates)
+        statuses = [c["status"] for c in checks.values()]
+        report = {
+            "generated_at": datetime.now(timezone.utc).isoformat(),
+            "input_path": str(path),
+            "output_path": str(args.out),
+            "max_lag": args.max_lag,
+            "min_overlap": MIN_OVERLAP,
+            "lag_classes": {name: [lo, hi] for name, lo, hi in LAG_CLASSES},
+            "indicators": len(panel.names),
+            "countries": len(panel.countries),
+            "pairs_evaluated": sum(1 for layer in n for row in layer for v in row if v >= MIN_OVERLAP),
+            "candidates": len(candidates),
+            "lag_class_check": {status: statuses.count(status) for status in ("agrees", "disagrees", "no_candidates")},
+            "indicator_checks": checks,
+            "timing": recorder.summary(),
+        }
+        with args.report.open("w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    recorder.close()
+
+    print(f"{len(candidates)} lag candidates over {len(panel.names)} indicators x {len(panel.countries)} countries; lag_class {report['lag_class_check']}")
+    print(f"wrote {args.out} and {args.report} in {report['timing']['total_seconds']:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
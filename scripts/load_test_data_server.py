@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""Load-test `data_server.py`: throughput and latency percentiles per request kind.
+
+Starts the server in a subprocess on a free port (or targets `--url`), then
+drives it from `--connections` keep-alive connections on one asyncio loop.
+Each connection sends a seeded mix of:
+
+- `range`: `/api/observations` for a random country, indicator and year range
+- `artifact`: `baseline_v1.json` with `Accept-Encoding: gzip`
+- `conditional`: the same with `If-None-Match` set to its ETag (expects 304)
+
+Latency is measured per request from write to the last body byte. Results go
+to `data/processed/benchmarks/data_server_load.json`.
+
+Usage:
+- python3 scripts/load_test_data_server.py
+- python3 scripts/load_test_data_server.py --connections 128 --requests 50000
+- python3 scripts/load_test_data_server.py --url http://127.0.0.1:4173
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import sys
+import time
+import urllib.parse
+import urllib.request
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+from indicator_stats import nearest_rank
+
+ROOT = Path(__file__).resolve().parents[1]
+OUT_PATH = ROOT / "data" / "processed" / "benchmarks" / "data_server_load.json"
+ARTIFACT = "/data/calibrated/baseline_v1.json"
+MIX = (("range", 0.6), ("artifact", 0.2), ("conditional", 0.2))
+EXPECTED = {"range": 200, "artifact": 200, "conditional": 304}
+
+
+def start_server(extra: Sequence[str]) -> Tuple[subprocess.Popen, str]:
+    proc = subprocess.Popen(
+        [sys.executable, str(Path(__file__).with_name("data_server.py")), "--port", "0", *extra],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    line = proc.stdout.readline()
+    if not line.startswith("serving "):
+        proc.kill()
+        raise SystemExit(f"data_server.py did not start: {line.strip()}")
+    return proc, line.split()[1].rstrip("/")
+
+
+def get_json(url: str) -> Tuple[dict, Dict[str, str]]:
+    with urllib.request.urlopen(url) as resp:
+        return json.load(resp), dict(resp.headers)
+
+
+def plan(url: str, n: int, seed: int) -> List[Tuple[str, bytes]]:
+    """`n` (kind, raw request) pairs drawn from `MIX`."""
+    host = urllib.parse.urlsplit(url).netloc
+    countries = get_json(f"{url}/api/countries")[0]["countries"]
+    indicators = sorted(get_json(f"{url}/api/indicators")[0]["indicators"])
+    req = urllib.request.Request(url + ARTIFACT, headers={"Accept-Encoding": "gzip"})
+    with urllib.request.urlopen(req) as resp:
+        etag = resp.headers["ETag"]
+    rng = random.Random(seed)
+    kinds, weights = zip(*MIX)
+    out = []
+    for kind in rng.choices(kinds, weights, k=n):
+        headers = {"Host": host, "Accept-Encoding": "gzip"}
+        if kind == "range":
+            lo = rng.randint(2000, 2020)
+            query = urllib.parse.urlencode({"country": rng.choice(countries), "indicator": rng.choice(indicators), "from": lo, "to": lo + rng.randint(0, 10)})
+            target = f"/api/observations?{query}"
+        else:
+            target = ARTIFACT
+            if kind == "conditional":
+                headers["If-None-Match"] = etag
+        head = f"GET {target} HTTP/1.1\r\n" + "".join(f"{k}: {v}\r\n" for k, v in headers.items()) + "\r\n"
+        out.append((kind, head.encode("latin-1")))
+    return out
+
+
+async def connection(host: str, port: int, requests: List[Tuple[str, bytes]], results: List[Tuple[str, int, float]]) -> None:
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for kind, raw in requests:
+            started = time.perf_counter()
+            writer.write(raw)
+            head = await reader.readuntil(b"\r\n\r\n")
+            status = int(head[9:12])
+            length = 0
+            for line in head.split(b"\r\n"):
+                if line[:15].lower() == b"content-length:":
+                    length = int(line[15:])
+            if length:
+                await reader.readexactly(length)
+            results.append((kind, status, time.perf_counter() - started))
+    finally:
+        writer.close()
+
+
+async def drive(url: str, requests: List[Tuple[str, bytes]], connections: int) -> Tuple[List[Tuple[str, int, float]], float]:
+    parts = urllib.parse.urlsplit(url)
+    results: List[Tuple[str, int, float]] = []
+    shards = [requests[i::connections] for i in range(connections)]
+    started = time.perf_counter()
+    await asyncio.gather(*(connection(parts.hostname, parts.port, shard, results) for shard in shards if shard))
+    return results, time.perf_counter() - started
+
+
+def summarize(results: List[Tuple[str, int, float]], elapsed: float) -> dict:
+    def stats(latencies: List[float]) -> dict:
+        ordered = sorted(latencies)
+        return {
+            "requests": len(ordered),
+            "p50_ms": round(nearest_rank(ordered, 0.50) * 1000, 3),
+            "p90_ms": round(nearest_rank(ordered, 0.90) * 1000, 3),
+            "p99_ms": round(nearest_rank(ordered, 0.99) * 1000, 3),
+            "max_ms": round(ordered[-1] * 1000, 3),
+        }
+
+    by_kind: Dict[str, List[float]] = {}
+    unexpected: Dict[str, int] = {}
+    for kind, status, seconds in results:
+        by_kind.setdefault(kind, []).append(seconds)
+        if status != EXPECTED[kind]:
+            key = f"{kind}:{status}"
+            unexpected[key] = unexpected.get(key, 0) + 1
+    return {
+        "requests": len(results),
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(len(results) / elapsed, 1),
+        "all": stats([r[2] for r in results]),
+        "kinds": {kind: stats(v) for kind, v in sorted(by_kind.items())},
+        "unexpected_status": unexpected,
+    }
+
+
+def parse_args(argv: Sequence[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="test a running server instead of starting one")
+    parser.add_argument("--connections", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", type=Path, default=OUT_PATH)
+    return parser.parse_args(argv)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    proc = None
+    url = args.url
+    if url is None:
+        proc, url = start_server(["--poll", "60"])
+    try:
+        requests = plan(url.rstrip("/"), args.requests, args.seed)
+        results, elapsed = asyncio.run(drive(url, requests, args.connections))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+    summary = summarize(results, elapsed)
+    report = {"generated_at": datetime.now(timezone.utc).isoformat(), "url": url, "connections": args.connections, "seed": args.seed, **summary}
+    args.out.parent.mkdir(parents=True, exist_ok=True)
+    with args.out.open("w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"{summary['requests']} requests over {args.connections} connections in {summary['seconds']}s: {summary['requests_per_second']} req/s")
+    for kind, s in [("all", summary["all"]), *summary["kinds"].items()]:
+        print(f"  {kind:12s} n={s['requests']:6d}  p50 {s['p50_ms']:7.3f} ms  p90 {s['p90_ms']:7.3f} ms  p99 {s['p99_ms']:7.3f} ms")
+    if summary["unexpected_status"]:
+        print(f"unexpected statuses: {summary['unexpected_status']}")
+        return 1
+    print(f"wrote {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,262 @@
+"""Shared timing, counter and profiling instrumentation for the pipeline scripts.
+
+A script creates one `Metrics` recorder (usually via `add_arguments` and
+`from_args`) and wraps its phases in `stage(...)`. Each stage records wall
+time, rows in/out and the process's peak RSS so far. Library code deeper in
+the call stack reports through the module-level `timer(...)` and
+`count(...)`, which go to the active recorder and cost nothing when none is
+active, so helpers like `rows_from_pages` need no extra parameters. Both are
+thread-safe.
+
+Every stage end and labelled timer observation becomes one JSON lines event.
+`close()` appends them plus a summary event with per-label totals and, when
+asked, writes a Prometheus text-format file. `summary()` (totals per name) is
+the `timing` section the scripts embed in their JSON reports.
+
+With `profile="cprofile"` each stage runs under cProfile (calling thread
+only) and its stats go to `<profile_dir>/<script>.<stage>.prof`. With
+`profile="tracemalloc"` each stage records its Python heap peak and top
+allocation sites.
+"""
+
+from __future__ import annotations
+
+import argparse
+import cProfile
+import json
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+METRICS_DIR = ROOT / "data" / "processed" / "metrics"
+PROFILERS = ("cprofile", "tracemalloc")
+TOP_ALLOCATIONS = 10
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def peak_rss_bytes() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _labels(labels: Dict[str, object]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _key(name: str, labels: Labels) -> str:
+    return name + "".join(f"[{k}={v}]" for k, v in labels)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class StageRecord:
+    """Mutable handle for the stage in progress; set rows and extra counts on it."""
+
+    def __init__(self, name: str, labels: Dict[str, object]) -> None:
+        self.name = name
+        self.labels = labels
+        self.rows_in: int | None = None
+        self.rows_out: int | None = None
+        self.extra: Dict[str, float] = {}
+        self.seconds = 0.0
+        self.peak_rss_bytes = 0
+
+    def add(self, key: str, n: float = 1) -> None:
+        self.extra[key] = self.extra.get(key, 0) + n
+
+    def as_dict(self) -> dict:
+        out = {"seconds": round(self.seconds, 4), "rows_in": self.rows_in, "rows_out": self.rows_out, "peak_rss_mb": round(self.peak_rss_bytes / (1 << 20), 1)}
+        if self.labels:
+            out["labels"] = {k: str(v) for k, v in self.labels.items()}
+        return {**out, **self.extra}
+
+
+class Metrics:
+    def __init__(self, script: str, jsonl_path: Path | None = None, prom_path: Path | None = None, profile: str | None = None, profile_dir: Path | None = None) -> None:
+        if profile is not None and profile not in PROFILERS:
+            raise ValueError(f"unknown profiler {profile!r}; expected one of {PROFILERS}")
+        self.script = script
+        self.run_id = uuid.uuid4().hex[:12]
+        self.jsonl_path = jsonl_path
+        self.prom_path = prom_path
+        self.profile = profile
+        self.profile_dir = profile_dir or METRICS_DIR / "profiles"
+        self.stages: List[StageRecord] = []
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        self.timers: Dict[Tuple[str, Labels], List[float]] = {}  # [count, sum, max]
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+        self._events: List[str] = []
+
+    def _emit(self, event: dict) -> None:
+        if self.jsonl_path is None:
+            return
+        line = json.dumps({"ts": datetime.now(timezone.utc).isoformat(), "run_id": self.run_id, "script": self.script, **event})
+        with self._lock:
+            self._events.append(line)
+
+    @contextmanager
+    def stage(self, name: str, **labels: object) -> Iterator[StageRecord]:
+        record = StageRecord(name, labels)
+        profiler = None
+        if self.profile == "cprofile":
+            profiler = cProfile.Profile()
+            profiler.enable()
+        elif self.profile == "tracemalloc":
+            tracemalloc.start()
+        started = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record.seconds = time.perf_counter() - started
+            record.peak_rss_bytes = peak_rss_bytes()
+            if profiler is not None:
+                profiler.disable()
+                self.profile_dir.mkdir(parents=True, exist_ok=True)
+                path = self.profile_dir / f"{self.script}.{name}.prof"
+                profiler.dump_stats(path)
+                record.extra["profile"] = str(path)
+            elif self.profile == "tracemalloc":
+                snapshot = tracemalloc.take_snapshot()
+                record.extra["py_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / (1 << 20), 2)
+                tracemalloc.stop()
+                top = snapshot.statistics("lineno")[:TOP_ALLOCATIONS]
+                record.extra["top_allocations"] = [f"{s.traceback[0].filename}:{s.traceback[0].lineno} {s.size / 1024:.0f} KiB" for s in top]
+            with self._lock:
+                self.stages.append(record)
+            self._emit({"type": "stage", "stage": name, **record.as_dict()})
+
+    def count(self, name: str, value: float = 1, **labels: object) -> None:
+        key = (name, _labels(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels: object) -> None:
+        key = (name, _labels(labels))
+        with self._lock:
+            agg = self.timers.setdefault(key, [0, 0.0, 0.0])
+            agg[0] += 1
+            agg[1] += seconds
+            agg[2] = max(agg[2], seconds)
+        if labels:
+            self._emit({"type": "timer", "name": name, "labels": {k: str(v) for k, v in labels.items()}, "seconds": round(seconds, 6)})
+
+    @contextmanager
+    def timer(self, name: str, **labels: object) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def summary(self, detail: bool = False) -> dict:
+        """Timing section for a script's JSON report; `detail` keeps labelled series apart."""
+        timers: Dict[str, dict] = {}
+        for (name, labels), (n, total, top) in sorted(self.timers.items()):
+            agg = timers.setdefault(_key(name, labels) if detail else name, {"count": 0, "seconds": 0.0, "max_seconds": 0.0})
+            agg["count"] += n
+            agg["seconds"] = round(agg["seconds"] + total, 4)
+            agg["max_seconds"] = round(max(agg["max_seconds"], top), 4)
+        counters: Dict[str, float] = {}
+        for (name, labels), value in sorted(self.counters.items()):
+            key = _key(name, labels) if detail else name
+            counters[key] = counters.get(key, 0) + value
+        return {
+            "run_id": self.run_id,
+            "total_seconds": round(time.perf_counter() - self._started, 4),
+            "peak_rss_mb": round(peak_rss_bytes() / (1 << 20), 1),
+            "stages": {_key(r.name, _labels(r.labels)): r.as_dict() for r in self.stages},
+            "timers": timers,
+            "counters": counters,
+        }
+
+    def prometheus(self) -> str:
+        lines: List[str] = []
+        base = (("script", self.script),)
+
+        def series(name: str, help_text: str, kind: str, rows: List[Tuple[Labels, float]]) -> None:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in rows:
+                text = ",".join(f'{k}="{_escape(v)}"' for k, v in base + labels)
+                lines.append(f"{name}{{{text}}} {value}")
+
+        series("cm_stage_duration_seconds", "Wall time of a pipeline stage.", "gauge", [((("stage", r.name),) + _labels(r.labels), round(r.seconds, 6)) for r in self.stages])
+        series("cm_stage_rows_out", "Rows produced by a pipeline stage.", "gauge", [((("stage", r.name),) + _labels(r.labels), r.rows_out) for r in self.stages if r.rows_out is not None])
+        series("cm_peak_rss_bytes", "Peak resident set size of the script.", "gauge", [((), peak_rss_bytes())])
+        for name in sorted({name for name, _ in self.counters}):
+            rows = [(labels, value) for (n, labels), value in sorted(self.counters.items()) if n == name]
+            series(f"cm_{name}_total", f"Counter {name}.", "counter", rows)
+        for name in sorted({name for name, _ in self.timers}):
+            rows = [(labels, agg) for (n, labels), agg in sorted(self.timers.items()) if n == name]
+            series(f"cm_{name}_seconds_sum", f"Total seconds in {name}.", "counter", [(labels, round(agg[1], 6)) for labels, agg in rows])
+            series(f"cm_{name}_seconds_count", f"Observations of {name}.", "counter", [(labels, agg[0]) for labels, agg in rows])
+        return "\n".join(lines) + "\n"
+
+    def close(self) -> None:
+        """Write the JSON lines (plus a summary event) and the Prometheus file, if configured."""
+        if self.jsonl_path is not None:
+            self._emit({"type": "summary", **self.summary(detail=True)})
+            self.jsonl_path.parent.mkdir(parents=True, exist_ok=True)
+            with self.jsonl_path.open("a", encoding="utf-8") as f:
+                f.write("\n".join(self._events) + "\n")
+            self._events = []
+        if self.prom_path is not None:
+            self.prom_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.prom_path.with_suffix(".tmp")
+            tmp.write_text(self.prometheus(), encoding="utf-8")
+            os.replace(tmp, self.prom_path)
+
+
+_active: Metrics | None = None
+
+
+def activate(recorder: Metrics | None) -> Metrics | None:
+    """Make `recorder` the target of module-level `timer`/`count`; returns the previous one."""
+    global _active
+    previous, _active = _active, recorder
+    return previous
+
+
+@contextmanager
+def timer(name: str, **labels: object) -> Iterator[None]:
+    recorder = _active
+    if recorder is None:
+        yield
+        return
+    with recorder.timer(name, **labels):
+        yield
+
+
+def count(name: str, value: float = 1, **labels: object) -> None:
+    if _active is not None:
+        _active.count(name, value, **labels)
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    group = parser.add_argument_group("metrics")
+    group.add_argument("--metrics", type=Path, help="JSON lines metrics file (default: data/processed/metrics/<script>.jsonl)")
+    group.add_argument("--no-metrics", action="store_true", help="do not write JSON lines metrics")
+    group.add_argument("--prometheus", type=Path, help="also write a Prometheus text-format file")
+    group.add_argument("--profile", choices=PROFILERS, help="profile every stage with cProfile or tracemalloc")
+    group.add_argument("--profile-dir", type=Path, help="where cProfile stats go (default: data/processed/metrics/profiles)")
+
+
+def from_args(script: str, args: argparse.Namespace) -> Metrics:
+    """Build and activate the recorder for `script` from `add_arguments` options."""
+    jsonl = None if args.no_metrics else (args.metrics or METRICS_DIR / f"{script}.jsonl")
+    recorder = Metrics(script, jsonl, args.prometheus, args.profile, args.profile_dir)
+    activate(recorder)
+    return recorder
@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""Columnar, memory-mappable store for observation CSVs.
+
+A store is a directory next to its CSV (e.g. `observations_v1.store/`) holding
+one NumPy-compatible `.npy` file per column plus a `meta.json` sidecar:
+
+- `country.npy` (uint16), `indicator.npy` (uint16), `flag.npy` (uint8): codes
+  into the dictionaries in `meta.json`
+- `year.npy` (int16), `value.npy` (float64)
+- `variant.npy` (uint16): code into `meta.json["variants"]`, the distinct
+  combinations of the remaining CSV fields (name, unit, source, quality flag,
+  updated_at, ...) plus how `value` was formatted, so the CSV can be exported
+  byte-for-byte
+
+`meta.json` also carries the indicator catalog metadata. Columns are opened with
+`mmap` and exposed as `memoryview`s (or `numpy.load(..., mmap_mode="r")`), so
+loading a store does no per-row parsing.
+
+Usage:
+- python3 scripts/observation_store.py build [CSV ...]
+- python3 scripts/observation_store.py export STORE_DIR OUT_CSV
+"""
+
+from __future__ import annotations
+
+import ast
+import csv
+import json
+import mmap
+import os
+import shutil
+import sys
+from array import array
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Sequence, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+CATALOG_PATH = ROOT / "data" / "indicator_catalog_v1.csv"
+PROCESSED = ROOT / "data" / "processed"
+DEFAULT_CSVS = [PROCESSED / "world_bank_observations.csv", PROCESSED / "observations_v1.csv"]
+
+STORE_VERSION = 1
+KEY_FIELDS = ("country_id", "year", "indicator_id", "value")
+# column -> (array typecode, npy dtype)
+COLUMNS = {
+    "country": ("H", "<u2"),
+    "year": ("h", "<i2"),
+    "indicator": ("H", "<u2"),
+    "flag": ("B", "|u1"),
+    "value": ("d", "<f8"),
+    "variant": ("H", "<u2"),
+}
+NPY_MAGIC = b"\x93NUMPY\x01\x00"
+NPY_ALIGN = 64
+
+
+def store_path(csv_path: Path) -> Path:
+    return csv_path.with_suffix(".store")
+
+
+def is_derived(quality_flag: str) -> bool:
+    """Whether a row was computed from other series (`derived_*`, also once winsorized)."""
+    return quality_flag.startswith("derived")
+
+
+def value_format(text: str, value: float) -> str:
+    if text == repr(value):
+        return "repr"
+    if text == f"{value:.6f}":
+        return "f6"
+    return "raw"
+
+
+def format_value(value: float, fmt: str) -> str:
+    if fmt == "f6":
+        return f"{value:.6f}"
+    return repr(value)
+
+
+def write_npy(path: Path, values: array, dtype: str, shape: Tuple[int, ...] | None = None) -> None:
+    """Write a flat array as a C-order `.npy` file (1-D unless `shape` is given)."""
+    if sys.byteorder != "little" and values.itemsize > 1:
+        values = array(values.typecode, values)
+        values.byteswap()
+    header = repr({"descr": dtype, "fortran_order": False, "shape": shape or (len(values),)})
+    pad = NPY_ALIGN - (len(NPY_MAGIC) + 2 + len(header) + 1) % NPY_ALIGN
+    header = header + " " * pad + "\n"
+    with path.open("wb") as f:
+        f.write(NPY_MAGIC)
+        f.write(len(header).to_bytes(2, "little"))
+        f.write(header.encode("latin1"))
+        values.tofile(f)
+
+
+def map_npy(path: Path) -> Tuple[mmap.mmap, dict, memoryview]:
+    """Memory-map a `.npy` file; returns (map, header dict, raw data bytes)."""
+    with path.open("rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    header_len = int.from_bytes(mm[8:10], "little")
+    header = ast.literal_eval(mm[10 : 10 + header_len].decode("latin1"))
+    return mm, header, memoryview(mm)[10 + header_len :]
+
+
+def _csv_field(text: str) -> str:
+    """Quote a field the way the default `csv` dialect does."""
+    if any(ch in text for ch in ',"\r\n'):
+        return '"' + text.replace('"', '""') + '"'
+    return text
+
+
+def read_catalog() -> Dict[str, dict]:
+    with CATALOG_PATH.open(newline="", encoding="utf-8") as f:
+        return {row["indicator_id"]: row for row in csv.DictReader(f)}
+
+
+def build_store(rows: Iterable[dict], out_dir: Path, fields: Sequence[str]) -> int:
+    """Encode CSV-shaped row dicts (string values) into a store at `out_dir`."""
+    extra = [k for k in fields if k not in KEY_FIELDS]
+    cols = {name: array(code) for name, (code, _) in COLUMNS.items()}
+    dicts: Dict[str, Dict[str, int]] = {"country": {}, "indicator": {}, "flag": {}}
+    variants: Dict[Tuple[str, ...], int] = {}
+    raw_values: Dict[int, str] = {}
+
+    for i, row in enumerate(rows):
+        text = row["value"]
+        value = float(text)
+        fmt = value_format(text, value)
+        if fmt == "raw":
+            raw_values[i] = text
+        key = tuple(row[k] for k in extra) + (fmt,)
+        cols["country"].append(dicts["country"].setdefault(row["country_id"], len(dicts["country"])))
+        cols["year"].append(int(row["year"]))
+        cols["indicator"].append(dicts["indicator"].setdefault(row["indicator_id"], len(dicts["indicator"])))
+        cols["flag"].append(dicts["flag"].setdefault(row.get("quality_flag", ""), len(dicts["flag"])))
+        cols["value"].append(value)
+        cols["variant"].append(variants.setdefault(key, len(variants)))
+
+    return write_store(out_dir, cols, dicts, list(variants), raw_values, fields)
+
+
+def write_store(
+    out_dir: Path,
+    cols: Dict[str, array],
+    dicts: Dict[str, Sequence[str]],
+    variants: Sequence[Tuple[str, ...]],
+    raw_values: Dict[int, str],
+    fields: Sequence[str],
+) -> int:
+    """Write already-encoded columns; `variants` are tuples of the extra fields plus value format.
+
+    The store is written to a sibling temp directory and swapped into place,
+    so a crash mid-write never leaves a partial store that `open_for` accepts.
+    """
+    extra = [k for k in fields if k not in KEY_FIELDS]
+    tmp_dir = out_dir.with_name(out_dir.name + ".tmp")
+    old_dir = out_dir.with_name(out_dir.name + ".old")
+    for leftover in (tmp_dir, old_dir):
+        if leftover.exists():
+            shutil.rmtree(leftover)
+    tmp_dir.mkdir(parents=True)
+    for name, (_, dtype) in COLUMNS.items():
+        write_npy(tmp_dir / f"{name}.npy", cols[name], dtype)
+
+    catalog = read_catalog()
+    meta = {
+        "version": STORE_VERSION,
+        "row_count": len(cols["value"]),
+        "fields": list(fields),
+        "columns": {name: {"file": f"{name}.npy", "dtype": dtype} for name, (_, dtype) in COLUMNS.items()},
+        "dictionaries": {name: list(d) for name, d in dicts.items()},
+        "variants": [dict(zip([*extra, "value_format"], key)) for key in variants],
+        "raw_values": {str(i): text for i, text in raw_values.items()},
+        "indicators": {ind: catalog[ind] for ind in dicts["indicator"] if ind in catalog},
+    }
+    with (tmp_dir / "meta.json").open("w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    # A directory cannot replace a non-empty one, so move the old store aside
+    # first; in between, readers find no store and fall back to the CSV.
+    if out_dir.exists():
+        os.replace(out_dir, old_dir)
+    os.replace(tmp_dir, out_dir)
+    if old_dir.exists():
+        shutil.rmtree(old_dir)
+    return meta["row_count"]
+
+
+def build_store_from_csv(csv_path: Path, out_dir: Path | None = None) -> Path:
+    out_dir = out_dir or store_path(csv_path)
+    with csv_path.open(newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        build_store(reader, out_dir, reader.fieldnames or [])
+    return out_dir
+
+
+class ObservationStore:
+    """Read-only view of a store; columns are memory-mapped, not parsed."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        with (path / "meta.json").open(encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.row_count: int = self.meta["row_count"]
+        self.fields: List[str] = self.meta["fields"]
+        self.countries: List[str] = self.meta["dictionaries"]["country"]
+        self.indicators: List[str] = self.meta["dictionaries"]["indicator"]
+        self.flags: List[str] = self.meta["dictionaries"]["flag"]
+        self.variants: List[dict] = self.meta["variants"]
+        self.indicator_meta: Dict[str, dict] = self.meta["indicators"]
+        self._maps: List[mmap.mmap] = []
+        self.country = self._column("country")
+        self.year = self._column("year")
+        self.indicator = self._column("indicator")
+        self.flag = self._column("flag")
+        self.value = self._column("value")
+        self.variant = self._column("variant")
+
+    def _column(self, name: str):
+        code, dtype = COLUMNS[name]
+        path = self.path / self.meta["columns"][name]["file"]
+        if not self.row_count:
+            return array(code)
+        mm, header, data = map_npy(path)
+        if header["descr"] != dtype or header["shape"] != (self.row_count,):
+            raise ValueError(f"{path}: unexpected header {header}")
+        if sys.byteorder != "little" and data.itemsize > 1:
+            values = array(code, data.tobytes())
+            values.byteswap()
+            return values
+        self._maps.append(mm)
+        return data.cast(code)
+
+    @classmethod
+    def open(cls, path: Path) -> "ObservationStore":
+        return cls(path)
+
+    def indicator_code(self, indicator_id: str) -> int | None:
+        try:
+            return self.indicators.index(indicator_id)
+        except ValueError:
+            return None
+
+    def value_text(self, i: int) -> str:
+        raw = self.meta["raw_values"].get(str(i))
+        if raw is not None:
+            return raw
+        return format_value(self.value[i], self.variants[self.variant[i]]["value_format"])
+
+    def iter_rows(self) -> Iterator[dict]:
+        """Yield rows as `csv.DictReader` would have produced them."""
+        variant_rows = [{k: v for k, v in var.items() if k != "value_format"} for var in self.variants]
+        countries, indicators, fields = self.countries, self.indicators, self.fields
+        for i in range(self.row_count):
+            row = dict(variant_rows[self.variant[i]])
+            row["country_id"] = countries[self.country[i]]
+            row["year"] = str(self.year[i])
+            row["indicator_id"] = indicators[self.indicator[i]]
+            row["value"] = self.value_text(i)
+            yield {k: row[k] for k in fields}
+
+    def iter_lines(self) -> Iterator[str]:
+        """Yield the CSV lines `csv.DictWriter` would write for `iter_rows()`, header first.
+
+        Each variant's non-key fields are escaped once into a format template, so
+        a row costs one `str.format` call.
+        """
+        slots = {"country_id": "{0}", "year": "{1}", "indicator_id": "{2}"}
+        templates: List[Tuple[str, str]] = []
+        for var in self.variants:
+            static = {k: _csv_field(var[k]).replace("{", "{{").replace("}", "}}") for k in self.fields if k not in KEY_FIELDS}
+            pair = []
+            for spec in ("{3:.6f}" if var["value_format"] == "f6" else "{3!r}", "{3}"):
+                pair.append(",".join(spec if k == "value" else slots.get(k) or static[k] for k in self.fields) + "\r\n")
+            templates.append((pair[0], pair[1]))
+        raw = {int(i): _csv_field(text) for i, text in self.meta["raw_values"].items()}
+        countries, indicators = self.countries, self.indicators
+        yield ",".join(_csv_field(k) for k in self.fields) + "\r\n"
+        for i, (c, y, ind, v, var) in enumerate(zip(self.country, self.year, self.indicator, self.value, self.variant)):
+            if i in raw:
+                yield templates[var][1].format(countries[c], y, indicators[ind], raw[i])
+            else:
+                yield templates[var][0].format(countries[c], y, indicators[ind], v)
+
+    def to_csv(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        lines = self.iter_lines()
+        with path.open("w", newline="", encoding="utf-8") as f:
+            while chunk := list(islice(lines, 8192)):
+                f.write("".join(chunk))
+
+    def close(self) -> None:
+        for name in COLUMNS:
+            col = getattr(self, name, None)
+            if isinstance(col, memoryview):
+                col.release()
+        for mm in self._maps:
+            mm.close()
+        self._maps = []
+
+
+def open_for(csv_path: Path) -> ObservationStore | None:
+    """Open the store built from `csv_path` if it exists and is not stale."""
+    store = store_path(csv_path)
+    meta = store / "meta.json"
+    if not meta.exists():
+        return None
+    if csv_path.exists() and csv_path.stat().st_mtime > meta.stat().st_mtime:
+        return None
+    return ObservationStore.open(store)
+
+
+def open_or_build(csv_path: Path) -> ObservationStore:
+    """`open_for(csv_path)`, building the store from the CSV first when it is missing or stale."""
+    store = open_for(csv_path)
+    if store is None:
+        store = ObservationStore.open(build_store_from_csv(csv_path))
+    return store
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    args = list(sys.argv[1:] if argv is None else argv)
+    if not args or args[0] not in {"build", "export"}:
+        print(__doc__.split("Usage:")[1].strip(), file=sys.stderr)
+        return 1
+    if args[0] == "build":
+        for csv_path in [Path(p) for p in args[1:]] or DEFAULT_CSVS:
+            if not csv_path.exists():
+                print(f"skip missing {csv_path}", file=sys.stderr)
+                continue
+            out = build_store_from_csv(csv_path)
+            print(f"wrote {out}")
+        return 0
+    if len(args) != 3:
+        print("usage: observation_store.py export STORE_DIR OUT_CSV", file=sys.stderr)
+        return 1
+    store = ObservationStore.open(Path(args[1]))
+    store.to_csv(Path(args[2]))
+    store.close()
+    print(f"wrote {args[2]}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""Run the data pipeline, re-executing only the stages that are out of date.
+
+Each stage is one script with declared input and output files. A stage
+depends on every stage that produces one of its inputs, and its own script
+plus the local modules it imports count as inputs too, so editing
+`build_baseline.TRANSFORMS` marks the baseline stale (and the matrix and
+elasticities, which score with it) while the other stages stay cached. Stages
+that only need the shared paths, window and state map import them from
+`baseline_spec.py`.
+
+A stage is up to date when its arguments, the content hash of every input
+and the hash of every output match what was recorded after its last
+successful run. Hashes are cached by (size, mtime), so checking an unchanged
+tree reads no file contents. Stages whose dependencies are done run in
+parallel, each in its own process, and the record is saved after every stage
+so an interrupted run resumes where it stopped. Dependents of a failed stage
+are not run.
+
+Inputs:
+- the stage scripts and their declared inputs (see `build_stages`)
+
+Outputs:
+- whatever the stages write
+- data/processed/pipeline_state.json (fingerprints of the last successful runs)
+
+Usage:
+- python3 scripts/pipeline.py                      # bring everything up to date
+- python3 scripts/pipeline.py baseline coverage    # these stages and stale upstream stages
+- python3 scripts/pipeline.py --dry-run            # show what would run and why
+- python3 scripts/pipeline.py --force fetch        # re-run fetch (and whatever changes downstream)
+- python3 scripts/pipeline.py --touch fetch enrich # record existing outputs as up to date
+"""
+
+from __future__ import annotations
+
+import argparse
+import ast
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Sequence, Set, Tuple
+
+import build_baseline
+import build_baseline_matrix
+import build_runtime_bundle
+import data_coverage_report
+import enrich_observations
+import estimate_elasticities
+import fetch_world_bank
+import lag_candidates
+import observation_store
+import quality_gates
+import raw_archive
+
+ROOT = Path(__file__).resolve().parents[1]
+SCRIPTS = ROOT / "scripts"
+STATE_PATH = ROOT / "data" / "processed" / "pipeline_state.json"
+STATE_VERSION = 1
+HASH_CHUNK = 1 << 20
+
+
+@dataclass(frozen=True)
+class Stage:
+    name: str
+    script: str
+    inputs: Tuple[Path, ...]
+    outputs: Tuple[Path, ...]
+    args: Tuple[str, ...] = ()
+
+
+def build_stages(fetch_args: Sequence[str] = ()) -> List[Stage]:
+    """The README pipeline as a DAG, in a valid run order."""
+    wb_obs, obs, gated = fetch_world_bank.OBS_PATH, enrich_observations.OUT_PATH, quality_gates.OUT_PATH
+    return [
+        Stage(
+            "fetch",
+            "fetch_world_bank.py",
+            (fetch_world_bank.CATALOG_PATH, fetch_world_bank.PEERS_PATH),
+            (fetch_world_bank.RAW_PATH, raw_archive.index_path(fetch_world_bank.RAW_PATH), wb_obs, observation_store.store_path(wb_obs), fetch_world_bank.REPORT_PATH),
+            tuple(fetch_args),
+        ),
+        Stage(
+            "enrich",
+            "enrich_observations.py",
+            (wb_obs, enrich_observations.PEERS_PATH),
+            (obs, observation_store.store_path(obs), enrich_observations.REPORT_PATH),
+        ),
+        Stage("gates", "quality_gates.py", (obs,), (gated, observation_store.store_path(gated), quality_gates.REPORT_PATH)),
+        Stage("baseline", "build_baseline.py", (gated,), (build_baseline.OUT_BASELINE,)),
+        Stage("elasticities", "estimate_elasticities.py", (gated,), (estimate_elasticities.OUT_PATH,)),
+        Stage("lags", "lag_candidates.py", (gated,), (lag_candidates.OUT_PATH, lag_candidates.REPORT_PATH)),
+        Stage("matrix", "build_baseline_matrix.py", (gated,), (build_baseline_matrix.OUT_MATRIX, build_baseline_matrix.OUT_INDEX)),
+        Stage("coverage", "data_coverage_report.py", (data_coverage_report.CATALOG, obs), (data_coverage_report.OUT, data_coverage_report.INDEX)),
+        Stage(
+            "bundle",
+            "build_runtime_bundle.py",
+            (build_runtime_bundle.BASELINE_PATH, *build_runtime_bundle.DECK_PATHS.values()),
+            (build_runtime_bundle.OUT_DIR,),
+        ),
+    ]
+
+
+def local_imports(script: Path, seen: Set[Path] | None = None) -> Set[Path]:
+    """`script` plus every module under scripts/ it imports, transitively."""
+    seen = set() if seen is None else seen
+    if script in seen:
+        return seen
+    seen.add(script)
+    for node in ast.walk(ast.parse(script.read_text(encoding="utf-8"))):
+        if isinstance(node, ast.Import):
+            names = [a.name for a in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            names = [node.module]
+        else:
+            continue
+        for name in names:
+            module = SCRIPTS / f"{name.split('.')[0]}.py"
+            if module.exists():
+                local_imports(module, seen)
+    return seen
+
+
+def dependencies(stages: Sequence[Stage]) -> Dict[str, Set[str]]:
+    """Stage name -> names of the stages producing one of its inputs."""
+    deps: Dict[str, Set[str]] = {s.name: set() for s in stages}
+    for consumer in stages:
+        for producer in stages:
+            if producer is not consumer and any(i == o or o in i.parents for i in consumer.inputs for o in producer.outputs):
+                deps[consumer.name].add(producer.name)
+    return deps
+
+
+def rel(path: Path) -> str:
+    return path.relative_to(ROOT).as_posix()
+
+
+class Fingerprints:
+    """Content hashes of files and directories, cached by (size, mtime_ns)."""
+
+    def __init__(self, cache: Dict[str, list]) -> None:
+        self.cache = cache
+
+    def _file(self, path: Path) -> str:
+        st = path.stat()
+        key = rel(path)
+        hit = self.cache.get(key)
+        if hit and hit[0] == st.st_size and hit[1] == st.st_mtime_ns:
+            return hit[2]
+        h = hashlib.sha256()
+        with path.open("rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        self.cache[key] = [st.st_size, st.st_mtime_ns, digest]
+        return digest
+
+    def __call__(self, path: Path) -> str | None:
+        if path.is_dir():
+            h = hashlib.sha256()
+            for p in sorted(q for q in path.rglob("*") if q.is_file()):
+                h.update(f"{p.relative_to(path).as_posix()}\0{self._file(p)}\n".encode())
+            return h.hexdigest()
+        if path.is_file():
+            return self._file(path)
+        return None
+
+
+def stage_inputs(stage: Stage) -> List[Path]:
+    return sorted(set(stage.inputs) | local_imports(SCRIPTS / stage.script))
+
+
+def stale_reason(stage: Stage, record: dict | None, fp: Fingerprints) -> str | None:
+    """Why `stage` must run, or None when its record still matches the files."""
+    if record is None:
+        return "no previous run"
+    if record.get("args") != list(stage.args):
+        return "arguments changed"
+    recorded = record.get("inputs", {})
+    for path in stage_inputs(stage):
+        if recorded.get(rel(path)) != fp(path):
+            return f"{rel(path)} changed"
+    for path in stage.outputs:
+        digest = fp(path)
+        if digest is None:
+            return f"{rel(path)} missing"
+        if record.get("outputs", {}).get(rel(path)) != digest:
+            return f"{rel(path)} modified"
+    return None
+
+
+def load_state(path: Path = STATE_PATH) -> dict:
+    if path.exists():
+        with path.open(encoding="utf-8") as f:
+            state = json.load(f)
+        if state.get("version") == STATE_VERSION:
+            return state
+    return {"version": STATE_VERSION, "stages": {}, "files": {}}
+
+
+def save_state(state: dict, path: Path = STATE_PATH) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, path)
+
+
+def record_for(stage: Stage, inputs: Dict[str, str | None], fp: Fingerprints, seconds: float) -> dict:
+    return {
+        "args": list(stage.args),
+        "inputs": inputs,
+        "outputs": {rel(p): fp(p) for p in stage.outputs},
+        "seconds": round(seconds, 3),
+        "finished_at": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def run_stage(stage: Stage) -> Tuple[int, float, str]:
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, str(SCRIPTS / stage.script), *stage.args],
+        cwd=ROOT,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+    )
+    return proc.returncode, time.perf_counter() - started, proc.stdout
+
+
+def select(stages: Sequence[Stage], deps: Dict[str, Set[str]], targets: Sequence[str]) -> List[Stage]:
+    """Targets plus everything upstream of them, in stage order."""
+    wanted: Set[str] = set()
+    todo = list(targets)
+    while todo:
+        name = todo.pop()
+        if name not in wanted:
+            wanted.add(name)
+            todo.extend(deps[name])
+    return [s for s in stages if s.name in wanted]
+
+
+def run_pipeline(stages: Sequence[Stage], state: dict, jobs: int, force: Set[str], verbose: bool = False) -> Dict[str, str]:
+    """Run stale stages as their dependencies finish; returns name -> ran/skipped/failed/blocked."""
+    deps = dependencies(stages)
+    fp = Fingerprints(state["files"])
+    status: Dict[str, str] = {}
+    running: Dict[Future, Tuple[Stage, Dict[str, str | None]]] = {}
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        while len(status) < len(stages):
+            for stage in stages:
+                if stage.name in status or any(s is stage for s, _ in running.values()):
+                    continue
+                upstream = [status.get(d) for d in deps[stage.name]]
+                if any(u in ("failed", "blocked") for u in upstream):
+                    status[stage.name] = "blocked"
+                    print(f"blocked {stage.name}: an upstream stage failed")
+                    continue
+                if any(u is None for u in upstream):
+                    continue
+                reason = "forced" if stage.name in force else stale_reason(stage, state["stages"].get(stage.name), fp)
+                if reason is None:
+                    status[stage.name] = "skipped"
+                    print(f"skip {stage.name} (up to date)")
+                    continue
+                print(f"run {stage.name}: {reason}")
+                inputs = {rel(p): fp(p) for p in stage_inputs(stage)}
+                running[pool.submit(run_stage, stage)] = (stage, inputs)
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, inputs = running.pop(future)
+                code, seconds, output = future.result()
+                if verbose or code != 0:
+                    print(output.rstrip())
+                if code == 0:
+                    status[stage.name] = "ran"
+                    state["stages"][stage.name] = record_for(stage, inputs, fp, seconds)
+                    save_state(state)
+                    print(f"done {stage.name} in {seconds:.2f}s")
+                else:
+                    status[stage.name] = "failed"
+                    state["stages"].pop(stage.name, None)
+                    save_state(state)
+                    print(f"FAILED {stage.name} (exit {code}) after {seconds:.2f}s", file=sys.stderr)
+    return status
+
+
+def parse_args(argv: Sequence[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("targets", nargs="*", help="stages to bring up to date (default: all)")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="max stages running at once")
+    parser.add_argument("--force", nargs="+", default=[], metavar="STAGE", help="run these stages even if up to date")
+    parser.add_argument("--touch", action="store_true", help="record the targets' current files as up to date without running them")
+    parser.add_argument("--dry-run", action="store_true", help="print what would run and why")
+    parser.add_argument("--fetch-args", default="", help="extra arguments for fetch_world_bank.py, e.g. '2000 2025 --workers 8'")
+    parser.add_argument("--verbose", action="store_true", help="echo each stage's output")
+    return parser.parse_args(argv)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    stages = build_stages(args.fetch_args.split())
+    names = [s.name for s in stages]
+    unknown = sorted({n for n in [*args.targets, *args.force] if n not in names})
+    if unknown:
+        print(f"unknown stage(s) {unknown}; stages are {names}", file=sys.stderr)
+        return 1
+    state = load_state()
+    fp = Fingerprints(state["files"])
+
+    if args.touch:
+        for stage in [s for s in stages if s.name in (args.targets or names)]:
+            missing = [rel(p) for p in stage.outputs if fp(p) is None]
+            if missing:
+                print(f"cannot touch {stage.name}: missing {missing}", file=sys.stderr)
+                return 1
+            state["stages"][stage.name] = record_for(stage, {rel(p): fp(p) for p in stage_inputs(stage)}, fp, 0.0)
+            print(f"touched {stage.name}")
+        save_state(state)
+        return 0
+
+    selected = select(stages, dependencies(stages), args.targets) if args.targets else stages
+    if args.dry_run:
+        deps = dependencies(selected)
+        maybe: Set[str] = set()
+        for stage in selected:
+            reason = "forced" if stage.name in args.force else stale_reason(stage, state["stages"].get(stage.name), fp)
+            if reason:
+                maybe.add(stage.name)
+                print(f"would run {stage.name}: {reason}")
+            elif deps[stage.name] & maybe:
+                print(f"may run {stage.name}: after {', '.join(sorted(deps[stage.name] & maybe))}")
+                maybe.add(stage.name)
+            else:
+                print(f"up to date {stage.name}")
+        save_state(state)
+        return 0
+
+    started = time.perf_counter()
+    status = run_pipeline(selected, state, args.jobs, set(args.force), args.verbose)
+    counts = {k: sum(1 for v in status.values() if v == k) for k in ("ran", "skipped", "failed", "blocked")}
+    print(f"pipeline finished in {time.perf_counter() - started:.2f}s: " + ", ".join(f"{v} {k}" for k, v in counts.items() if v))
+    return 1 if counts["failed"] or counts["blocked"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
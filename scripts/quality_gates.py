@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""Evaluate the spec section 3.2 quality gates and write a cleaned observation set.
+
+Runs between enrichment and `build_baseline.py`, reading the columnar store
+of `observations_v1.csv` in one pass over its memory-mapped columns:
+
+- completeness: each core indicator (any in `baseline_spec.STATE_MAP`) has a
+  value in >= 90% of country x year cells in the baseline window
+- freshness: macro indicators (macro, fiscal and external domains) were
+  updated upstream within 18 months of `--as-of`, going by the API's
+  `lastupdated` in the fetch response cache, else by the end of the latest
+  observed year (`updated_at` is our own fetch time, so it is not used)
+- coherence: identity checks across indicators, e.g. the COFOG budget
+  shares of a country-year must not sum past 100 (+ tolerance)
+- stability: robust z-scores within each (indicator, country) series,
+  `(x - median) / (1.4826 * MAD)`, so cross-country level differences are
+  not outliers. The series MAD is floored at the indicator's MAD across
+  all peers, so smooth trends and near-constant series are not clipped
+  for tiny deviations; cells past the limit are winsorized in place to the limit
+  and their `quality_flag` gains a `+winsorized` suffix (e.g.
+  `derived_proxy+winsorized`), keeping the provenance
+
+The cleaned set is the input with winsorized values replaced. It is written
+straight from the patched columns as a store, plus its CSV export. Later
+stages read it in place of `observations_v1.csv` when present.
+
+Inputs:
+- data/processed/observations_v1.csv (its .store/ is built when missing or stale)
+- data/raw/world_bank/cache/index.json (upstream `lastupdated` per series, when present)
+
+Outputs:
+- data/processed/quality_gate_report.json
+- data/processed/observations_gated_v1.csv (+ .store/ columnar copy)
+
+Usage:
+- python3 scripts/quality_gates.py
+- python3 scripts/quality_gates.py --as-of 2026-03-01 --strict
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import sys
+from array import array
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+import metrics
+import observation_store
+from baseline_spec import BASELINE_WINDOW, GATED_OBS_PATH, STATE_MAP
+
+ROOT = Path(__file__).resolve().parents[1]
+IN_PATH = ROOT / "data" / "processed" / "observations_v1.csv"
+OUT_PATH = GATED_OBS_PATH
+REPORT_PATH = ROOT / "data" / "processed" / "quality_gate_report.json"
+CACHE_INDEX_PATH = ROOT / "data" / "raw" / "world_bank" / "cache" / "index.json"  # fetch_world_bank.ResponseCache
+
+CORE_INDICATORS = tuple(dict.fromkeys(ind for chain in STATE_MAP.values() for ind in chain))
+COMPLETENESS_MIN = 0.90
+MACRO_DOMAINS = ("macro", "fiscal", "external")
+FRESHNESS_MONTHS = 18
+# name -> (indicators, target sum, tolerance, partial). A partial set covers only
+# some of the parts, so its sum is checked against the target from above only.
+COHERENCE_RULES = {
+    "budget_shares": (("COFOG_HEALTH_SHARE", "COFOG_EDU_SHARE", "COFOG_DEF_SHARE", "COFOG_SOCIAL_SHARE"), 100.0, 5.0, True),
+}
+ROBUST_Z_LIMIT = 3.5
+MAD_SCALE = 1.4826  # MAD -> standard deviation under normality
+MIN_SERIES_ROWS = 8  # shorter series are not tested
+WINSORIZED_SUFFIX = "+winsorized"
+
+
+def group_rows(store: observation_store.ObservationStore) -> List[List[int]]:
+    """Row indices per indicator code."""
+    groups: List[List[int]] = [[] for _ in store.indicators]
+    for i, ind in enumerate(store.indicator):
+        groups[ind].append(i)
+    return groups
+
+
+def completeness_gate(store: observation_store.ObservationStore, groups: List[List[int]], window: Tuple[int, int]) -> dict:
+    lo, hi = window
+    span = hi - lo + 1
+    n_countries = len(store.countries)
+    codes = {name: i for i, name in enumerate(store.indicators)}
+    results = {}
+    for name in CORE_INDICATORS:
+        cells = bytearray(n_countries * span)
+        if name in codes:
+            year, country = store.year, store.country
+            for i in groups[codes[name]]:
+                y = year[i]
+                if lo <= y <= hi:
+                    cells[country[i] * span + y - lo] = 1
+        present = cells.count(1)
+        share = present / len(cells) if cells else 0.0
+        below = [c for k, c in enumerate(store.countries) if cells[k * span : (k + 1) * span].count(1) < COMPLETENESS_MIN * span]
+        results[name] = {"present": present, "cells": len(cells), "share": round(share, 4), "passed": share >= COMPLETENESS_MIN, "countries_below": below}
+    return {"threshold": COMPLETENESS_MIN, "window": list(window), "indicators": results, "passed": all(r["passed"] for r in results.values())}
+
+
+def months_between(earlier: datetime, later: datetime) -> float:
+    return (later - earlier).days / (365.25 / 12)
+
+
+def upstream_updates(cache_index: Path) -> Dict[str, str]:
+    """Source code -> latest upstream `lastupdated` recorded by the fetch response cache."""
+    if not cache_index.exists():
+        return {}
+    with cache_index.open(encoding="utf-8") as f:
+        entries = json.load(f)
+    out: Dict[str, str] = {}
+    for entry in entries.values():
+        stamp = entry.get("lastupdated") or ""
+        if stamp > out.get(entry["indicator"], ""):
+            out[entry["indicator"]] = stamp
+    return out
+
+
+def freshness_gate(store: observation_store.ObservationStore, groups: List[List[int]], as_of: datetime, upstream: Dict[str, str]) -> dict:
+    codes: Dict[int, set] = {}
+    for ind, var in set(zip(store.indicator, store.variant)):
+        codes.setdefault(ind, set()).add(store.variants[var].get("source_code", ""))
+    results = {}
+    for code, name in enumerate(store.indicators):
+        domain = store.indicator_meta.get(name, {}).get("domain")
+        if domain not in MACRO_DOMAINS:
+            continue
+        latest_year = max((store.year[i] for i in groups[code]), default=None)
+        stamp = max((upstream.get(c, "") for c in codes.get(code, ())), default="")
+        if stamp:
+            basis, since = "lastupdated", datetime.fromisoformat(stamp)
+        elif latest_year is not None:
+            basis, since = "latest_year", datetime(latest_year, 12, 31)
+        else:
+            results[name] = {"basis": None, "lastupdated": None, "latest_year": None, "age_months": None, "passed": False}
+            continue
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        age = months_between(since, as_of)
+        results[name] = {"basis": basis, "lastupdated": stamp or None, "latest_year": latest_year, "age_months": round(age, 1), "passed": age <= FRESHNESS_MONTHS}
+    return {"max_age_months": FRESHNESS_MONTHS, "as_of": as_of.isoformat(), "indicators": results, "passed": all(r["passed"] for r in results.values())}
+
+
+def coherence_gate(store: observation_store.ObservationStore, groups: List[List[int]]) -> dict:
+    codes = {name: i for i, name in enumerate(store.indicators)}
+    rules = {}
+    for rule, (members, target, tolerance, partial) in COHERENCE_RULES.items():
+        sums: Dict[Tuple[int, int], float] = {}
+        counts: Dict[Tuple[int, int], int] = {}
+        for name in members:
+            for i in groups[codes[name]] if name in codes else ():
+                key = (store.country[i], store.year[i])
+                sums[key] = sums.get(key, 0.0) + store.value[i]
+                counts[key] = counts.get(key, 0) + 1
+        violations = []
+        for (c, y), total in sorted(sums.items()):
+            complete = counts[(c, y)] == len(members)
+            bad = total > target + tolerance if partial else complete and abs(total - target) > tolerance
+            if bad:
+                violations.append({"country_id": store.countries[c], "year": y, "sum": round(total, 4), "parts": counts[(c, y)]})
+        rules[rule] = {"indicators": list(members), "target": target, "tolerance": tolerance, "partial": partial, "checked": len(sums), "violations": violations, "passed": not violations}
+    return {"rules": rules, "passed": all(r["passed"] for r in rules.values())}
+
+
+def winsorized_flag(flag: str) -> str:
+    return flag + WINSORIZED_SUFFIX if flag else WINSORIZED_SUFFIX[1:]
+
+
+def stability_gate(store: observation_store.ObservationStore, groups: List[List[int]], values: array) -> Tuple[dict, Dict[int, float]]:
+    """Robust z per (indicator, country) series; returns the report and `{row: winsorized value}`."""
+    clipped: Dict[int, float] = {}
+    results = {}
+    for code, rows in enumerate(groups):
+        if not rows:
+            continue
+        pooled = [values[i] for i in rows]
+        pooled_med = statistics.median(pooled)
+        floor = statistics.median([abs(v - pooled_med) for v in pooled])
+        by_country: Dict[int, List[int]] = {}
+        for i in rows:
+            by_country.setdefault(store.country[i], []).append(i)
+        tested = 0
+        hit_series = {}
+        for country, series in sorted(by_country.items()):
+            if len(series) < MIN_SERIES_ROWS:
+                continue
+            tested += 1
+            vals = [values[i] for i in series]
+            med = statistics.median(vals)
+            mad = max(statistics.median([abs(v - med) for v in vals]), floor)
+            if mad == 0:
+                continue
+            bound = ROBUST_Z_LIMIT * MAD_SCALE * mad
+            lo, hi = med - bound, med + bound
+            hits = [(i, v) for i, v in zip(series, vals) if v < lo or v > hi]
+            for i, v in hits:
+                clipped[i] = lo if v < lo else hi
+            if hits:
+                hit_series[store.countries[country]] = {"median": round(med, 6), "mad": round(mad, 6), "bounds": [round(lo, 6), round(hi, 6)], "winsorized": len(hits)}
+        results[store.indicators[code]] = {"mad_floor": round(floor, 6), "series": tested, "winsorized": sum(h["winsorized"] for h in hit_series.values()), "countries": hit_series}
+    cells = [
+        {"country_id": store.countries[store.country[i]], "year": store.year[i], "indicator_id": store.indicators[store.indicator[i]], "value": values[i], "winsorized": round(v, 6)}
+        for i, v in sorted(clipped.items())
+    ]
+    report = {"z_limit": ROBUST_Z_LIMIT, "min_series_rows": MIN_SERIES_ROWS, "indicators": results, "winsorized_cells": cells, "passed": True}
+    return report, clipped
+
+
+def write_cleaned(store: observation_store.ObservationStore, values: array, clipped: Dict[int, float], out_path: Path) -> Path:
+    """Write the store with winsorized values and flags patched in, then its CSV."""
+    cols = {}
+    for name, (code, _) in observation_store.COLUMNS.items():
+        col = array(code)
+        col.frombytes(getattr(store, name).tobytes())
+        cols[name] = col
+    flags = list(store.flags)
+    extra = [k for k in store.fields if k not in observation_store.KEY_FIELDS]
+    variants = [tuple(var[k] for k in [*extra, "value_format"]) for var in store.variants]
+    raw_values = {int(i): text for i, text in store.meta["raw_values"].items()}
+    flag_codes = {name: code for code, name in enumerate(flags)}
+    flagged: Dict[int, int] = {}
+    for i, v in clipped.items():
+        var = cols["variant"][i]
+        if var not in flagged:
+            key = dict(store.variants[var], value_format="f6")
+            if "quality_flag" in key:
+                key["quality_flag"] = winsorized_flag(key["quality_flag"])
+            flagged[var] = len(variants)
+            variants.append(tuple(key[k] for k in [*extra, "value_format"]))
+        flag = winsorized_flag(flags[cols["flag"][i]])
+        if flag not in flag_codes:
+            flag_codes[flag] = len(flags)
+            flags.append(flag)
+        values[i] = float(f"{v:.6f}")
+        cols["variant"][i] = flagged[var]
+        cols["flag"][i] = flag_codes[flag]
+        raw_values.pop(i, None)
+    cols["value"] = values
+    dicts = {"country": store.countries, "indicator": store.indicators, "flag": flags}
+    out_dir = observation_store.store_path(out_path)
+    observation_store.write_store(out_dir, cols, dicts, variants, raw_values, store.fields)
+    cleaned = observation_store.ObservationStore.open(out_dir)
+    try:
+        cleaned.to_csv(out_path)
+    finally:
+        cleaned.close()
+    (out_dir / "meta.json").touch()  # keep the store fresher than its CSV
+    return out_dir
+
+
+def evaluate(store: observation_store.ObservationStore, as_of: datetime, window: Tuple[int, int] = BASELINE_WINDOW, upstream: Dict[str, str] | None = None) -> Tuple[dict, array, Dict[int, float]]:
+    values = array("d")
+    values.frombytes(store.value.tobytes())
+    groups = group_rows(store)
+    stability, clipped = stability_gate(store, groups, values)
+    gates = {
+        "completeness": completeness_gate(store, groups, window),
+        "freshness": freshness_gate(store, groups, as_of, upstream or {}),
+        "coherence": coherence_gate(store, groups),
+        "stability": stability,
+    }
+    return gates, values, clipped
+
+
+def parse_args(argv: Sequence[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--in", dest="in_path", type=Path, default=IN_PATH)
+    parser.add_argument("--out", type=Path, default=OUT_PATH)
+    parser.add_argument("--report", type=Path, default=REPORT_PATH)
+    parser.add_argument("--cache-index", type=Path, default=CACHE_INDEX_PATH, help="fetch response cache index with upstream `lastupdated`")
+    parser.add_argument("--as-of", type=datetime.fromisoformat, help="reference date for the freshness gate (default: now)")
+    parser.add_argument("--strict", action="store_true", help="exit 3 when any gate fails")
+    metrics.add_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    if not args.in_path.exists() and not observation_store.store_path(args.in_path).exists():
+        raise SystemExit(f"Missing {args.in_path}. Run scripts/enrich_observations.py first.")
+    as_of = args.as_of or datetime.now(timezone.utc)
+    if as_of.tzinfo is None:
+        as_of = as_of.replace(tzinfo=timezone.utc)
+
+    recorder = metrics.from_args("quality_gates", args)
+    store = observation_store.open_or_build(args.in_path)
+    try:
+        with recorder.stage("evaluate") as st:
+            gates, values, clipped = evaluate(store, as_of, upstream=upstream_updates(args.cache_index))
+            st.rows_in = rows = store.row_count
+            st.add("winsorized", len(clipped))
+        with recorder.stage("write") as st:
+            write_cleaned(store, values, clipped, args.out)
+            st.rows_out = rows
+    finally:
+        store.close()
+
+    report = {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "input_path": str(args.in_path),
+        "output_path": str(args.out),
+        "rows": rows,
+        "passed": all(g["passed"] for g in gates.values()),
+        "summary": {name: g["passed"] for name, g in gates.items()},
+        "gates": gates,
+        "timing": recorder.summary(),
+    }
+    args.report.parent.mkdir(parents=True, exist_ok=True)
+    with args.report.open("w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    recorder.close()
+
+    for name, g in gates.items():
+        print(f"{name:12s} {'pass' if g['passed'] else 'FAIL'}")
+    stages = report["timing"]["stages"]
+    print(f"winsorized {len(clipped)} of {rows} cells; evaluated in {stages['evaluate']['seconds']:.3f}s, wrote {args.out} in {stages['write']['seconds']:.3f}s")
+    return 3 if args.strict and not report["passed"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
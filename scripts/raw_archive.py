@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""Append-only archive of raw World Bank API pages with an offset index.
+
+The data file holds one record per (indicator, page): a one-line JSON header
+(`code`, `page`, `pages`, the number of pages `changed` by that append,
+`length` and the series' `fetched_at`/year range)
+followed by the page body exactly as the API returned it and a newline.
+Records are never rewritten. Re-fetching a series appends only the pages whose
+content changed and repoints the index, and unchanged pages keep their
+offsets.
+
+The sidecar `<name>.index.json` maps each source code to its current pages'
+offsets, lengths and checksums, plus the committed data length. Readers
+memory-map the data file and decode only the pages of the series they ask
+for. A tail past the committed length (an interrupted append) is truncated
+on the next write. A missing or inconsistent index is rebuilt by replaying
+the headers, one append at a time. `compact` drops superseded records.
+
+Usage:
+- python3 scripts/raw_archive.py list [ARCHIVE]
+- python3 scripts/raw_archive.py rows CODE [ARCHIVE]
+- python3 scripts/raw_archive.py compact [ARCHIVE]
+- python3 scripts/raw_archive.py rebuild [ARCHIVE]
+- python3 scripts/raw_archive.py import-jsonl JSONL FETCHED_AT [ARCHIVE]
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import mmap
+import os
+import sys
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Sequence, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+ARCHIVE_PATH = ROOT / "data" / "raw" / "world_bank" / "world_bank_archive.dat"
+
+INDEX_VERSION = 1
+
+
+def index_path(path: Path) -> Path:
+    return path.with_name(path.stem + ".index.json")
+
+
+class RawArchive:
+    def __init__(self, path: Path = ARCHIVE_PATH) -> None:
+        self.path = path
+        self.index_path = index_path(path)
+        self.series: Dict[str, dict] = {}
+        self.data_bytes = 0
+        self.stats: Dict[str, int] = {"appended": 0, "reused": 0, "bytes_appended": 0}
+        self._map: mmap.mmap | None = None
+        self._out = None
+        size = path.stat().st_size if path.exists() else 0
+        if self.index_path.exists():
+            with self.index_path.open(encoding="utf-8") as f:
+                index = json.load(f)
+            if index.get("version") == INDEX_VERSION and index["data_bytes"] <= size:
+                self.series = index["series"]
+                self.data_bytes = index["data_bytes"]
+                return
+        if size:
+            self.rebuild()
+
+    # -- reading -----------------------------------------------------------
+
+    def codes(self) -> List[str]:
+        return list(self.series)
+
+    def __contains__(self, code: str) -> bool:
+        return code in self.series
+
+    def _view(self) -> mmap.mmap:
+        if self._map is None or len(self._map) < self.data_bytes:
+            if self._map is not None:
+                self._map.close()
+            with self.path.open("rb") as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._map
+
+    def pages(self, code: str) -> List[bytes]:
+        """Raw page bodies of one series, page 1 first; raises KeyError if absent."""
+        entry = self.series[code]
+        if self._out is not None:
+            self._out.flush()
+        view = self._view()
+        return [view[p["offset"] : p["offset"] + p["length"]] for p in entry["pages"]]
+
+    def rows(self, code: str) -> List[dict]:
+        rows: List[dict] = []
+        for page in self.pages(code):
+            payload = json.loads(page)
+            if isinstance(payload, list) and len(payload) >= 2 and payload[1]:
+                rows.extend(payload[1])
+        return rows
+
+    def _records(self) -> Iterator[Tuple[dict, int]]:
+        """Yield `(header, body_offset)` for every complete record in the data file."""
+        if not self.path.exists() or not self.path.stat().st_size:
+            return
+        with self.path.open("rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            end = len(view)
+            pos = 0
+            while pos < end:
+                eol = view.find(b"\n", pos, end)
+                if eol < 0:
+                    break
+                try:
+                    header = json.loads(view[pos:eol])
+                except ValueError:
+                    break
+                body = eol + 1
+                if body + header["length"] + 1 > end:
+                    break  # torn tail
+                yield header, body
+                pos = body + header["length"] + 1
+
+    # -- writing -----------------------------------------------------------
+
+    def _writer(self):
+        if self._out is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._out = self.path.open("ab")
+            if self._out.tell() != self.data_bytes:
+                self._out.truncate(self.data_bytes)  # drop an uncommitted tail
+                self._out.seek(self.data_bytes)
+        return self._out
+
+    def append_series(self, code: str, pages: Sequence[bytes], fetched_at: str, start_year: int, end_year: int) -> dict:
+        """Make `pages` the current content of `code`, appending only changed pages."""
+        old = self.series.get(code, {}).get("pages", [])
+        meta = {"fetched_at": fetched_at, "start_year": start_year, "end_year": end_year}
+        out = self._writer()
+        digests = [hashlib.sha256(body).hexdigest() for body in pages]
+        changed = sum(1 for i, digest in enumerate(digests) if i >= len(old) or old[i]["sha256"] != digest)
+        refs = []
+        for i, (body, digest) in enumerate(zip(pages, digests)):
+            if i < len(old) and old[i]["sha256"] == digest:
+                refs.append(old[i])
+                self.stats["reused"] += 1
+                continue
+            header = json.dumps({"code": code, "page": i + 1, "pages": len(pages), "changed": changed, "length": len(body), **meta}, separators=(",", ":"))
+            out.write(header.encode("utf-8") + b"\n")
+            refs.append({"offset": out.tell(), "length": len(body), "sha256": digest})
+            out.write(body)
+            out.write(b"\n")
+            self.stats["appended"] += 1
+            self.stats["bytes_appended"] += len(body)
+        self.data_bytes = out.tell()
+        entry = self.series[code] = {**meta, "pages": refs}
+        return entry
+
+    def commit(self, sync: bool = False) -> None:
+        """Flush appended records, then atomically publish the index."""
+        if self._out is not None:
+            self._out.flush()
+            if sync:
+                os.fsync(self._out.fileno())
+        self._write_index()
+
+    def _write_index(self) -> None:
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.index_path.with_suffix(".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump({"version": INDEX_VERSION, "data_bytes": self.data_bytes, "series": self.series}, f, separators=(",", ":"))
+        tmp.replace(self.index_path)
+
+    def close(self) -> None:
+        if self._out is not None:
+            self._out.close()
+            self._out = None
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    def rebuild(self) -> None:
+        """Recover the index by replaying the record headers in file order.
+
+        `append_series` writes the changed pages of one series back to back
+        under one header meta and reuses the previous pages at the other
+        positions. Each such run is replayed the same way, so a series' page
+        count and `fetched_at` come from the run its pages were indexed by. A
+        run with fewer pages than its header's `changed` count, or needing
+        pages that were neither written nor there before, was interrupted and
+        is skipped, keeping the previous state.
+        """
+        series: Dict[str, dict] = {}
+        end = 0
+        run: dict | None = None
+
+        def apply(run: dict) -> None:
+            if run["changed"] is not None and len(run["written"]) != run["changed"]:
+                return  # interrupted before all changed pages were written
+            old = series.get(run["code"], {}).get("pages", [])
+            refs = [run["written"].get(p) or (old[p - 1] if p <= len(old) else None) for p in range(1, run["count"] + 1)]
+            if None not in refs:
+                series[run["code"]] = {**run["meta"], "pages": refs}
+
+        for header, body in self._records():
+            meta = {"fetched_at": header["fetched_at"], "start_year": header["start_year"], "end_year": header["end_year"]}
+            same = run is not None and run["code"] == header["code"] and run["meta"] == meta and run["count"] == header["pages"] and header["page"] > run["last"]
+            if not same:
+                if run is not None:
+                    apply(run)
+                run = {"code": header["code"], "meta": meta, "count": header["pages"], "changed": header.get("changed"), "written": {}, "last": 0}
+            run["written"][header["page"]] = {"offset": body, "length": header["length"]}
+            run["last"] = header["page"]
+            end = body + header["length"] + 1
+        if run is not None:
+            apply(run)
+        self.close()
+        self.data_bytes = end
+        view = self._view() if end else None
+        for entry in series.values():
+            for ref in entry["pages"]:
+                if "sha256" not in ref:
+                    ref["sha256"] = hashlib.sha256(view[ref["offset"] : ref["offset"] + ref["length"]]).hexdigest()
+        self.series = series
+
+    def compact(self) -> int:
+        """Rewrite the data file with only current records; returns bytes saved."""
+        before = self.data_bytes
+        tmp = self.path.with_suffix(".compact")
+        series: Dict[str, dict] = {}
+        with tmp.open("wb") as out:
+            for code in self.series:
+                entry = self.series[code]
+                meta = {k: entry[k] for k in ("fetched_at", "start_year", "end_year")}
+                refs = []
+                for i, (ref, body) in enumerate(zip(entry["pages"], self.pages(code))):
+                    header = json.dumps({"code": code, "page": i + 1, "pages": len(entry["pages"]), "changed": len(entry["pages"]), "length": len(body), **meta}, separators=(",", ":"))
+                    out.write(header.encode("utf-8") + b"\n")
+                    refs.append({**ref, "offset": out.tell()})
+                    out.write(body)
+                    out.write(b"\n")
+                series[code] = {**meta, "pages": refs}
+            size = out.tell()
+            out.flush()
+            os.fsync(out.fileno())
+        self.close()
+        tmp.replace(self.path)
+        self.series, self.data_bytes = series, size
+        self._write_index()
+        return before - size
+
+
+def import_jsonl(archive: RawArchive, jsonl: Path, fetched_at: str) -> int:
+    """Import a legacy `{"source_code", "rows"}` JSON lines dump as one page per series."""
+    n = 0
+    with jsonl.open(encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            rows = record["rows"]
+            years = [int(r["date"]) for r in rows if str(r.get("date") or "").isdigit()] or [0]
+            meta = {"page": 1, "pages": 1, "per_page": len(rows), "total": len(rows)}
+            archive.append_series(record["source_code"], [json.dumps([meta, rows]).encode("utf-8")], fetched_at, min(years), max(years))
+            n += 1
+    archive.commit(sync=True)
+    return n
+
+
+def summarize(archive: RawArchive) -> Iterable[str]:
+    live = 0
+    for code, entry in archive.series.items():
+        size = sum(p["length"] for p in entry["pages"])
+        live += size
+        yield f"{code}\t{len(entry['pages'])} pages\t{size} bytes\t{entry['start_year']}-{entry['end_year']}\t{entry['fetched_at']}"
+    yield f"{len(archive.series)} series, {live} live of {archive.data_bytes} bytes"
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    args = list(sys.argv[1:] if argv is None else argv)
+    commands = {"list": 0, "rows": 1, "compact": 0, "rebuild": 0, "import-jsonl": 2}
+    if not args or args[0] not in commands or len(args) - 1 not in (commands[args[0]], commands[args[0]] + 1):
+        print(__doc__.split("Usage:")[1].strip(), file=sys.stderr)
+        return 1
+    command, params = args[0], args[1:]
+    n = commands[command]
+    archive = RawArchive(Path(params[n]) if len(params) > n else ARCHIVE_PATH)
+    try:
+        if command == "list":
+            for line in summarize(archive):
+                print(line)
+        elif command == "rows":
+            if params[0] not in archive:
+                print(f"{params[0]} not in {archive.path}", file=sys.stderr)
+                return 2
+            for row in archive.rows(params[0]):
+                print(json.dumps(row))
+        elif command == "compact":
+            print(f"compacted {archive.path}: saved {archive.compact()} bytes")
+        elif command == "rebuild":
+            archive.rebuild()
+            archive.commit(sync=True)
+            print(f"rebuilt {archive.index_path}: {len(archive.series)} series")
+        else:
+            count = import_jsonl(archive, Path(params[0]), params[1])
+            print(f"imported {count} series into {archive.path}")
+    finally:
+        archive.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
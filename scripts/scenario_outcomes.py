@@ -0,0 +1,449 @@
+#!/usr/bin/env python3
+"""Score every decision path through the civic scenarios and truth checks.
+
+Each scenario offers a few options with immediate deltas (`dem_now` per bloc,
+`kpi_now`, `trust_delta`, `axis_drift`, `treasury_delta_now`). `OptionTable`
+packs every option of a file into dense row-major arrays (option x bloc,
+option x KPI, option x axis, plus the scalar columns), so a weighted option
+score is one pass over the arrays.
+
+Deltas add up along a path, so the path score is the sum of the chosen
+options' scores and the analysis never walks paths one by one:
+
+- `path_distribution` convolves the per-scenario option scores into the exact
+  distribution of the total over all `options ** scenarios` paths (quantized
+  to `resolution`), one shifted slice-add per option
+- `sample_paths` draws millions of paths for a player model: each scenario's
+  choices for all paths are one `randbytes(n).translate(table)`, and up to five
+  3-option scenarios are packed into one byte per path with big-integer
+  arithmetic, so the only per-path Python-level work is one lookup-and-add per
+  group
+- the best and worst paths are per-scenario argmax/argmin
+
+An option without a feature (`truth_quality` exists only in the truth checks)
+scores 0 on it; a weighted feature no option of a file has is skipped for
+that file and listed under `skipped_weights`.
+
+On top of that the report lists options dominated within their scenario,
+options whose deltas are robust outliers for the file, and simple rules
+("always pick the max-trust option", "always pick `evidence_first`") whose
+choices agree with the best option so often that they trivialize play.
+
+Inputs:
+- data/calibrated/civic_scenarios_v1.json
+- data/calibrated/truth_checks_v1.json
+
+Outputs:
+- data/processed/scenario_outcomes_report.json
+
+Usage:
+- python3 scripts/scenario_outcomes.py --samples 1000000
+- python3 scripts/scenario_outcomes.py --weight trust=2 --weight treasury=0 --beta 0.5
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import operator
+import random
+import statistics
+import sys
+import time
+from array import array
+from datetime import datetime, timezone
+from itertools import repeat
+from pathlib import Path
+from typing import Callable, Dict, List, Sequence, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+SCENARIO_PATHS = [
+    ROOT / "data" / "calibrated" / "civic_scenarios_v1.json",
+    ROOT / "data" / "calibrated" / "truth_checks_v1.json",
+]
+OUT_REPORT = ROOT / "data" / "processed" / "scenario_outcomes_report.json"
+
+BLOCS = ("poverty", "working", "middle", "business", "elite")
+KPIS = ("stability", "integrity", "safety", "economy", "health", "education", "climate")
+AXES = ("truthSpin", "publicDonor", "careAusterity", "libertyControl")
+FEATURES = (
+    *(f"dem.{b}" for b in BLOCS),
+    *(f"kpi.{k}" for k in KPIS),
+    *(f"axis.{a}" for a in AXES),
+    "trust",
+    "treasury",
+    "truth_quality",
+)
+
+# Bloc happiness averaged over blocs, KPIs and trust at face value, treasury
+# (currency units) scaled down. Axis drift is identity, not good or bad.
+DEFAULT_WEIGHTS = {
+    **{f"dem.{b}": 1.0 / len(BLOCS) for b in BLOCS},
+    **{f"kpi.{k}": 1.0 for k in KPIS},
+    "trust": 1.0,
+    "treasury": 0.1,
+}
+RESOLUTION = 0.01
+OUTLIER_Z = 3.5
+DEGENERATE_AGREEMENT = 0.9
+QUANTILES = (0.01, 0.1, 0.5, 0.9, 0.99)
+
+
+class OptionTable:
+    """All options of one scenario file as dense arrays; options of scenario s are rows starts[s]:starts[s+1]."""
+
+    def __init__(self, path: Path) -> None:
+        with path.open(encoding="utf-8") as f:
+            doc = json.load(f)
+        scenarios = next((v for v in doc.values() if isinstance(v, list)), None)
+        if scenarios is None:
+            raise ValueError(f"{path}: no scenario list")
+        self.name = path.stem
+        self.scenario_ids: List[str] = []
+        self.option_ids: List[str] = []
+        self.starts = [0]
+        self.dem = array("d")
+        self.kpi = array("d")
+        self.axis = array("d")
+        self.trust = array("d")
+        self.treasury = array("d")
+        self.truth = array("d")  # NaN where the file has no truth_quality
+        errors: List[str] = []
+        for scn in scenarios:
+            self.scenario_ids.append(scn["id"])
+            for opt in scn["options"]:
+                where = f"{scn['id']}/{opt.get('id')}"
+                for key, names, out in (("dem_now", BLOCS, self.dem), ("kpi_now", KPIS, self.kpi), ("axis_drift", AXES, self.axis)):
+                    deltas = opt.get(key) or {}
+                    unknown = sorted(set(deltas) - set(names))
+                    if unknown:
+                        errors.append(f"{where}: unknown {key} keys {unknown}")
+                    out.extend(float(deltas.get(n, 0.0)) for n in names)
+                self.option_ids.append(opt["id"])
+                self.trust.append(float(opt.get("trust_delta") or 0.0))
+                self.treasury.append(float(opt.get("treasury_delta_now") or 0.0))
+                self.truth.append(float(opt["truth_quality"]) if "truth_quality" in opt else math.nan)
+            self.starts.append(len(self.option_ids))
+        if errors:
+            raise ValueError(f"{path}:\n  " + "\n  ".join(errors))
+
+    @property
+    def n_options(self) -> int:
+        return len(self.option_ids)
+
+    @property
+    def n_scenarios(self) -> int:
+        return len(self.scenario_ids)
+
+    def options(self, s: int) -> range:
+        return range(self.starts[s], self.starts[s + 1])
+
+    def column(self, feature: str) -> List[float]:
+        block, _, name = feature.partition(".")
+        if block == "dem":
+            return self.dem[BLOCS.index(name) :: len(BLOCS)].tolist()
+        if block == "kpi":
+            return self.kpi[KPIS.index(name) :: len(KPIS)].tolist()
+        if block == "axis":
+            return self.axis[AXES.index(name) :: len(AXES)].tolist()
+        return {"trust": self.trust, "treasury": self.treasury, "truth_quality": self.truth}[feature].tolist()
+
+    def has(self, feature: str) -> bool:
+        """Whether any option of the file has a value for `feature` (truth_quality is optional)."""
+        return any(v == v for v in self.column(feature))
+
+    def score_column(self, feature: str) -> List[float]:
+        """`column(feature)` with missing values scored as 0 (no effect)."""
+        return [v if v == v else 0.0 for v in self.column(feature)]
+
+    def scores(self, weights: Dict[str, float]) -> List[float]:
+        """Weighted score of every option, summed column by column."""
+        total = [0.0] * self.n_options
+        for feature, w in weights.items():
+            if w:
+                total = list(map(operator.add, total, map(operator.mul, self.score_column(feature), repeat(w))))
+        return total
+
+    def label(self, i: int) -> str:
+        s = next(s for s in range(self.n_scenarios) if i < self.starts[s + 1])
+        return f"{self.scenario_ids[s]}/{self.option_ids[i]}"
+
+
+class Distribution:
+    """Probability mass over quantized path scores lo*res, (lo+1)*res, ..."""
+
+    def __init__(self, lo: int, resolution: float, mass: List[float]) -> None:
+        self.lo = lo
+        self.resolution = resolution
+        self.mass = mass
+
+    def mean(self) -> float:
+        return math.fsum((self.lo + i) * m for i, m in enumerate(self.mass)) * self.resolution
+
+    def quantile(self, q: float) -> float:
+        acc = 0.0
+        for i, m in enumerate(self.mass):
+            acc += m
+            if acc >= q:
+                return (self.lo + i) * self.resolution
+        return (self.lo + len(self.mass) - 1) * self.resolution
+
+    def cdf(self, x: float) -> float:
+        """Share of path mass scoring at most x."""
+        upto = round(x / self.resolution) - self.lo + 1
+        return math.fsum(self.mass[: max(0, upto)])
+
+
+def player_probs(table: OptionTable, scores: Sequence[float], beta: float = 0.0) -> List[float]:
+    """Choice probabilities per option: softmax of beta * score within each scenario (0 = uniform)."""
+    probs: List[float] = []
+    for s in range(table.n_scenarios):
+        opts = table.options(s)
+        top = max(scores[i] for i in opts)
+        raw = [math.exp(beta * (scores[i] - top)) for i in opts]
+        total = sum(raw)
+        probs.extend(r / total for r in raw)
+    return probs
+
+
+def path_distribution(table: OptionTable, scores: Sequence[float], probs: Sequence[float], scenarios: Sequence[int] | None = None, resolution: float = RESOLUTION) -> Distribution:
+    """Exact distribution of the path score over every combination of choices."""
+    mass = [1.0]
+    lo = 0
+    for s in range(table.n_scenarios) if scenarios is None else scenarios:
+        opts = table.options(s)
+        q = [round(scores[i] / resolution) for i in opts]
+        qmin = min(q)
+        out = [0.0] * (len(mass) + max(q) - qmin)
+        for qi, i in zip(q, opts):
+            if probs[i]:
+                at = qi - qmin
+                out[at : at + len(mass)] = map(operator.add, out[at : at + len(mass)], map(operator.mul, mass, repeat(probs[i])))
+        mass = out
+        lo += qmin
+    return Distribution(lo, resolution, mass)
+
+
+def enumerate_paths(table: OptionTable, scores: Sequence[float], scenarios: Sequence[int]) -> List[float]:
+    """Score of every path through `scenarios`, by outer sums; for small sets and checks."""
+    totals = [0.0]
+    for s in scenarios:
+        totals = [t + scores[i] for t in totals for i in table.options(s)]
+    return totals
+
+
+def choice_bytes(probs: Sequence[float]) -> bytes:
+    """Translate table from a random byte to a local option index, drawing with `probs` (to 1/256)."""
+    out: List[int] = []
+    acc = 0.0
+    for k, p in enumerate(probs):
+        acc += p
+        out.extend(repeat(k, min(256, round(acc * 256)) - len(out)))
+    out.extend(repeat(len(probs) - 1, 256 - len(out)))
+    return bytes(out)
+
+
+def sample_paths(table: OptionTable, scores: Sequence[float], probs: Sequence[float], n: int, seed: int = 0) -> List[float]:
+    """Path scores of `n` sampled players, each choosing once in every scenario."""
+    rng = random.Random(seed)
+    totals = [0.0] * n
+    group: List[int] = []
+    scenarios = list(range(table.n_scenarios))
+    for pos, s in enumerate(scenarios):
+        group.append(s)
+        radix = math.prod(len(table.options(g)) for g in group)
+        if pos + 1 < len(scenarios) and radix * len(table.options(scenarios[pos + 1])) <= 256:
+            continue
+        # Pack the group's choices into one byte per path (mixed radix, no carries
+        # across bytes), then resolve the group's summed score with one lookup.
+        packed = 0
+        sums = [0.0]
+        place = 1
+        for g in group:
+            opts = table.options(g)
+            codes = rng.randbytes(n).translate(choice_bytes([probs[i] for i in opts]))
+            packed += int.from_bytes(codes, "little") * place
+            sums = [t + scores[opts[k]] for k in range(len(opts)) for t in sums]
+            place *= len(opts)
+        lookup = packed.to_bytes(n, "little")
+        totals = list(map(operator.add, totals, map(sums.__getitem__, lookup)))
+        group = []
+    return totals
+
+
+def dominated_options(table: OptionTable, weights: Dict[str, float]) -> List[dict]:
+    """Options no better than a sibling on every weighted feature and worse on one."""
+    cols = [[v * w for v in table.score_column(f)] for f, w in weights.items() if w]
+    found = []
+    for s in range(table.n_scenarios):
+        opts = table.options(s)
+        for i in opts:
+            for j in opts:
+                if i != j and all(c[j] >= c[i] for c in cols) and any(c[j] > c[i] for c in cols):
+                    found.append({"option": table.label(i), "dominated_by": table.option_ids[j]})
+                    break
+    return found
+
+
+def outlier_options(table: OptionTable, threshold: float = OUTLIER_Z) -> List[dict]:
+    """Option deltas more than `threshold` robust z-scores (median/MAD) from the file's options.
+
+    Zeros mean "no effect" (most KPIs are absent from most options), so each
+    feature is compared only among the options that move it.
+    """
+    found = []
+    for feature in FEATURES:
+        col = table.column(feature)
+        present = [v for v in col if v == v and v != 0]
+        if len(present) < 3:
+            continue
+        med = statistics.median(present)
+        mad = statistics.median(abs(v - med) for v in present) * 1.4826
+        if mad == 0:
+            continue
+        for i, v in enumerate(col):
+            if v != v or v == 0:
+                continue
+            z = (v - med) / mad
+            if abs(z) > threshold:
+                found.append({"option": table.label(i), "feature": feature, "value": v, "robust_z": round(z, 2)})
+    return sorted(found, key=lambda o: -abs(o["robust_z"]))
+
+
+def rules(table: OptionTable, weights: Dict[str, float]) -> Dict[str, Callable[[int], int | None]]:
+    """Simple player rules: maximize one feature, or always take one option id when offered."""
+    out: Dict[str, Callable[[int], int | None]] = {}
+    for feature in [f for f, w in weights.items() if w] + ["truth_quality"]:
+        if not table.has(feature):
+            continue
+        col = table.score_column(feature)
+        sign = -1.0 if weights.get(feature, 1.0) < 0 else 1.0
+        out[f"max:{feature}"] = lambda s, col=col, sign=sign: max(table.options(s), key=lambda i: sign * col[i])
+    for option_id in sorted(set(table.option_ids)):
+        out[f"id:{option_id}"] = lambda s, option_id=option_id: next((i for i in table.options(s) if table.option_ids[i] == option_id), None)
+    return out
+
+
+def strategy_report(table: OptionTable, scores: Sequence[float], weights: Dict[str, float], resolution: float) -> List[dict]:
+    uniform = player_probs(table, scores)
+    best = [max(table.options(s), key=scores.__getitem__) for s in range(table.n_scenarios)]
+    dists: Dict[Tuple[int, ...], Distribution] = {}
+    found = []
+    for name, pick in rules(table, weights).items():
+        chosen = [(s, pick(s)) for s in range(table.n_scenarios)]
+        chosen = [(s, i) for s, i in chosen if i is not None]
+        if not chosen:
+            continue
+        covered = tuple(s for s, _ in chosen)
+        total = math.fsum(scores[i] for _, i in chosen)
+        agreement = sum(1 for s, i in chosen if scores[i] == scores[best[s]]) / len(chosen)
+        if covered not in dists:
+            dists[covered] = path_distribution(table, scores, uniform, covered, resolution)
+        dist = dists[covered]
+        found.append(
+            {
+                "rule": name,
+                "scenarios": len(covered),
+                "score": round(total, 3),
+                "best_possible": round(math.fsum(scores[best[s]] for s in covered), 3),
+                "percentile_vs_random": round(dist.cdf(total), 4),
+                "agrees_with_best": round(agreement, 3),
+                "degenerate": len(covered) >= 5 and agreement >= DEGENERATE_AGREEMENT,
+            }
+        )
+    return sorted(found, key=lambda r: -r["agrees_with_best"])
+
+
+def analyze(table: OptionTable, weights: Dict[str, float], beta: float, samples: int, seed: int, resolution: float = RESOLUTION) -> dict:
+    skipped = sorted(f for f, w in weights.items() if w and not table.has(f))
+    weights = {f: w for f, w in weights.items() if f not in skipped}
+    scores = table.scores(weights)
+    probs = player_probs(table, scores, beta)
+    started = time.perf_counter()
+    dist = path_distribution(table, scores, probs, resolution=resolution)
+    exact_s = time.perf_counter() - started
+    best = [max(table.options(s), key=scores.__getitem__) for s in range(table.n_scenarios)]
+    worst = [min(table.options(s), key=scores.__getitem__) for s in range(table.n_scenarios)]
+    paths = math.prod(len(table.options(s)) for s in range(table.n_scenarios))
+    report = {
+        "scenarios": table.n_scenarios,
+        "options": table.n_options,
+        "paths": f"{paths:.3e}",
+        "skipped_weights": skipped,
+        "best_path": {"score": round(math.fsum(scores[i] for i in best), 3), "choices": [table.option_ids[i] for i in best]},
+        "worst_path": {"score": round(math.fsum(scores[i] for i in worst), 3), "choices": [table.option_ids[i] for i in worst]},
+        "distribution": {
+            "player_beta": beta,
+            "resolution": resolution,
+            "mean": round(dist.mean(), 3),
+            **{f"p{round(q * 100)}": round(dist.quantile(q), 3) for q in QUANTILES},
+            "seconds": round(exact_s, 3),
+        },
+    }
+    if samples:
+        started = time.perf_counter()
+        totals = sample_paths(table, scores, probs, samples, seed)
+        sample_s = time.perf_counter() - started
+        totals.sort()
+        report["sampled"] = {
+            "paths": samples,
+            "mean": round(math.fsum(totals) / samples, 3),
+            **{f"p{round(q * 100)}": round(totals[min(samples - 1, int(q * samples))], 3) for q in QUANTILES},
+            "seconds": round(sample_s, 3),
+        }
+    report["dominated"] = dominated_options(table, weights)
+    report["outliers"] = outlier_options(table)
+    report["strategies"] = strategy_report(table, scores, weights, resolution)
+    return report
+
+
+def parse_weight(text: str) -> Tuple[str, float]:
+    feature, sep, value = text.partition("=")
+    if not sep or feature not in FEATURES:
+        raise argparse.ArgumentTypeError(f"expected FEATURE=WEIGHT with FEATURE in {', '.join(FEATURES)}")
+    return feature, float(value)
+
+
+def parse_args(argv: Sequence[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("files", nargs="*", type=Path, default=SCENARIO_PATHS)
+    parser.add_argument("--weight", action="append", type=parse_weight, default=[], help="override one score weight, e.g. trust=2")
+    parser.add_argument("--beta", type=float, default=0.0, help="player model: softmax sharpness over option scores (0 = uniform)")
+    parser.add_argument("--samples", type=int, default=1000000, help="sampled paths per file (0 to skip)")
+    parser.add_argument("--resolution", type=float, default=RESOLUTION, help="score quantum of the exact distribution")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", type=Path, default=OUT_REPORT)
+    return parser.parse_args(argv)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    weights = {**DEFAULT_WEIGHTS, **dict(args.weight)}
+    files = {}
+    for path in args.files:
+        table = OptionTable(path)
+        files[table.name] = analyze(table, weights, args.beta, args.samples, args.seed, args.resolution)
+        result = files[table.name]
+        flagged = [r["rule"] for r in result["strategies"] if r["degenerate"]]
+        print(
+            f"{table.name}: {result['paths']} paths, best {result['best_path']['score']}, "
+            f"p50 {result['distribution']['p50']}, {len(result['dominated'])} dominated, "
+            f"{len(result['outliers'])} outliers, degenerate rules {flagged or 'none'}"
+        )
+        if result["skipped_weights"]:
+            print(f"{table.name}: no option has {', '.join(result['skipped_weights'])}; skipped those weights")
+    report = {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "weights": weights,
+        "files": files,
+    }
+    args.out.parent.mkdir(parents=True, exist_ok=True)
+    with args.out.open("w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"wrote {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,430 @@
+#!/usr/bin/env python3
+"""Headless tick engine for spec section 5, advancing many runs at once.
+
+The state is stored column-wise: one list of floats per state variable, one
+entry per run (a runs x variables matrix held as columns). Every weekly tick
+updates whole columns, so thousands of independent Monte Carlo runs advance
+together. Each run draws from its own `random.Random` stream seeded from
+(seed, run index), so a run's trajectory does not depend on how many other
+runs share the batch.
+
+Mechanics (annual rates applied per weekly tick):
+- 5.1 budget identity: revenue = tax base * effective tax rate * compliance;
+  expenditure = function spending + debt service; deficit = expenditure -
+  revenue; debt += deficit + shock adjustment (+ `deficit_pp_to_debt_trend_pressure`
+  once a deficit has been sustained for two years)
+- 5.2 growth: base growth + lagged, capped infrastructure / education / health
+  multipliers - corruption drag - instability drag + external shock (AR(1))
+- 5.3 leakage: effective spend = allocation * (1 - leakage_rate); leakage
+  falls with integrity (`integrity_pts_to_leakage_pp`) and enforcement and
+  rises with permissive donation rules
+- outcomes move toward policy-dependent targets with first-order lags
+- delayed effects scheduled on `Batch.queue` (a `sim_lag_queue.LagQueue`) are
+  applied in one batch each week before the composite scores
+- with `--events`, section 11 events are drawn each week for every run (see
+  `sim_events.TriggerSet`) and their chosen response is applied
+- `state_stability_index` uses the section 10 weights; a run collapses once it
+  stays below 30 for 4 consecutive weeks
+
+`deficit_to_gdp_pct` keeps the baseline's sign (net lending: negative is a
+deficit). Inputs are `data/calibrated/baseline_v1.json` and
+`elasticities_v1.json`.
+
+Usage:
+- python3 scripts/sim_engine.py --runs 10000 --years 3 --seed 7 --processes 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+from build_baseline import transform
+from sim_events import EVENTS_PATH, TriggerSet, load_events
+from sim_lag_queue import LagQueue
+
+ROOT = Path(__file__).resolve().parents[1]
+BASELINE_PATH = ROOT / "data" / "calibrated" / "baseline_v1.json"
+ELASTICITIES_PATH = ROOT / "data" / "calibrated" / "elasticities_v1.json"
+OUT_PATH = ROOT / "data" / "processed" / "sim_summary.json"
+
+WEEKS_PER_YEAR = 52
+BASE_GROWTH = 1.5  # % per year
+INTEREST_RATE = 0.025
+BASE_LEAKAGE = 0.05
+TOTAL_SPEND_GDP = 40.0  # % GDP before debt service
+COLLAPSE_SSI = 30.0
+COLLAPSE_WEEKS = 4
+DEFAULT_SCORE = 50.0
+
+# Spec 6.1 band midpoints (% of total spending), normalized in `default_policy`.
+BUDGET_SHARES = {
+    "health": 17.0,
+    "education": 12.0,
+    "welfare": 35.0,
+    "defense": 5.0,
+    "policing": 5.5,
+    "infrastructure": 12.0,
+    "administration": 15.0,
+    "climate": 3.5,
+}
+
+# Lag time constants in weeks (midpoints of the spec 5.2 ranges).
+LAG_WEEKS = {"infrastructure": 65.0, "education": 130.0, "health": 45.5}
+GROWTH_MULT = {"infrastructure": 0.05, "education": 0.04, "health": 0.03}  # pp growth per pp GDP spend
+GROWTH_MULT_CAP = 0.5
+OUTCOME_LAG_WEEKS = {
+    "public_safety": 8.0,
+    "social_protection": 26.0,
+    "civil_liberties": 26.0,
+    "institutional_integrity": 52.0,
+    "climate_resilience": 104.0,
+    "external_stability": 26.0,
+}
+
+STATE_VARS = (
+    "debt_to_gdp_pct",
+    "deficit_to_gdp_pct",
+    "gdp_growth",
+    "leakage_rate",
+    "health_outcome",
+    "education_outcome",
+    "infrastructure_quality",
+    "public_safety",
+    "social_protection",
+    "climate_resilience",
+    "institutional_integrity",
+    "civil_liberties",
+    "economic_output",
+    "employment",
+    "external_stability",
+    "fiscal_space",
+    "state_stability_index",
+)
+
+
+@dataclass
+class Policy:
+    """Control vector shared by every run in a batch (spending in % GDP)."""
+
+    spend_gdp: Dict[str, float]
+    tax_rate: float | None = None  # None: calibrated so week 0 matches the baseline balance
+    compliance: float = 0.9
+    anti_corruption: float = 50.0
+    donation_strictness: float = 50.0
+    surveillance: float = 50.0
+    ai_governance: float = 50.0
+
+
+def default_policy() -> Policy:
+    total = sum(BUDGET_SHARES.values())
+    return Policy({k: TOTAL_SPEND_GDP * v / total for k, v in BUDGET_SHARES.items()})
+
+
+def load_inputs(baseline_path: Path = BASELINE_PATH, elasticities_path: Path = ELASTICITIES_PATH) -> tuple[Dict[str, float], Dict[str, float]]:
+    with baseline_path.open(encoding="utf-8") as f:
+        baseline = json.load(f)["state"]
+    with elasticities_path.open(encoding="utf-8") as f:
+        elasticities = json.load(f)["elasticities"]
+    return baseline, elasticities
+
+
+def clamp01(values: List[float], hi: float = 100.0) -> List[float]:
+    return [0.0 if v < 0.0 else hi if v > hi else v for v in values]
+
+
+def run_stream(seed: int, run: int) -> random.Random:
+    return random.Random(f"{seed}:{run}")
+
+
+@dataclass
+class Batch:
+    """Runs x state variables, as one column per variable."""
+
+    n_runs: int
+    state: Dict[str, List[float]]
+    week: int = 0
+    collapsed_at: List[int] = field(default_factory=list)
+    rngs: List[random.Random] = field(default_factory=list)
+    aux: Dict[str, list] = field(default_factory=dict)
+    queue: LagQueue = field(default_factory=LagQueue)
+    events_fired: Dict[str, int] = field(default_factory=dict)
+
+    def column(self, var: str) -> List[float]:
+        return self.state[var]
+
+    def row(self, run: int) -> Dict[str, float]:
+        return {var: col[run] for var, col in self.state.items()}
+
+
+class Engine:
+    """Advances a `Batch` week by week under one `Policy`."""
+
+    def __init__(
+        self,
+        baseline: Dict[str, float],
+        elasticities: Dict[str, float],
+        policy: Policy | None = None,
+        shock_scale: float = 1.0,
+        events: TriggerSet | None = None,
+        choices: Dict[str, str] | None = None,
+    ) -> None:
+        self.baseline = baseline
+        self.el = elasticities
+        self.policy = policy or default_policy()
+        self.base_policy = default_policy()
+        self.shock_scale = shock_scale
+        self.base_balance = baseline.get("deficit_to_gdp_pct", -2.0)
+        self.base_debt = baseline.get("debt_to_gdp_pct", 60.0)
+        base_spend = sum(self.base_policy.spend_gdp.values())
+        base_expenditure = base_spend + self.base_debt * INTEREST_RATE
+        # Tax rate that reproduces the baseline balance at week 0.
+        self.calibrated_tax_rate = (base_expenditure + self.base_balance) / (100.0 * self.base_policy.compliance)
+        self.base_effective = {k: v * (1 - BASE_LEAKAGE) for k, v in self.base_policy.spend_gdp.items()}
+        self.events = events
+        # Choice index per event; events without an entry take their first choice.
+        choices = choices or {}
+        self.choice_index = [
+            next((i for i, c in enumerate(ev.choices) if c.id == choices.get(ev.event_id)), 0) for ev in (events.events if events else [])
+        ]
+        total = sum(self.policy.spend_gdp.values())
+        self.scalars = {f"{k}_budget_share": v / total for k, v in self.policy.spend_gdp.items()}
+
+    def score(self, var: str) -> float:
+        return float(self.baseline.get(var, DEFAULT_SCORE))
+
+    def new_batch(self, n_runs: int, seed: int = 0, first_run: int = 0) -> Batch:
+        init = {var: self.score(var) for var in STATE_VARS}
+        init["debt_to_gdp_pct"] = self.base_debt
+        init["deficit_to_gdp_pct"] = self.base_balance
+        init["gdp_growth"] = BASE_GROWTH
+        init["leakage_rate"] = BASE_LEAKAGE
+        init["fiscal_space"] = (transform("DEBT_GDP", self.base_debt) + transform("DEFICIT_GDP", self.base_balance)) / 2
+        aux = {
+            "ext_shock": [0.0] * n_runs,
+            "deficit_weeks": [0] * n_runs,
+            "below_weeks": [0] * n_runs,
+            **{f"mult_{k}": [0.0] * n_runs for k in LAG_WEEKS},
+        }
+        return Batch(
+            n_runs,
+            {var: [v] * n_runs for var, v in init.items()},
+            collapsed_at=[-1] * n_runs,
+            rngs=[run_stream(seed, first_run + r) for r in range(n_runs)],
+            aux=aux,
+        )
+
+    def step(self, batch: Batch) -> None:
+        """Advance every run in the batch by one week."""
+        p, el, s, aux = self.policy, self.el, batch.state, batch.aux
+        wk = 1.0 / WEEKS_PER_YEAR
+        macro = [rng.gauss(0.0, 1.0) for rng in batch.rngs]
+        noise = [rng.gauss(0.0, 1.0) for rng in batch.rngs]
+        sc = self.shock_scale
+
+        # 5.3 leakage and effective spend.
+        integrity0 = self.score("institutional_integrity")
+        leak_policy = BASE_LEAKAGE + 0.0003 * (50.0 - p.donation_strictness) - 0.0003 * (p.anti_corruption - 50.0)
+        k_int = el["integrity_pts_to_leakage_pp"] / 100.0
+        leak = [min(0.5, max(0.0, leak_policy + k_int * (i - integrity0))) for i in s["institutional_integrity"]]
+        s["leakage_rate"] = leak
+        d_eff = {k: [v * (1 - l) - self.base_effective[k] for l in leak] for k, v in p.spend_gdp.items()}
+
+        # 5.1 budget identity (pp GDP per year).
+        tax = p.tax_rate if p.tax_rate is not None else self.calibrated_tax_rate
+        econ0 = self.score("economic_output")
+        spend = sum(p.spend_gdp.values())
+        debt = s["debt_to_gdp_pct"]
+        revenue = [100.0 * tax * p.compliance * (1 + (e - econ0) / 100.0) for e in s["economic_output"]]
+        deficit = [spend + d * INTEREST_RATE - r for d, r in zip(debt, revenue)]
+        dweeks = aux["deficit_weeks"] = [w + 1 if d > 0 else 0 for w, d in zip(aux["deficit_weeks"], deficit)]
+        pressure = el["deficit_pp_to_debt_trend_pressure"]
+        s["debt_to_gdp_pct"] = [
+            max(0.0, d + (df + (pressure * df if w > 2 * WEEKS_PER_YEAR else 0.0)) * wk + (0.5 * sc * (-m - 2.0) if m < -2.0 else 0.0))
+            for d, df, w, m in zip(debt, deficit, dweeks, macro)
+        ]
+        s["deficit_to_gdp_pct"] = [-df for df in deficit]
+
+        # 5.2 growth dynamics with lagged, capped multipliers.
+        for k, tau in LAG_WEEKS.items():
+            g = GROWTH_MULT[k]
+            s_mult = aux[f"mult_{k}"]
+            aux[f"mult_{k}"] = [m + (max(-GROWTH_MULT_CAP, min(GROWTH_MULT_CAP, g * d)) - m) / tau for m, d in zip(s_mult, d_eff[k])]
+        ext = aux["ext_shock"] = [0.95 * x + 0.1 * sc * m for x, m in zip(aux["ext_shock"], macro)]
+        ai = 0.05 * el["ai_governance_10_to_productivity"] * (p.ai_governance - 50.0) / 10.0
+        growth = [
+            BASE_GROWTH + a + b + c + ai + x - (0.02 * (60.0 - i) if i < 60.0 else 0.0) - (0.03 * (50.0 - ssi) if ssi < 50.0 else 0.0)
+            for a, b, c, i, ssi, x in zip(
+                aux["mult_infrastructure"], aux["mult_education"], aux["mult_health"], s["institutional_integrity"], s["state_stability_index"], ext
+            )
+        ]
+        s["gdp_growth"] = growth
+        s["economic_output"] = clamp01([e + 2.0 * (g - BASE_GROWTH) * wk for e, g in zip(s["economic_output"], growth)])
+        s["employment"] = clamp01([e + 1.2 * (g - BASE_GROWTH) * wk for e, g in zip(s["employment"], growth)])
+
+        # Outcomes: first-order lag toward policy-dependent targets plus noise.
+        def lagged(var: str, target: float, tau: float, slope: float = 0.0, deltas: Sequence[float] | None = None, sigma: float = 0.05) -> None:
+            """Move `var` 1/tau of the way toward `target + slope * delta` per run."""
+            ns = sigma * sc
+            if deltas is None:
+                s[var] = clamp01([v + (target - v) / tau + ns * z for v, z in zip(s[var], noise)])
+            else:
+                s[var] = clamp01([v + (target + slope * d - v) / tau + ns * z for v, d, z in zip(s[var], deltas, noise)])
+
+        base = self.score
+        lagged("health_outcome", base("health_outcome"), LAG_WEEKS["health"], el["health_spend_pp_to_health_outcome"], d_eff["health"])
+        lagged("education_outcome", base("education_outcome"), LAG_WEEKS["education"], el["education_spend_pp_to_education_outcome"], d_eff["education"])
+        lagged("infrastructure_quality", base("infrastructure_quality"), LAG_WEEKS["infrastructure"], el["infrastructure_spend_pp_to_infra_quality"], d_eff["infrastructure"])
+        surv = (p.surveillance - 50.0) / 10.0
+        lagged("public_safety", base("public_safety") + el["surveillance_strictness_10_to_safety"] * surv, OUTCOME_LAG_WEEKS["public_safety"], 0.5, d_eff["policing"])
+        lagged("civil_liberties", base("civil_liberties") + el["surveillance_strictness_10_to_liberties"] * surv, OUTCOME_LAG_WEEKS["civil_liberties"])
+        lagged("social_protection", base("social_protection"), OUTCOME_LAG_WEEKS["social_protection"], 0.5, d_eff["welfare"])
+        lagged("climate_resilience", base("climate_resilience"), OUTCOME_LAG_WEEKS["climate_resilience"], 1.0, d_eff["climate"])
+        integrity_target = integrity0 + 0.2 * (p.anti_corruption - 50.0) + 0.1 * (p.donation_strictness - 50.0)
+        lagged("institutional_integrity", integrity_target, OUTCOME_LAG_WEEKS["institutional_integrity"])
+        ext_delta = [5.0 * x - (0.1 * (d - 90.0) if d > 90.0 else 0.0) for d, x in zip(s["debt_to_gdp_pct"], ext)]
+        lagged("external_stability", base("external_stability"), OUTCOME_LAG_WEEKS["external_stability"], 1.0, ext_delta, sigma=0.1)
+
+        # Delayed effects (policy actions, event choices) due this week.
+        batch.queue.fire(batch.week, s)
+
+        # Fiscal scores and the section 10 composite.
+        s["fiscal_space"] = [(transform("DEBT_GDP", d) + transform("DEFICIT_GDP", b)) / 2 for d, b in zip(s["debt_to_gdp_pct"], s["deficit_to_gdp_pct"])]
+        ssi = [
+            0.20 * (ec + em) / 2 + 0.25 * (h + ed + ps) / 3 + 0.20 * ii + 0.20 * fs + 0.15 * ex
+            for ec, em, h, ed, ps, ii, fs, ex in zip(
+                s["economic_output"], s["employment"], s["health_outcome"], s["education_outcome"], s["public_safety"],
+                s["institutional_integrity"], s["fiscal_space"], s["external_stability"],
+            )
+        ]
+        s["state_stability_index"] = ssi
+        if self.events is not None:
+            self.fire_events(batch)
+        below = aux["below_weeks"] = [b + 1 if v < COLLAPSE_SSI else 0 for b, v in zip(aux["below_weeks"], ssi)]
+        batch.week += 1
+        collapsed = batch.collapsed_at
+        for r, b in enumerate(below):
+            if b >= COLLAPSE_WEEKS and collapsed[r] < 0:
+                collapsed[r] = batch.week
+
+    def fire_events(self, batch: Batch) -> None:
+        """Draw section 11 events for every run and apply the chosen responses.
+
+        Immediate effects change the state now; delayed blocks go on the lag
+        queue for that run as one `schedule_action` (so the decision gets a
+        causality record), each due `after_weeks` after the current week.
+        """
+        s, queue, counts = batch.state, batch.queue, batch.events_fired
+        events = self.events.events
+        for run, e in self.events.fire(s, batch.rngs, self.scalars):
+            ev = events[e]
+            choice = ev.choices[self.choice_index[e]]
+            counts[ev.event_id] = counts.get(ev.event_id, 0) + 1
+            for eff in choice.immediate:
+                if eff.var in s:
+                    s[eff.var][run] += eff.delta
+            if choice.delayed:
+                lags = [(eff.var, eff.delta, (block.after_weeks - 1, block.after_weeks - 1)) for block in choice.delayed for eff in block.effects]
+                queue.schedule_action(f"{ev.event_id}:{choice.id}", lags, run)
+
+    def run(self, n_runs: int, weeks: int, seed: int = 0, first_run: int = 0) -> Batch:
+        batch = self.new_batch(n_runs, seed, first_run)
+        for _ in range(weeks):
+            self.step(batch)
+        return batch
+
+
+def _run_shard(engine: Engine, n_runs: int, weeks: int, seed: int, first_run: int) -> Batch:
+    batch = engine.run(n_runs, weeks, seed, first_run)
+    batch.rngs = []
+    return batch
+
+
+def run_parallel(engine: Engine, n_runs: int, weeks: int, seed: int = 0, processes: int = 1) -> Batch:
+    """Split runs into contiguous shards across processes and concatenate them.
+
+    Runs keep their own RNG streams, so the state equals `engine.run(...)`;
+    the shards' lag-queue counters and causality logs are merged in shard order.
+    """
+    if processes <= 1 or n_runs < 2 * processes:
+        return engine.run(n_runs, weeks, seed)
+    bounds = [n_runs * i // processes for i in range(processes + 1)]
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        shards = list(pool.map(_run_shard, [engine] * processes, [b - a for a, b in zip(bounds, bounds[1:])], [weeks] * processes, [seed] * processes, bounds[:-1]))
+    merged = Batch(n_runs, {var: [v for sh in shards for v in sh.state[var]] for var in shards[0].state}, week=weeks)
+    merged.collapsed_at = [w for sh in shards for w in sh.collapsed_at]
+    merged.queue.now = weeks
+    for sh in shards:
+        for event_id, count in sh.events_fired.items():
+            merged.events_fired[event_id] = merged.events_fired.get(event_id, 0) + count
+        merged.queue.merge(sh.queue)
+    return merged
+
+
+def summarize(batch: Batch) -> dict:
+    """Per-variable p10/p50/p90/mean across runs plus the collapse rate."""
+    out: Dict[str, dict] = {}
+    for var, col in batch.state.items():
+        ordered = sorted(col)
+        pick = lambda q: ordered[min(len(ordered) - 1, int(round((len(ordered) - 1) * q)))]  # noqa: E731
+        out[var] = {"mean": round(math.fsum(col) / len(col), 4), "p10": round(pick(0.1), 4), "p50": round(pick(0.5), 4), "p90": round(pick(0.9), 4)}
+    collapses = sum(1 for w in batch.collapsed_at if w >= 0)
+    return {
+        "weeks": batch.week,
+        "runs": batch.n_runs,
+        "collapse_rate": round(collapses / batch.n_runs, 4),
+        "state": out,
+        "events_fired": dict(sorted(batch.events_fired.items())),
+        "lag_queue": batch.queue.stats(),
+        "causality_records": len(batch.queue.causality),
+    }
+
+
+def parse_args(argv: Sequence[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=1000)
+    parser.add_argument("--years", type=float, default=3.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--processes", type=int, default=1, help="worker processes; runs are sharded across them")
+    parser.add_argument("--shock-scale", type=float, default=1.0, help="multiplier on macro shocks and outcome noise")
+    parser.add_argument("--policy", type=Path, help="JSON object overriding Policy fields (e.g. spend_gdp, tax_rate)")
+    parser.add_argument("--events", type=Path, nargs="?", const=EVENTS_PATH, help="draw section 11 events from this file (default: events_v1.json)")
+    parser.add_argument("--out", type=Path, default=OUT_PATH)
+    return parser.parse_args(argv)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    baseline, elasticities = load_inputs()
+    policy = default_policy()
+    if args.policy:
+        with args.policy.open(encoding="utf-8") as f:
+            overrides = json.load(f)
+        spend = {**policy.spend_gdp, **overrides.pop("spend_gdp", {})}
+        policy = replace(policy, spend_gdp=spend, **overrides)
+    events = TriggerSet(load_events(args.events)) if args.events else None
+    engine = Engine(baseline, elasticities, policy, shock_scale=args.shock_scale, events=events)
+    weeks = int(round(args.years * WEEKS_PER_YEAR))
+    started = time.perf_counter()
+    batch = run_parallel(engine, args.runs, weeks, args.seed, args.processes)
+    summary = summarize(batch)
+    summary["seed"] = args.seed
+    summary["elapsed_s"] = round(time.perf_counter() - started, 3)
+    args.out.parent.mkdir(parents=True, exist_ok=True)
+    with args.out.open("w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    print(f"simulated {args.runs} runs x {weeks} weeks in {summary['elapsed_s']}s; collapse rate {summary['collapse_rate']}")
+    print(f"wrote {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
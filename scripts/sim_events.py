@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+"""Load section 11 event definitions and evaluate their triggers for many runs.
+
+`load_events` validates the event JSON (ids, `trigger.all` predicates,
+`chance_per_week`, choices with `immediate` and `delayed` effects) and raises
+`EventError` listing every problem. `TriggerSet` compiles every predicate of
+every event into one table per state variable:
+
+- the variable's distinct thresholds are sorted, and each run's value is
+  encoded once as a byte: its position among the thresholds (and whether it
+  equals one), or 255 for NaN
+- each predicate `{var, op, value}` is then a 256-byte translation table, so
+  its truth over all runs is `codes.translate(table)`, done in C
+- an event's trigger is the AND of its predicate masks, taken over the masks as
+  big integers (one byte per run)
+
+So a tick costs one Python-level pass per *variable*, not per event per run.
+Bernoulli draws are batched the same way: each run draws a block of random
+bytes from its own RNG stream per tick, and every event's draws across runs
+are one strided slice compared with translation tables. Results therefore do
+not depend on batch composition.
+
+Usage:
+- python3 scripts/sim_events.py --validate data/calibrated/events_v1.json
+- python3 scripts/sim_events.py --benchmark --events 300 --runs 10000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import operator
+import random
+import sys
+import time
+from bisect import bisect_left
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Mapping, Sequence, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+EVENTS_PATH = ROOT / "data" / "calibrated" / "events_v1.json"
+
+OPS: Dict[str, Callable[[float, float], bool]] = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+NAN_CODE = 255
+MAX_THRESHOLDS = 127  # codes 0..254 cover 2 * 127 + 1 positions
+
+
+class EventError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class Effect:
+    var: str
+    delta: float
+
+
+@dataclass(frozen=True)
+class Delayed:
+    after_weeks: int
+    effects: Tuple[Effect, ...]
+
+
+@dataclass(frozen=True)
+class Choice:
+    id: str
+    label: str
+    immediate: Tuple[Effect, ...]
+    delayed: Tuple[Delayed, ...]
+
+
+@dataclass(frozen=True)
+class EventDef:
+    event_id: str
+    title: str
+    category: str
+    predicates: Tuple[Tuple[str, str, float], ...]
+    chance_per_week: float
+    choices: Tuple[Choice, ...]
+    provenance: dict
+
+
+def _number(value, where: str, errors: List[str]) -> float:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        errors.append(f"{where}: expected a number, got {value!r}")
+        return 0.0
+    return float(value)
+
+
+def _effects(raw, where: str, errors: List[str]) -> Tuple[Effect, ...]:
+    if not isinstance(raw, list):
+        errors.append(f"{where}: expected a list of effects")
+        return ()
+    out = []
+    for i, eff in enumerate(raw):
+        if not isinstance(eff, dict) or not isinstance(eff.get("var"), str):
+            errors.append(f"{where}[{i}]: expected {{'var': str, 'delta': number}}")
+            continue
+        out.append(Effect(eff["var"], _number(eff.get("delta"), f"{where}[{i}].delta", errors)))
+    return tuple(out)
+
+
+def parse_event(raw: dict, errors: List[str]) -> EventDef | None:
+    eid = raw.get("event_id") if isinstance(raw, dict) else None
+    if not isinstance(eid, str) or not eid:
+        errors.append(f"event {raw!r:.60}: missing event_id")
+        return None
+    trigger = raw.get("trigger")
+    if not isinstance(trigger, dict) or not isinstance(trigger.get("all"), list):
+        errors.append(f"{eid}: trigger.all must be a list of predicates")
+        return None
+    predicates = []
+    for i, pred in enumerate(trigger["all"]):
+        where = f"{eid}.trigger.all[{i}]"
+        if not isinstance(pred, dict) or not isinstance(pred.get("var"), str):
+            errors.append(f"{where}: expected {{'var', 'op', 'value'}}")
+            continue
+        if pred.get("op") not in OPS:
+            errors.append(f"{where}: unknown op {pred.get('op')!r}; expected one of {sorted(OPS)}")
+            continue
+        predicates.append((pred["var"], pred["op"], _number(pred.get("value"), f"{where}.value", errors)))
+    chance = _number(trigger.get("chance_per_week"), f"{eid}.trigger.chance_per_week", errors)
+    if not 0.0 <= chance <= 1.0:
+        errors.append(f"{eid}: chance_per_week {chance} outside [0, 1]")
+    choices = []
+    seen = set()
+    for j, ch in enumerate(raw.get("choices") or []):
+        where = f"{eid}.choices[{j}]"
+        if not isinstance(ch, dict) or not isinstance(ch.get("id"), str):
+            errors.append(f"{where}: missing id")
+            continue
+        if ch["id"] in seen:
+            errors.append(f"{where}: duplicate choice id {ch['id']!r}")
+        seen.add(ch["id"])
+        delayed = []
+        for k, d in enumerate(ch.get("delayed") or []):
+            after = d.get("after_weeks") if isinstance(d, dict) else None
+            if not isinstance(after, int) or isinstance(after, bool) or after < 0:
+                errors.append(f"{where}.delayed[{k}]: after_weeks must be a non-negative integer")
+                continue
+            delayed.append(Delayed(after, _effects(d.get("effects"), f"{where}.delayed[{k}].effects", errors)))
+        choices.append(Choice(ch["id"], ch.get("label", ch["id"]), _effects(ch.get("immediate") or [], f"{where}.immediate", errors), tuple(delayed)))
+    if not choices:
+        errors.append(f"{eid}: at least one choice is required")
+    return EventDef(eid, raw.get("title", eid), raw.get("category", ""), tuple(predicates), chance, tuple(choices), raw.get("provenance") or {})
+
+
+def parse_events(payload) -> List[EventDef]:
+    """Validate a list of events (or `{"events": [...]}`); raises EventError."""
+    raw_events = payload.get("events") if isinstance(payload, dict) else payload
+    if not isinstance(raw_events, list):
+        raise EventError("expected a list of events or an object with an 'events' list")
+    errors: List[str] = []
+    events: List[EventDef] = []
+    ids = set()
+    for raw in raw_events:
+        event = parse_event(raw, errors)
+        if event is None:
+            continue
+        if event.event_id in ids:
+            errors.append(f"{event.event_id}: duplicate event_id")
+        ids.add(event.event_id)
+        events.append(event)
+    if errors:
+        raise EventError("invalid events:\n- " + "\n- ".join(errors))
+    return events
+
+
+def load_events(path: Path = EVENTS_PATH) -> List[EventDef]:
+    with path.open(encoding="utf-8") as f:
+        return parse_events(json.load(f))
+
+
+def _truth_table(op: str, j: int) -> bytes:
+    """Predicate `v op t_j` as a function of the position code of v."""
+    table = bytearray(256)
+    for code in range(2 * MAX_THRESHOLDS + 1):
+        i, exact = divmod(code, 2)
+        # exact: v == t_i; otherwise t_{i-1} < v < t_i
+        if exact:
+            lt, eq = i < j, i == j
+        else:
+            lt, eq = i <= j, False
+        gt = not lt and not eq
+        table[code] = {"<": lt, "<=": lt or eq, ">": gt, ">=": gt or eq, "==": eq, "!=": not eq}[op]
+    table[NAN_CODE] = op == "!="
+    return bytes(table)
+
+
+class TriggerSet:
+    """All event triggers compiled into per-variable threshold tables."""
+
+    def __init__(self, events: Sequence[EventDef]) -> None:
+        self.events = list(events)
+        thresholds: Dict[str, set] = {}
+        for ev in self.events:
+            for var, _, value in ev.predicates:
+                thresholds.setdefault(var, set()).add(value)
+        self.thresholds: Dict[str, List[float]] = {v: sorted(ts) for v, ts in thresholds.items()}
+        for var, ts in self.thresholds.items():
+            if len(ts) > MAX_THRESHOLDS:
+                raise EventError(f"{var}: {len(ts)} distinct thresholds; at most {MAX_THRESHOLDS} are supported")
+        # Distinct predicates; events refer to them by index.
+        self.predicates: List[Tuple[str, str, float]] = []
+        self.tables: List[bytes] = []
+        pos: Dict[Tuple[str, str, float], int] = {}
+        self.event_predicates: List[List[int]] = []
+        for ev in self.events:
+            idx = []
+            for pred in ev.predicates:
+                if pred not in pos:
+                    var, op, value = pred
+                    pos[pred] = len(self.predicates)
+                    self.predicates.append(pred)
+                    self.tables.append(_truth_table(op, self.thresholds[var].index(value)))
+                idx.append(pos[pred])
+            self.event_predicates.append(idx)
+        self.variables = sorted(self.thresholds)
+
+    @staticmethod
+    def encode(values: Sequence[float], thresholds: List[float]) -> bytes:
+        """One position code per value (see module docstring)."""
+        n = len(thresholds)
+        out = bytearray(len(values))
+        for r, v in enumerate(values):
+            if v != v:
+                out[r] = NAN_CODE
+                continue
+            i = bisect_left(thresholds, v)
+            out[r] = 2 * i + 1 if i < n and thresholds[i] == v else 2 * i
+        return bytes(out)
+
+    def masks(self, state: Mapping[str, Sequence[float]], n_runs: int, scalars: Mapping[str, float] | None = None) -> List[int]:
+        """Per-event trigger masks: integers holding one 0/1 byte per run."""
+        scalars = scalars or {}
+        codes: Dict[str, bytes] = {}
+        for var in self.variables:
+            if var in state:
+                codes[var] = self.encode(state[var], self.thresholds[var])
+            elif var in scalars:
+                codes[var] = self.encode([scalars[var]], self.thresholds[var]) * n_runs
+            else:
+                raise KeyError(f"trigger variable {var!r} is neither in the state nor a scalar input")
+        pred_masks = [int.from_bytes(codes[var].translate(table), "little") for (var, _, _), table in zip(self.predicates, self.tables)]
+        all_runs = int.from_bytes(b"\x01" * n_runs, "little")
+        out = []
+        for idx in self.event_predicates:
+            m = all_runs
+            for p in idx:
+                m &= pred_masks[p]
+                if not m:
+                    break
+            out.append(m)
+        return out
+
+    def draws(self, rngs: Sequence[random.Random]) -> List[int]:
+        """Per-event Bernoulli masks: one 16-bit uniform per run and event.
+
+        Each run contributes `randbytes(2 * n_events)` from its own stream; the
+        bytes for event `e` across all runs are strided slices of the joined
+        buffer, compared against `chance * 65536` with translation tables.
+        """
+        n_events = len(self.events)
+        stride = 2 * n_events
+        buf = b"".join(rng.randbytes(stride) for rng in rngs)
+        out = []
+        for e, ev in enumerate(self.events):
+            limit = round(ev.chance_per_week * 65536)
+            if limit >= 65536:
+                out.append(int.from_bytes(b"\x01" * len(rngs), "little"))
+                continue
+            th, tl = divmod(limit, 256)
+            hi = buf[2 * e :: stride]
+            lo = buf[2 * e + 1 :: stride]
+            hi_lt = int.from_bytes(hi.translate(_LESS_THAN[th]), "little")
+            hi_eq = int.from_bytes(hi.translate(_EQUAL_TO[th]), "little")
+            lo_lt = int.from_bytes(lo.translate(_LESS_THAN[tl]), "little")
+            out.append(hi_lt | (hi_eq & lo_lt))
+        return out
+
+    def fire(self, state: Mapping[str, Sequence[float]], rngs: Sequence[random.Random], scalars: Mapping[str, float] | None = None) -> List[Tuple[int, int]]:
+        """Triggered and drawn (run, event index) pairs for this tick, by run."""
+        n = len(rngs)
+        fired: List[Tuple[int, int]] = []
+        for e, (m, d) in enumerate(zip(self.masks(state, n, scalars), self.draws(rngs))):
+            hit = m & d
+            if hit:
+                fired.extend((r, e) for r in iter_set_bytes(hit, n))
+        fired.sort()
+        return fired
+
+
+_LESS_THAN = [bytes(int(b < t) for b in range(256)) for t in range(256)]
+_EQUAL_TO = [bytes(int(b == t) for b in range(256)) for t in range(256)]
+
+
+def iter_set_bytes(mask: int, n: int) -> Iterator[int]:
+    data = mask.to_bytes(n, "little")
+    r = data.find(1)
+    while r >= 0:
+        yield r
+        r = data.find(1, r + 1)
+
+
+def interpreted_fire(events: Sequence[EventDef], state: Mapping[str, Sequence[float]], rngs: Sequence[random.Random], scalars: Mapping[str, float]) -> List[Tuple[int, int]]:
+    """Reference dict walk per event per run, for validation and benchmarks."""
+    fired = []
+    for r, rng in enumerate(rngs):
+        row = {**scalars, **{var: col[r] for var, col in state.items()}}
+        for e, ev in enumerate(events):
+            if all(OPS[op](row[var], value) for var, op, value in ev.predicates) and rng.random() < ev.chance_per_week:
+                fired.append((r, e))
+    return fired
+
+
+def synthetic_events(n_events: int, variables: Sequence[str], seed: int = 0) -> List[EventDef]:
+    rng = random.Random(seed)
+    ops = list(OPS)
+    events = []
+    for i in range(n_events):
+        preds = tuple((rng.choice(variables), rng.choice(ops[:4]), float(rng.randint(20, 80))) for _ in range(rng.randint(1, 3)))
+        events.append(EventDef(f"synthetic_{i}", "", "synthetic", preds, rng.uniform(0.01, 0.1), (Choice("ack", "ack", (), ()),), {}))
+    return events
+
+
+def run_benchmark(n_events: int, n_runs: int, ticks: int = 5, seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    variables = [f"v{i}" for i in range(12)]
+    events = synthetic_events(n_events, variables, seed)
+    trig = TriggerSet(events)
+    state = {v: [rng.uniform(0, 100) for _ in range(n_runs)] for v in variables}
+
+    def streams() -> List[random.Random]:
+        return [random.Random(f"{seed}:{r}") for r in range(n_runs)]
+
+    # Draw order differs (event-major vs run-major), so compare trigger sets.
+    masks = trig.masks(state, n_runs)
+    compiled_pairs = sorted((r, e) for e, m in enumerate(masks) for r in iter_set_bytes(m, n_runs))
+    always = [EventDef(ev.event_id, "", "", ev.predicates, 1.0, ev.choices, {}) for ev in events]
+    same = compiled_pairs == interpreted_fire(always, state, streams(), {})
+
+    rngs = streams()
+    started = time.perf_counter()
+    for _ in range(ticks):
+        trig.fire(state, rngs)
+    compiled_s = (time.perf_counter() - started) / ticks
+    rngs = streams()
+    started = time.perf_counter()
+    interpreted_fire(events, state, rngs, {})
+    interpreted_s = time.perf_counter() - started
+    return {
+        "events": n_events,
+        "runs": n_runs,
+        "predicates": len(trig.predicates),
+        "compiled_tick_s": round(compiled_s, 4),
+        "interpreted_tick_s": round(interpreted_s, 4),
+        "speedup": round(interpreted_s / compiled_s, 1) if compiled_s else None,
+        "same_triggers": same,
+    }
+
+
+def parse_args(argv: Sequence[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--validate", type=Path, help="validate an events file and print a summary")
+    parser.add_argument("--benchmark", action="store_true", help="compare against a per-run dict walk")
+    parser.add_argument("--events", type=int, default=300)
+    parser.add_argument("--runs", type=int, default=10000)
+    return parser.parse_args(argv)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    if args.validate:
+        try:
+            events = load_events(args.validate)
+        except EventError as exc:
+            print(exc, file=sys.stderr)
+            return 2
+        trig = TriggerSet(events)
+        print(f"{len(events)} events, {len(trig.predicates)} distinct predicates over {trig.variables}")
+        return 0
+    if args.benchmark:
+        result = run_benchmark(args.events, args.runs)
+        for key, value in result.items():
+            print(f"{key}: {value}")
+        return 0 if result["same_triggers"] else 2
+    print(__doc__.split("Usage:")[1].strip(), file=sys.stderr)
+    return 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
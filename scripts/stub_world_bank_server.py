@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""Local stub of the World Bank indicators API for offline fetch benchmarks.
+
+Serves `/country/<iso3;iso3>/indicator/<code>?date=&per_page=&page=` with the
+same `[meta, rows]` payload shape as api.worldbank.org. Rows come from the raw
+archive when available, otherwise they are synthesized. `--latency` adds a fixed
+per-request delay to mimic network round trips, and `--max-per-page` caps page
+size so multi-page indicators can be exercised.
+
+Usage:
+- python3 scripts/stub_world_bank_server.py --port 8765
+- python3 scripts/stub_world_bank_server.py --benchmark --workers 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import fetch_world_bank as wb  # noqa: E402
+
+
+def load_fixture_rows() -> Dict[str, List[dict]]:
+    archive = wb.raw_archive.RawArchive(wb.RAW_PATH)
+    try:
+        return {code: wb.series_rows(archive.pages(code)) for code in archive.codes()}
+    finally:
+        archive.close()
+
+
+def synthetic_rows(code: str, countries: List[str], start_year: int, end_year: int) -> List[dict]:
+    rows = []
+    seed = sum(ord(ch) for ch in code)
+    for i, iso3 in enumerate(countries):
+        for year in range(end_year, start_year - 1, -1):
+            rows.append(
+                {
+                    "indicator": {"id": code, "value": code},
+                    "country": {"id": iso3[:2], "value": iso3},
+                    "countryiso3code": iso3,
+                    "date": str(year),
+                    "value": round(((seed * (i + 3) + year * 7) % 1000) / 10.0, 4),
+                    "unit": "",
+                    "obs_status": "",
+                    "decimal": 1,
+                }
+            )
+    return rows
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    server: "StubServer"
+
+    def log_message(self, fmt: str, *args) -> None:  # silence per-request logging
+        return
+
+    def do_GET(self) -> None:  # noqa: N802
+        parsed = urllib.parse.urlsplit(self.path)
+        parts = [urllib.parse.unquote(p) for p in parsed.path.strip("/").split("/")]
+        if len(parts) < 4 or parts[-4] != "country" or parts[-2] != "indicator":
+            self.send_error(404)
+            return
+        countries = [c.upper() for c in parts[-3].split(";") if c]
+        code = parts[-1]
+        query = dict(urllib.parse.parse_qsl(parsed.query))
+        start_s, _, end_s = query.get("date", "2000:2025").partition(":")
+        start_year, end_year = int(start_s), int(end_s or start_s)
+        per_page = max(1, min(int(query.get("per_page", "50")), self.server.max_per_page))
+        page = max(1, int(query.get("page", "1")))
+
+        rows = self.server.rows_for(code, countries, start_year, end_year)
+        pages = max(1, -(-len(rows) // per_page))
+        chunk = rows[(page - 1) * per_page : page * per_page]
+        meta = {"page": page, "pages": pages, "per_page": per_page, "total": len(rows), "lastupdated": "2026-01-28"}
+        body = json.dumps([meta, chunk]).encode("utf-8")
+
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], latency: float = 0.0, max_per_page: int = wb.PAGE_SIZE) -> None:
+        super().__init__(address, StubHandler)
+        self.latency = latency
+        self.max_per_page = max_per_page
+        self.fixture = load_fixture_rows()
+
+    def rows_for(self, code: str, countries: List[str], start_year: int, end_year: int) -> List[dict]:
+        wanted = set(countries)
+        if code in self.fixture:
+            return [
+                r
+                for r in self.fixture[code]
+                if (r.get("countryiso3code") or "").upper() in wanted and start_year <= int(r.get("date") or 0) <= end_year
+            ]
+        return synthetic_rows(code, countries, start_year, end_year)
+
+    @property
+    def api_root(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def start_stub_server(latency: float = 0.0, max_per_page: int = wb.PAGE_SIZE, port: int = 0) -> StubServer:
+    """Start a stub server on a background thread; call `.shutdown()` when done."""
+    server = StubServer(("127.0.0.1", port), latency=latency, max_per_page=max_per_page)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run_benchmark(server: StubServer, workers: int, rate_limit: float, start_year: int, end_year: int) -> dict:
+    peers = wb.read_peers()
+    indicators = wb.read_world_bank_indicators()
+    timings = {}
+    outputs = {}
+    for label, n in (("sequential", 1), ("concurrent", workers)):
+        t0 = time.perf_counter()
+        outputs[label] = wb.fetch_all(indicators, peers, start_year, end_year, n, rate_limit, server.api_root)
+        timings[label] = time.perf_counter() - t0
+    return {
+        "indicators": len(indicators),
+        "workers": workers,
+        "latency_s": server.latency,
+        "max_per_page": server.max_per_page,
+        "sequential_s": round(timings["sequential"], 3),
+        "concurrent_s": round(timings["concurrent"], 3),
+        "speedup": round(timings["sequential"] / timings["concurrent"], 2) if timings["concurrent"] else None,
+        "identical_output": json.dumps(outputs["sequential"], default=str) == json.dumps(outputs["concurrent"], default=str),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="World Bank API stub server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds added to every response")
+    parser.add_argument("--max-per-page", type=int, default=100, help="cap on rows per page")
+    parser.add_argument("--benchmark", action="store_true", help="time sequential vs concurrent fetch, then exit")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--rate-limit", type=float, default=0.0)
+    parser.add_argument("--start-year", type=int, default=2000)
+    parser.add_argument("--end-year", type=int, default=2025)
+    args = parser.parse_args()
+
+    if args.benchmark:
+        server = start_stub_server(args.latency, args.max_per_page)
+        try:
+            print(json.dumps(run_benchmark(server, args.workers, args.rate_limit, args.start_year, args.end_year), indent=2))
+        finally:
+            server.shutdown()
+        return 0
+
+    server = StubServer(("127.0.0.1", args.port), latency=args.latency, max_per_page=args.max_per_page)
+    print(f"serving World Bank stub on {server.api_root} (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
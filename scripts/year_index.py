@@ -0,0 +1,123 @@
+"""Sorted-year index for gap-filling lookups on sparse annual series.
+
+Each (country, indicator) series is kept as parallel ascending `years`/`values`
+lists. Single lookups bisect into them; `fill_series` fills a whole target
+range in one merge walk, so filling every country's series costs time linear in
+the data instead of probing `2 * max_gap + 1` keys per cell.
+
+Fill methods:
+- `nearest`: closest observed year, earlier year on ties
+- `ffill`: latest observed year at or before the target
+- `interp`: linear interpolation between the observations around the target
+  (exact hits pass through; no extrapolation past either end)
+
+`max_gap` (years) bounds how far a filled value may come from: the distance to
+the source year for `nearest`/`ffill`, and to both neighbours for `interp`.
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+NAN = float("nan")
+FILL_METHODS = ("nearest", "ffill", "interp")
+
+
+def _pick(years: Sequence[int], values: Sequence[float], p: int, target: int, method: str, max_gap: int | None) -> float:
+    """Fill `target` given `p = bisect_left(years, target)`; NaN when unavailable."""
+    n = len(years)
+    if p < n and years[p] == target:
+        return values[p]
+    limit = max_gap if max_gap is not None else 10**9
+    before = target - years[p - 1] if p > 0 else None
+    after = years[p] - target if p < n else None
+    if method == "nearest":
+        if before is not None and (after is None or before <= after):
+            return values[p - 1] if before <= limit else NAN
+        if after is not None:
+            return values[p] if after <= limit else NAN
+        return NAN
+    if method == "ffill":
+        return values[p - 1] if before is not None and before <= limit else NAN
+    if method == "interp":
+        if before is None or after is None or before > limit or after > limit:
+            return NAN
+        lo, hi = values[p - 1], values[p]
+        return lo + (hi - lo) * before / (before + after)
+    raise ValueError(f"unknown fill method {method!r}; expected one of {FILL_METHODS}")
+
+
+def fill_series(years: Sequence[int], values: Sequence[float], targets: Iterable[int], method: str = "nearest", max_gap: int | None = None) -> List[float]:
+    """Fill each target year from an ascending series; NaN where nothing qualifies.
+
+    Ascending targets are handled in a single merge walk; others fall back to a
+    bisect per target.
+    """
+    out: List[float] = []
+    p = 0
+    n = len(years)
+    prev = None
+    for t in targets:
+        if prev is not None and t < prev:
+            p = bisect_left(years, t)
+        else:
+            while p < n and years[p] < t:
+                p += 1
+        prev = t
+        out.append(_pick(years, values, p, t, method, max_gap))
+    return out
+
+
+class YearIndex:
+    """Per-(country, indicator) sorted years and values with gap-filling lookups."""
+
+    def __init__(self) -> None:
+        self._series: Dict[Tuple[str, str], Tuple[List[int], List[float]]] = {}
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[dict]) -> "YearIndex":
+        """Build from observation rows in one pass; later duplicates win."""
+        grouped: Dict[Tuple[str, str], Dict[int, float]] = {}
+        for row in rows:
+            try:
+                value = float(row["value"])
+            except ValueError:
+                continue
+            grouped.setdefault((row["country_id"], row["indicator_id"]), {})[int(row["year"])] = value
+        index = cls()
+        for key, by_year in grouped.items():
+            years = sorted(by_year)
+            index._series[key] = (years, [by_year[y] for y in years])
+        return index
+
+    def __contains__(self, key: Tuple[str, str]) -> bool:
+        return key in self._series
+
+    def years(self, country: str, indicator: str) -> List[int]:
+        return self._series.get((country, indicator), ([], []))[0]
+
+    def _lookup(self, country: str, indicator: str, year: int, method: str, max_gap: int | None) -> float | None:
+        series = self._series.get((country, indicator))
+        if series is None:
+            return None
+        years, values = series
+        v = _pick(years, values, bisect_left(years, year), year, method, max_gap)
+        return None if v != v else v
+
+    def get(self, country: str, indicator: str, year: int) -> float | None:
+        return self._lookup(country, indicator, year, "nearest", 0)
+
+    def nearest(self, country: str, indicator: str, year: int, max_gap: int | None = None) -> float | None:
+        return self._lookup(country, indicator, year, "nearest", max_gap)
+
+    def forward_fill(self, country: str, indicator: str, year: int, max_gap: int | None = None) -> float | None:
+        return self._lookup(country, indicator, year, "ffill", max_gap)
+
+    def interpolate(self, country: str, indicator: str, year: int, max_gap: int | None = None) -> float | None:
+        return self._lookup(country, indicator, year, "interp", max_gap)
+
+    def fill(self, country: str, indicator: str, years: Iterable[int], method: str = "nearest", max_gap: int | None = None) -> List[float | None]:
+        """Fill a whole series for `years` in one pass; None where nothing qualifies."""
+        src_years, src_values = self._series.get((country, indicator), ([], []))
+        return [None if v != v else v for v in fill_series(src_years, src_values, years, method, max_gap)]
@@ -5,6 +5,8 @@ const TILE_H = 32;
 const MAP_W = 40;
 const MAP_H = 40;
 const ASSET_BASE = "./assets/cozy-pack";
+const RUNTIME_BASE = "../data/runtime";
+const RUNTIME_BUNDLE_VERSION = 1;
 const AP_REGEN_DAYS = 4;
 const RAPID_INTERVAL_DAYS = 24;
 const RAPID_WINDOW_DAYS = 28;
@@ -7249,6 +7251,72 @@ function renderGameOverModal() {
   }
 }
 
+function decodeBundleTable(table, strings) {
+  const rows = Array.from({ length: table.rows }, () => ({}));
+  for (const col of table.columns) {
+    const missing = new Set(col.missing || []);
+    const present = rows.map((_, i) => i).filter((i) => !missing.has(i));
+    const width = col.keys ? col.keys.length : 0;
+    let values;
+    if (col.kind === "str") values = col.data.map((i) => strings[i]);
+    else if (col.kind === "num" || col.kind === "json") values = col.data;
+    else if (col.kind === "str[]") values = col.data.map((v) => v.map((i) => strings[i]));
+    else if (col.kind === "strmap" || col.kind === "nummap") {
+      values = present.map((_, j) => {
+        const out = {};
+        col.keys.forEach((k, b) => {
+          const cell = col.data[j * width + b];
+          if (col.kind === "strmap" ? cell >= 0 : !col.mask || (col.mask[j] >> b) & 1) {
+            out[k] = col.kind === "strmap" ? strings[cell] : cell;
+          }
+        });
+        return out;
+      });
+    } else if (col.kind === "table") {
+      const children = decodeBundleTable(col.table, strings);
+      values = present.map((_, j) => children.slice(col.offsets[j], col.offsets[j + 1]));
+    } else throw new Error(`unknown bundle column kind ${col.kind}`);
+    present.forEach((i, j) => {
+      rows[i][col.name] = values[j];
+    });
+  }
+  return rows;
+}
+
+async function fetchBundleJson(files) {
+  if (files.gzip && typeof DecompressionStream === "function") {
+    try {
+      const res = await fetch(`${RUNTIME_BASE}/${files.gzip.file}`);
+      if (!res.ok) throw new Error("bundle fetch failed");
+      const text = await new Response(res.body.pipeThrough(new DecompressionStream("gzip"))).text();
+      return JSON.parse(text);
+    } catch {
+      // Servers that already decode Content-Encoding: gzip land here; use the plain file.
+    }
+  }
+  const res = await fetch(`${RUNTIME_BASE}/${files.json.file}`);
+  if (!res.ok) throw new Error("bundle fetch failed");
+  return await res.json();
+}
+
+// Baseline and decks from the prebuilt runtime bundle (scripts/build_runtime_bundle.py), or null.
+async function loadRuntimeBundle() {
+  try {
+    const res = await fetch(`${RUNTIME_BASE}/runtime_manifest_v1.json`, { cache: "no-cache" });
+    if (!res.ok) throw new Error("bundle manifest fetch failed");
+    const manifest = await res.json();
+    if (manifest.version !== RUNTIME_BUNDLE_VERSION) throw new Error("unsupported bundle version");
+    const bundle = await fetchBundleJson(manifest.files);
+    return {
+      baseline: bundle.baseline,
+      scenarios: decodeBundleTable(bundle.decks.scenarios.table, bundle.strings),
+      truthChecks: decodeBundleTable(bundle.decks.truth_checks.table, bundle.strings),
+    };
+  } catch {
+    return null;
+  }
+}
+
 async function loadBaseline() {
   try {
     const res = await fetch("../data/calibrated/baseline_v1.json");
@@ -8071,9 +8139,10 @@ function buildSparkline(values) {
 }
 
 async function bootstrap() {
-  const baseline = await loadBaseline();
-  const scenarios = await loadScenarioLibrary();
-  const truthChecks = await loadTruthChecks();
+  const bundle = await loadRuntimeBundle();
+  const baseline = bundle ? bundle.baseline : await loadBaseline();
+  const scenarios = bundle ? bundle.scenarios : await loadScenarioLibrary();
+  const truthChecks = bundle ? bundle.truthChecks : await loadTruthChecks();
   initFromBaseline(baseline);
   state.content.scenarioLibrary = scenarios;
   state.content.truthChecks = truthChecks;